@@ -0,0 +1,53 @@
+"""
+Ticker.from_name 解析速度
+
+    python benchmarks/bench_ticker_parse.py [-n 1000000]
+
+模拟 bar 文件列表中的文件名: 约 2000 个不同的 ticker 重复出现（热缓存），
+以及全部不重复的名字（冷缓存，需要创建实例）。
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyptools.common.object import Ticker
+
+
+def _gen_names(n, n_unique):
+    _exchanges = ['SHFE', 'DCE', 'CZCE', 'CFFEX', 'INE', 'CME', 'LME']
+    _products = ['rb', 'hc', 'i', 'j', 'm', 'y', 'AP', 'ZC', 'IF', 'IC', 'sc', 'ES', 'CA3M', 'au', 'cu']
+    _unique = []
+    n_month = 0
+    while len(_unique) < n_unique:
+        for _product in _products:
+            for _exchange in _exchanges:
+                _unique.append(f'{_product}{2000 + n_month}.{_exchange}')
+        n_month += 1
+    _unique = _unique[:n_unique]
+    return [_unique[i % n_unique] for i in range(n)]
+
+
+def bench(names) -> float:
+    _t = time.perf_counter()
+    for _name in names:
+        Ticker.from_name(_name)
+    return time.perf_counter() - _t
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', type=int, default=10 ** 6)
+    args = arg_parser.parse_args()
+
+    l_names = _gen_names(args.n, 2000)
+    _cost = bench(l_names)
+    print(f'hot  (2000 unique): {args.n} names, {_cost:.3f}s, {_cost / args.n * 1e9:.0f} ns/name')
+
+    l_names = _gen_names(min(args.n, 10 ** 5), min(args.n, 10 ** 5))
+    l_names = [_name.replace('.', 'x.') for _name in l_names]
+    _cost = bench(l_names)
+    print(f'cold (all unique) : {len(l_names)} names, {_cost:.3f}s, {_cost / len(l_names) * 1e9:.0f} ns/name')
@@ -0,0 +1,88 @@
+"""
+导入时间检查（基于 python -X importtime）
+
+    python benchmarks/import_audit.py [-n 9] [--top 8] [--budget benchmarks/import_budget.json]
+
+对 budget 文件中的每个模块，在新的解释器中运行 `import 模块` n 次，取中位数（单次受机器负载影响大）:
+    startup     进程启动到导入完成的总时间(ms)
+    cost        startup 减去空解释器的启动时间(同样取中位数)，即导入本身的开销; 与 budget 比较
+    import      -X importtime 中该模块的 cumulative(ms)
+并列出该模块导入时 self 时间最长的模块。cost 超过 budget 时返回 1。
+budget 按多次运行的 cost 中位数留出约 30% 余量设置。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+PATH_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATH_BUDGET = os.path.join(PATH_ROOT, 'benchmarks', 'import_budget.json')
+
+
+def _parse_importtime(stderr: str) -> list:
+    """-> [(name, self_us, cumulative_us, depth)]"""
+    l_rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _self, _cumulative, _name = line[len('import time:'):].split('|')
+        _depth = (len(_name) - len(_name.lstrip())) // 2
+        l_rows.append((_name.strip(), int(_self), int(_cumulative), _depth))
+    return l_rows
+
+
+def audit_module(module: str, n: int = 9) -> dict:
+    """-> {'startup': 中位数, 'import': 中位数, 'rows': 中位数那一次的 importtime}"""
+    l_results = []
+    for _ in range(n):
+        _t0 = time.perf_counter()
+        _p = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=PATH_ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+        )
+        _startup_ms = (time.perf_counter() - _t0) * 1000
+        if _p.returncode != 0:
+            raise RuntimeError(f'import {module} failed:\n{_p.stderr.splitlines()[-1]}')
+        l_rows = _parse_importtime(_p.stderr)
+        _import_ms = sum([_row[2] for _row in l_rows if _row[3] == 0 and _row[0] != 'site']) / 1000
+        l_results.append({'startup': _startup_ms, 'import': _import_ms, 'rows': l_rows})
+    l_results.sort(key=lambda x: x['startup'])
+    return {
+        'startup': statistics.median([_['startup'] for _ in l_results]),
+        'import': statistics.median([_['import'] for _ in l_results]),
+        'rows': l_results[len(l_results) // 2]['rows'],
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', type=int, default=9)
+    arg_parser.add_argument('--top', type=int, default=8)
+    arg_parser.add_argument('--budget', default=PATH_BUDGET)
+    args = arg_parser.parse_args()
+
+    with open(args.budget) as f:
+        d_budget = json.load(f)
+
+    # sys 为内置模块，即空解释器的启动时间
+    _python_startup = audit_module('sys', n=args.n)['startup']
+    print(f'python startup {_python_startup:.1f} ms')
+    _over = False
+    for _module, _budget_ms in d_budget.items():
+        _result = audit_module(_module, n=args.n)
+        _cost = _result['startup'] - _python_startup
+        _ok = _cost <= _budget_ms
+        _over = _over or not _ok
+        print(f'{"OK  " if _ok else "OVER"} {_module:<40} startup {_result["startup"]:7.1f} ms'
+              f'  cost {_cost:7.1f} ms  import {_result["import"]:7.1f} ms  budget {_budget_ms} ms')
+        for _name, _self, _cumulative, _depth in sorted(_result['rows'], key=lambda x: -x[1])[:args.top]:
+            print(f'        {_name:<48} self {_self / 1000:6.1f} ms  cumulative {_cumulative / 1000:6.1f} ms')
+    return 1 if _over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
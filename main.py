@@ -8,30 +8,31 @@ import json
 from typing import List, Dict
 import sys
 from collections import defaultdict
-from pprint import pprint
 import argparse
 
 PATH_ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(PATH_ROOT)
 PATH_CONFIG = os.path.join(PATH_ROOT, 'Config', 'Config.json')
+PATH_METRICS = os.path.join(PATH_ROOT, 'logs', 'metrics.jsonl')
 
 from pyptools.helper.simpleLogger import MyLogger
-from pyptools.helper.tp_WarningBoard import run_warning_board
-from pyptools.MostActivateTickerDB import MostActivateTickerToDB, MostActivateTicker, MostActivateTickerFile, MostActivateTickerFileData
+# tp_WarningBoard(subprocess)、scheduler、metrics 在使用时才导入，见 benchmarks/import_budget.json
+# MostActivateTickerToDB, MostActivateTicker 需要 SQLAlchemy, 连接数据库时才导入
+from pyptools.MostActivateTickerDB import MostActivateTickerFile, MostActivateTickerFileData
 
 
-arg_parser = argparse.ArgumentParser()
-arg_parser.add_argument('-o', '--output')
-arg_parser.add_argument('--otoday', help='是否输出当天的数据', action='store_true')
-arg_parser.add_argument('-d', '--dayoffset', help='开始日期(距离当前的天数).当天:0,昨天:-1.', default=0)
-args = arg_parser.parse_args()
-PATH_OUTPUT = os.path.abspath(args.output)
-IS_OUTPUT_TODAY = args.otoday
-START_DAY_OFFSET = int(args.dayoffset)
-if START_DAY_OFFSET > 0:
-    START_DAY_OFFSET = -START_DAY_OFFSET
-if not os.path.isdir(PATH_OUTPUT):
-    os.makedirs(PATH_OUTPUT)
+def parse_args(argv=None):
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-o', '--output')
+    arg_parser.add_argument('--otoday', help='是否输出当天的数据', action='store_true')
+    arg_parser.add_argument('-d', '--dayoffset', help='开始日期(距离当前的天数).当天:0,昨天:-1.', default=0)
+    arg_parser.add_argument('--daemon', help='常驻运行，按 --at 指定的时间运行', action='store_true')
+    arg_parser.add_argument('--at', help='daemon 模式的运行时间 HH:MM[:SS], 可多个', nargs='+', default=[])
+    arg_parser.add_argument('--metrics', help='指标输出文件(.jsonl / .prom)', default=PATH_METRICS)
+    args = arg_parser.parse_args(argv)
+    if args.daemon and not args.at:
+        arg_parser.error('--daemon 需要指定 --at')
+    return args
 
 
 # 合成得到“远月"合约
@@ -59,83 +60,172 @@ def gen_longer(
     return l_all_data
 
 
-def run(name, new_data):
-    path_file = os.path.join(PATH_OUTPUT, name + ".csv")
-    path_file_bak = os.path.join(PATH_OUTPUT, name + "_" + datetime.now().strftime("%Y%m%d%H%M%S") + ".csv")
-    
-    # [1] 读取原 MostActivateTickerFile 文件的数据
-    if os.path.isfile(path_file):
-        old_data: List[MostActivateTickerFileData] = MostActivateTickerFile.read(path_file)
-    else:
-        old_data = []
-
-    # [2] 检查数据, 新、旧数据是否有有冲突
-    _error = False
-    if old_data:
-        for _data in new_data:
-            old_ticker = MostActivateTickerFile.query_ticker_from_data(old_data, _data.date, _data.product)
-            if not old_ticker:
+class MostActivateTickerChecker:
+    """
+    下载db数据，与已输出的 MostActivateTickerFile 合并后输出
+    daemon 模式下常驻运行: db engine/session、已读取的文件数据保存在内存中，
+    每次运行只查询 db、合并新数据; 与上一次的数据相同时不重新输出。
+    """
+    def __init__(self, path_output, is_output_today=False, start_day_offset=0, pause_on_error=True, logger=None):
+        self.path_output = os.path.abspath(path_output)
+        self.is_output_today = is_output_today
+        self.start_day_offset = -abs(int(start_day_offset))
+        self.pause_on_error = pause_on_error
+        self.logger = logger
+        if not os.path.isdir(self.path_output):
+            os.makedirs(self.path_output)
+
+        self._db = None
+        # { name: ((mtime_ns, size), List[MostActivateTickerFileData]) }
+        self._file_data = {}
+        # { name: set(MostActivateTickerFileData) } 上一次合并的 db 数据
+        self._last_new_data = {}
+        from pyptools.helper.metrics import get_registry
+        self.metrics = get_registry()
+
+    @property
+    def db(self):
+        if self._db is None:
+            from pyptools.MostActivateTickerDB import MostActivateTickerToDB
+            d_config = json.loads(open(PATH_CONFIG).read())
+            self._db = MostActivateTickerToDB(
+                **d_config,
+                logger=self.logger
+            )
+        return self._db
+
+    def _read_file_data(self, name, path_file) -> List[MostActivateTickerFileData]:
+        """文件没有被修改时使用内存中的数据"""
+        if not os.path.isfile(path_file):
+            return []
+        _stat = os.stat(path_file)
+        _signature = (_stat.st_mtime_ns, _stat.st_size)
+        _cached = self._file_data.get(name)
+        if _cached and _cached[0] == _signature:
+            return list(_cached[1])
+        with self.metrics.timer('mat_phase_seconds', phase='read_file'):
+            _data = MostActivateTickerFile.read(path_file)
+        self._file_data[name] = (_signature, _data)
+        return list(_data)
+
+    def _write_file_data(self, name, path_file, data: List[MostActivateTickerFileData]):
+        with self.metrics.timer('mat_phase_seconds', phase='write_file'):
+            MostActivateTickerFile.write(p=path_file, data=data)
+        _stat = os.stat(path_file)
+        self.metrics.gauge('mat_file_size_bytes', file=name).set(_stat.st_size)
+        self._file_data[name] = ((_stat.st_mtime_ns, _stat.st_size), list(data))
+
+    def run(self, name, new_data):
+        path_file = os.path.join(self.path_output, name + ".csv")
+        path_file_bak = os.path.join(self.path_output, name + "_" + datetime.now().strftime("%Y%m%d%H%M%S") + ".csv")
+
+        # 与上一次相同，不需要重新输出
+        _new_data_set = set(new_data)
+        if self._last_new_data.get(name) == _new_data_set and os.path.isfile(path_file):
+            _cached = self._file_data.get(name)
+            _stat = os.stat(path_file)
+            if _cached and _cached[0] == (_stat.st_mtime_ns, _stat.st_size):
+                self.logger.info(f'no new data, {name}')
+                return
+
+        # [1] 读取原 MostActivateTickerFile 文件的数据
+        old_data: List[MostActivateTickerFileData] = self._read_file_data(name, path_file)
+
+        # [2] 检查数据, 新、旧数据是否有有冲突
+        _error = False
+        if old_data:
+            for _data in new_data:
+                old_ticker = MostActivateTickerFile.query_ticker_from_data(old_data, _data.date, _data.product)
+                if not old_ticker:
+                    continue
+                if _data.ticker != old_ticker:
+                    self.logger.error(f'db和文件数据不一致,{_data.date},{_data.product},{path_file}')
+                    self.metrics.counter('mat_conflicts', file=name).inc()
+                    _error = True
+        if _error:
+            from pyptools.helper.tp_WarningBoard import run_warning_board
+            run_warning_board(warning_msg='数据不一致')
+            if self.pause_on_error:
+                if isinstance(self.logger, MyLogger):
+                    self.logger.flush()
+                os.system('pause')
+            raise Exception
+
+        # [3] 合并数据
+        all_data = old_data + new_data
+        # 生成新的结果
+        all_changed_data: List[MostActivateTickerFileData] = MostActivateTickerFile.gen_changed(all_data)
+        self.metrics.counter('mat_rows_changed', file=name).inc(max(len(all_changed_data) - len(old_data), 0))
+
+        # [4] 输出
+        self._write_file_data(name, path_file, all_changed_data)
+        shutil.copyfile(path_file, path_file_bak)
+        self._last_new_data[name] = _new_data_set
+        if self.is_output_today:
+            path_file_today_data = os.path.join(self.path_output, f"_{name}_Today.csv")
+            today_data = [i for i in all_changed_data if i.date == datetime.today().strftime('%Y%m%d')]
+            MostActivateTickerFile.write(p=path_file_today_data, data=today_data)
+            if today_data:
+                from pprint import pprint
+                pprint(today_data, indent=4)
+
+    def run_once(self):
+        # [1] 从数据库下载数据
+        start_date = (datetime.now() + timedelta(days=self.start_day_offset)).date()
+        # 常驻运行时 session 中已加载的对象需要重新查询
+        self.db.session.expire_all()
+        with self.metrics.timer('mat_phase_seconds', phase='download_db'):
+            l_all_db_data = self.db.download_from_db(start_date=start_date)
+
+        # [2] 整理db数据 -> List[MostActivateTickerFileData]
+        d_all_db_data = defaultdict(list)
+        for _data in l_all_db_data:
+            d_all_db_data[_data.Num].append(MostActivateTickerFileData.from_db_data(_data))
+
+        # [3]
+        l_infos = [
+            {
+                "name": "MostActivateTickers_1",
+                "new_data": d_all_db_data.get(1)
+            },
+            {
+                "name": "MostActivateTickers_2",
+                "new_data": d_all_db_data.get(2)
+            },
+            {
+                "name": "MostActivateTickers_2Longer",
+                "new_data": gen_longer(d_all_db_data.get(1), d_all_db_data.get(2))
+            },
+        ]
+
+        for info in l_infos:
+            if not info["new_data"]:
                 continue
-            if _data.ticker != old_ticker:
-                logger.error(f'db和文件数据不一致,{_data.date},{_data.product},{path_file}')
-                _error = True
-    if _error:
-        run_warning_board(warning_msg='数据不一致')
-        os.system('pause')
-        raise Exception
-
-    # [3] 合并数据
-    all_data = old_data + new_data
-    # 生成新的结果
-    all_changed_data: List[MostActivateTickerFileData] = MostActivateTickerFile.gen_changed(all_data)
-
-    # [4] 输出
-    MostActivateTickerFile.write(p=path_file, data=all_changed_data)
-    shutil.copyfile(path_file, path_file_bak)
-    if IS_OUTPUT_TODAY:
-        path_file_today_data = os.path.join(PATH_OUTPUT, f"_{name}_Today.csv")
-        today_data = [i for i in all_changed_data if i.date == datetime.today().strftime('%Y%m%d')]
-        MostActivateTickerFile.write(p=path_file_today_data, data=today_data)
-        if today_data:
-            pprint(today_data, indent=4)
+            self.logger.info(f"handling {info['name']}")
+            with self.metrics.timer('mat_phase_seconds', phase='merge_output'):
+                self.run(name=info["name"], new_data=info["new_data"])
 
 
-if __name__ == '__main__':
-    #
-    logger = MyLogger('GenMostActivateTicker', output_root=os.path.join(PATH_ROOT, 'logs'))
-
-    # [1] 从数据库下载数据
-    d_config = json.loads(open(PATH_CONFIG).read())
-    start_date = (datetime.now() + timedelta(days=START_DAY_OFFSET)).date()
-    obj = MostActivateTickerToDB(
-        **d_config,
-        logger=logger
+def main(argv=None):
+    args = parse_args(argv)
+    logger = MyLogger(
+        'GenMostActivateTicker', output_root=os.path.join(PATH_ROOT, 'logs'),
+        async_mode=True, rate_limit=50, rate_interval=60,
     )
-    l_all_db_data: List[MostActivateTicker] = obj.download_from_db(start_date=start_date)
-
-    # [2] 整理db数据 -> List[MostActivateTickerFileData]
-    d_all_db_data = defaultdict(list)
-    for _data in l_all_db_data:
-        d_all_db_data[_data.Num].append(MostActivateTickerFileData.from_db_data(_data))
-
-    # [3]
-    l_infos = [
-        {
-            "name": "MostActivateTickers_1",
-            "new_data": d_all_db_data.get(1)
-        },
-        {
-            "name": "MostActivateTickers_2",
-            "new_data": d_all_db_data.get(2)
-        },
-        {
-            "name": "MostActivateTickers_2Longer",
-            "new_data": gen_longer(d_all_db_data.get(1), d_all_db_data.get(2))
-        },
-    ]
-
-    for info in l_infos:
-        if not info["new_data"]:
-            continue
-        logger.info(f"handling {info['name']}")
-        run(name=info["name"], new_data=info["new_data"])
+    checker = MostActivateTickerChecker(
+        path_output=args.output,
+        is_output_today=args.otoday,
+        start_day_offset=args.dayoffset,
+        pause_on_error=not args.daemon,
+        logger=logger,
+    )
+    checker.metrics.start_flush(args.metrics, interval=60)
+    if args.daemon:
+        from ticker_daemon import MostActivateTickerDaemon
+        MostActivateTickerDaemon(checker, run_times=args.at, logger=logger).start_loop()
+    else:
+        checker.run_once()
+
+
+if __name__ == '__main__':
+    main()
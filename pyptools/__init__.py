@@ -1 +1,10 @@
-from . import pyptools_bm_simulation
+import importlib
+
+# 子包在使用时才导入，导入 pyptools.xxx 时不需要加载其他子包
+_SUB_PACKAGES = ['pyptools_bm_simulation']
+
+
+def __getattr__(name):
+    if name in _SUB_PACKAGES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
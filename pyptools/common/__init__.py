@@ -1,3 +1,4 @@
 from .general_ticker_info import TickerInfoData, GeneralTickerInfoFile, GeneralTickerInfoManager
 from .trading_session import TradingSessionData, TradingSessionFile, TradingSessionManager, TradingSessionDataSet
-from .object import Product, Ticker, BarData, TickData
+from .object import Product, Ticker, BarData, TickData, BarDataSeries, TickDataSeries
+from .reference_data import ReferenceDataStore
@@ -138,13 +138,7 @@ class Interval(Enum):
 
 
 def _gen_all_time() -> List[time]:
-    s = datetime(year=2000, month=1, day=1)
-    e = datetime(year=2000, month=1, day=2)
-    _ = []
-    while s < e:
-        _.append(s.time())
-        s += timedelta(minutes=1)
-    return _
+    return [time(_h, _m) for _h in range(24) for _m in range(60)]
 
 
 AllMinuteTime: List[time] = _gen_all_time()
@@ -16,6 +16,7 @@ GeneralTickerInfo.csv
     margin: float  # 保证金率
 - GeneralTickerInfoFile
   .read() 文件读取, -> Dict[Product, TickerInfoData]
+  按列头名定位列（忽略空格），允许多余的列、不同的列顺序
 - GeneralTickerInfoManager
   输入目录, 如 "./Platinum/Platinum.Ds/Release/Data", 查找该目录下的 文件夹, 文件夹名作为 time zone index
   作为在Platinum组件中使用的用于管理GeneralTickerInfo的工具
@@ -23,6 +24,8 @@ GeneralTickerInfo.csv
 
 import os
 from dataclasses import dataclass
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 from .object import Product
 
@@ -50,9 +53,45 @@ class GeneralTickerInfoFile:
              'MinCommissionInXxx,MaxCommissionInXxx,StampDutyRate,' \
              'SlippagePoints,Product,FlatTodayDiscount,Margin,IsLive'
 
+    # TickerInfoData 字段: 列名
+    KeyColumns = ['Product', 'Exchange']
+    StrFieldColumns = {
+        'prefix': 'Prefix',
+        'currency': 'Currency',
+    }
+    FloatFieldColumns = {
+        'point_value': 'PointValue',
+        'min_move': 'MinMove',
+        'lot_size': 'LotSize',
+        'commission_on_rate': 'CommissionOnRate',
+        'commission_per_share': 'CommissionPerShareInXxx',
+        'slippage_points': 'SlippagePoints',
+        'flat_today_discount': 'FlatTodayDiscount',
+        'margin': 'Margin',
+    }
+
+    # { 列头(tuple): { 字段/列名: index } }
+    _schema_cache = {}
+
     def __init__(self):
         pass
 
+    @classmethod
+    def _compile_schema(cls, header: tuple) -> dict:
+        """按列名定位 index; 列头中的空格忽略，允许多余的列和不同的列顺序"""
+        _schema = cls._schema_cache.get(header)
+        if _schema is not None:
+            return _schema
+        _column_index = {_name: n for n, _name in enumerate(header)}
+        _schema = {}
+        for _field, _column in [(_, _) for _ in cls.KeyColumns] + \
+                list(cls.StrFieldColumns.items()) + list(cls.FloatFieldColumns.items()):
+            if _column not in _column_index:
+                raise ValueError(f'GeneralTickerInfo 缺少列, {_column}')
+            _schema[_field] = _column_index[_column]
+        cls._schema_cache[header] = _schema
+        return _schema
+
     @classmethod
     def read(cls, p,) -> Dict[Product, TickerInfoData]:
         assert os.path.isfile(p)
@@ -64,26 +103,28 @@ class GeneralTickerInfoFile:
         if len(l_lines) <= 1:
             return d_ticker_infos
 
-        for line in l_lines[1:]:
-            _line_split = line.split(',')
-            assert len(_line_split) == 20
-            _product_symbol = _line_split[16]
-            _exchange = _line_split[2]
-            _product = Product(symbol=_product_symbol, exchange=_exchange)
-            _product_info_data = TickerInfoData(
+        _header = tuple([_.strip() for _ in l_lines[0].split(',')])
+        _schema = cls._compile_schema(_header)
+        l_rows = [line.split(',') for line in l_lines[1:]]
+        for _row in l_rows:
+            assert len(_row) == len(_header)
+
+        # 按列批量转换
+        d_columns = {
+            _field: [_row[_schema[_field]] for _row in l_rows]
+            for _field in list(cls.StrFieldColumns.keys()) + cls.KeyColumns
+        }
+        for _field in cls.FloatFieldColumns.keys():
+            _n = _schema[_field]
+            d_columns[_field] = list(map(float, [_row[_n] for _row in l_rows]))
+
+        _fields = list(cls.StrFieldColumns.keys()) + list(cls.FloatFieldColumns.keys())
+        for n in range(len(l_rows)):
+            _product = Product(symbol=d_columns['Product'][n], exchange=d_columns['Exchange'][n])
+            d_ticker_infos[_product] = TickerInfoData(
                 product=_product,
-                prefix=_line_split[3],
-                currency=_line_split[5],
-                point_value=float(_line_split[6]),
-                min_move=float(_line_split[7]),
-                lot_size=float(_line_split[8]),
-                commission_on_rate=float(_line_split[10]),
-                commission_per_share=float(_line_split[11]),
-                slippage_points=float(_line_split[15]),
-                flat_today_discount=float(_line_split[17]),
-                margin=float(_line_split[18]),
+                **{_field: d_columns[_field][n] for _field in _fields}
             )
-            d_ticker_infos[_product] = _product_info_data
         return d_ticker_infos
 
 
@@ -101,25 +142,36 @@ class GeneralTickerInfoManager:
         self._data = {}
         self._set(path)
 
+    @classmethod
+    def from_data(cls, data: Dict[str, Dict[Product, TickerInfoData]]):
+        """使用已读取的数据（如 ReferenceDataStore），不复制"""
+        _manager = cls.__new__(cls)
+        _manager._data = data
+        return _manager
+
     @property
-    def data(self):
-        return self._data.copy()
+    def data(self) -> MappingProxyType:
+        """只读视图"""
+        return MappingProxyType(self._data)
 
     def _set(self, path):
         assert os.path.isdir(path)
+        d_files = {}
         for _name in os.listdir(path):
             path_sub = os.path.join(path, _name)
             path_gti_file = os.path.join(path_sub, 'GeneralTickerInfo.csv')
             if not os.path.isfile(path_gti_file):
                 continue
-            else:
-                try:
-                    _gti: Dict[Product, TickerInfoData] = GeneralTickerInfoFile.read(path_gti_file)
-                except Exception as e:
-                    raise e
-                else:
-                    _time_zone_index = '.'.join(_name.split('.')[1:])
-                    self._data[_time_zone_index] = _gti
+            _time_zone_index = '.'.join(_name.split('.')[1:])
+            d_files[_time_zone_index] = path_gti_file
+        # 各时区的文件相互独立，并行读取
+        with ThreadPoolExecutor(max_workers=max(len(d_files), 1)) as executor:
+            d_future = {
+                _time_zone_index: executor.submit(GeneralTickerInfoFile.read, _p)
+                for _time_zone_index, _p in d_files.items()
+            }
+        for _time_zone_index, _future in d_future.items():
+            self._data[_time_zone_index] = _future.result()
 
     def get(self, product, time_zone_index='210') -> TickerInfoData or None:
         return self._data[time_zone_index][product]
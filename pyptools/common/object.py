@@ -3,9 +3,10 @@ from datetime import datetime, date, time
 from typing import List, Dict
 from collections import namedtuple, defaultdict
 from dataclasses import dataclass
-from functools import wraps
-
-import numpy as np
+from functools import wraps, lru_cache
+from array import array
+import weakref
+from types import MappingProxyType
 
 from .constant import *
 
@@ -41,41 +42,60 @@ class UnsetDict(dict):
         super(UnsetDict, self).__setitem__(key, value)
 
 
+def _split_name(name: str) -> (str, str):
+    """ 'rb2305.SHFE' -> ('rb2305', 'SHFE') """
+    if '.' in name:
+        symbol, exchange = name.rsplit('.', 1)
+    else:
+        symbol, exchange = name, ''
+    return symbol, exchange
+
+
+# 由名字解析 Ticker / Product 的缓存，限制大小
+@lru_cache(maxsize=2 ** 16)
+def _from_name(cls, name: str):
+    symbol, exchange = _split_name(name)
+    return cls(symbol=symbol, exchange=exchange)
+
+
 class Ticker:
     """
     标的
+    同一个 (symbol, exchange) 只有一个实例; 属性只在创建实例时计算一次。
+    实例保存在 WeakValueDictionary 中，不再被使用的实例可以被回收。
     """
-    _instances = {}
+    __slots__ = ('symbol', 'exchange', 'product_name', 'product', 'name', '__weakref__')
+
+    _instances = weakref.WeakValueDictionary()
     count = 0
 
     def __new__(cls, symbol: str, exchange: str):
-        if (symbol, exchange) in cls._instances.keys():
-            pass
-        else:
+        _instance = cls._instances.get((symbol, exchange))
+        if _instance is None:
             _instance = super().__new__(cls)
+            _instance.symbol = symbol
+            _instance.exchange = exchange
+            _instance.product_name = _instance._product_name()
+            _instance.product = Product(symbol=_instance.product_name, exchange=exchange)
+            _instance.name = f'{symbol}.{exchange}'
             cls._instances[(symbol, exchange)] = _instance
             cls.count += 1
-        return cls._instances[(symbol, exchange)]
+        return _instance
 
     def __init__(self, symbol: str, exchange):
-        self.symbol = symbol
-        self.exchange = exchange
-        self.product_name = self._product_name()
-        self.product = Product(symbol=self.product_name, exchange=self.exchange)
-        self.name = f'{self.symbol}.{self.exchange}'
+        # 属性已在 __new__ 中设置
+        pass
+
+    def __getnewargs__(self):
+        # pickle / copy 时返回同一个实例
+        return self.symbol, self.exchange
 
     def __repr__(self):
         return f'Ticker: {self.name}'
 
     @classmethod
     def from_name(cls, name: str):
-        if '.' in name:
-            exchange = name.split('.')[-1]
-            symbol = '.'.join(name.split('.')[:-1])
-        else:
-            exchange = ''
-            symbol = name
-        return cls(symbol=symbol, exchange=exchange)
+        return _from_name(cls, name)
 
     def _product_name(self) -> str:
         # if self.exchange.value in ['DCE', 'CZCE', 'SHFE', 'INE']:
@@ -93,6 +113,30 @@ class Ticker:
         return bool(1 - self.__lt__(other))
 
 
+# InternalProduct 特殊例子, { (symbol, exchange): InternalProduct }
+SPECIAL_INTERNAL_PRODUCT = {
+    ('ZC', 'CZCE'): 'ZZTC',
+    ('au', 'SHFE'): 'SQau2',
+    ('IF', 'CFFEX'): 'CSI300',
+    ('IC', 'CFFEX'): 'CSI500',
+    ('IH', 'CFFEX'): 'SSE50',
+    ('AH3M', 'LME'): 'LmeAH',
+    ('CA3M', 'LME'): 'LmeCA',
+    ('L-ZS3M', 'LME'): 'LmeZS',
+    ('NI3M', 'LME'): 'LmeNI',
+    ('PB3M', 'LME'): 'LmePB',
+    ('SN3M', 'LME'): 'LmeSN',
+}
+# InternalProduct 一般情况, { exchange: 前缀 }; 其他交易所（CFFEX, CME, CME_CBT, NYBOT, SGXQ, ...）直接使用 symbol
+EXCHANGE_INTERNAL_PRODUCT_PREFIX = {
+    'DCE': 'DL',
+    'CZCE': 'ZZ',
+    'SHFE': 'SQ',
+    'INE': 'SQ',
+    'LME': 'Lme',
+}
+
+
 class Product:
     """
     品种
@@ -108,77 +152,41 @@ class Product:
         InternalProduct=ES
 
     """
-    _instances = {}
+    __slots__ = ('symbol', 'exchange', 'InternalProduct', 'name', '__weakref__')
+
+    _instances = weakref.WeakValueDictionary()
     count = 0
 
     def __new__(cls, symbol: str, exchange: str):
-        if (symbol, exchange) in cls._instances.keys():
-            pass
-        else:
+        _instance = cls._instances.get((symbol, exchange))
+        if _instance is None:
             _instance = super().__new__(cls)
+            _instance.symbol = symbol
+            _instance.exchange = exchange
+            _instance.InternalProduct = _instance._internal_product()
+            _instance.name = f'{symbol}.{exchange}'
             cls._instances[(symbol, exchange)] = _instance
             cls.count += 1
-        return cls._instances[(symbol, exchange)]
+        return _instance
 
     def __init__(self, symbol: str, exchange: str):
-        self.symbol = symbol
-        self.exchange = exchange
-        self.InternalProduct = self._internal_product()
-        self.name = f'{self.symbol}.{self.exchange}'
+        # 属性已在 __new__ 中设置
+        pass
+
+    def __getnewargs__(self):
+        return self.symbol, self.exchange
 
     @classmethod
     def from_name(cls, name):
-        if '.' in name:
-            exchange = name.split('.')[-1]
-            symbol = '.'.join(name.split('.')[:-1])
-        else:
-            exchange = ''
-            symbol = name
-        return cls(symbol=symbol, exchange=exchange)
+        return _from_name(cls, name)
 
     def _internal_product(self, ):
         # 特殊例子
-        if self.exchange == 'CZCE':
-            if self.symbol == 'ZC':
-                return 'ZZTC'
-        elif self.exchange == 'SHFE':
-            if self.symbol == 'au':
-                return 'SQau2'
-        elif self.exchange == 'CFFEX':
-            if self.symbol == 'IF':
-                return 'CSI300'
-            elif self.symbol == 'IC':
-                return 'CSI500'
-            elif self.symbol == 'IH':
-                return 'SSE50'
-        elif self.exchange == 'LME':
-            if self.symbol == 'AH3M':
-                return 'LmeAH'
-            elif self.symbol == 'CA3M':
-                return 'LmeCA'
-            elif self.symbol == 'L-ZS3M':
-                return 'LmeZS'
-            elif self.symbol == 'NI3M':
-                return 'LmeNI'
-            elif self.symbol == 'PB3M':
-                return 'LmePB'
-            elif self.symbol == 'SN3M':
-                return 'LmeSN'
-
+        _internal_product = SPECIAL_INTERNAL_PRODUCT.get((self.symbol, self.exchange))
+        if _internal_product:
+            return _internal_product
         # 一般情况
-        if self.exchange == 'DCE':
-            return f'DL{self.symbol}'
-        elif self.exchange == 'CZCE':
-            return f'ZZ{self.symbol}'
-        elif self.exchange in ['SHFE', 'INE']:
-            return f'SQ{self.symbol}'
-        elif self.exchange == 'LME':
-            return f'Lme{self.symbol}'
-        elif self.exchange in ['CFFEX', 'CME', 'CME_CBT', 'NYBOT', 'SGXQ']:
-            # TT TF
-            return self.symbol
-        else:
-            return self.symbol
+        return EXCHANGE_INTERNAL_PRODUCT_PREFIX.get(self.exchange, '') + self.symbol
 
     def __lt__(self, other):
         return self.name.lower() < other.name.lower()
@@ -264,7 +272,7 @@ class TraderPnLData:
     trader: str = ''
     pnl: float = 0
     commission: float = 0
-    initX: float = np.nan
+    initX: float = float('nan')
 
     def __str__(self):
         return ','.join([
@@ -348,6 +356,188 @@ class BarData:
     open_interest: float
 
 
+"""
+    按 ticker-day 存储的列式数据（struct-of-arrays）
+    TickData / BarData 的每个实例都是一个 dataclass 对象，一天的tick数据会占用大量内存;
+    Series 以 array 连续存储每一列，同一个 ticker-day 只保存一份 ticker、date，
+    时间保存为当天的微秒数(int64)。
+    通过下标访问时，临时生成 TickData / BarData 对象，兼容原有的使用方式;
+    .column() / .to_numpy() 获取整列数据，可用于向量化计算。
+"""
+
+
+def _time_to_us(t: time) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1000000 + t.microsecond
+
+
+def _us_to_time(us: int) -> time:
+    _s, _us = divmod(int(us), 1000000)
+    _m, _s = divmod(_s, 60)
+    _h, _m = divmod(_m, 60)
+    return time(_h, _m, _s, _us)
+
+
+class _MarketDataSeries:
+    __slots__ = ('ticker', 'date', '_time', '_columns')
+
+    RowClass = None
+    FloatFields: tuple = ()
+
+    def __init__(self, ticker: Ticker, date: date):
+        self.ticker = ticker
+        self.date = date
+        self._time = array('q')
+        self._columns: Dict[str, array] = {_field: array('d') for _field in self.FloatFields}
+
+    @classmethod
+    def from_columns(cls, ticker: Ticker, date: date, time_us, columns: dict):
+        """
+        直接使用已有的列数据（array / numpy.ndarray 等），不复制
+        :param time_us: 当天的微秒数
+        :param columns: { field: values }, 必须包含所有 FloatFields
+        """
+        _series = cls(ticker, date)
+        _series._time = time_us
+        for _field in cls.FloatFields:
+            if len(columns[_field]) != len(time_us):
+                raise ValueError(f'{cls.__name__} 列长度不一致, {_field}')
+            _series._columns[_field] = columns[_field]
+        return _series
+
+    @classmethod
+    def from_rows(cls, rows: list):
+        assert rows
+        _series = cls(rows[0].ticker, rows[0].date)
+        _series.extend(rows)
+        return _series
+
+    def append(self, row):
+        self._time.append(_time_to_us(row.time))
+        for _field, _column in self._columns.items():
+            _column.append(getattr(row, _field))
+
+    def append_values(self, t: time or int, **values):
+        """t: time 或 当天的微秒数; values 缺少的字段为 0"""
+        self._time.append(t if type(t) is int else _time_to_us(t))
+        for _field, _column in self._columns.items():
+            _column.append(values.get(_field, 0))
+
+    def extend(self, rows: list):
+        for _row in rows:
+            self.append(_row)
+
+    def __len__(self):
+        return len(self._time)
+
+    def _row_kwargs(self, i) -> dict:
+        _kwargs = {_field: float(_column[i]) for _field, _column in self._columns.items()}
+        _kwargs['ticker'] = self.ticker
+        _kwargs['date'] = self.date
+        _kwargs['time'] = _us_to_time(self._time[i])
+        return _kwargs
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.from_columns(
+                self.ticker, self.date, self._time[i],
+                {_field: _column[i] for _field, _column in self._columns.items()})
+        return self.RowClass(**self._row_kwargs(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def time_us(self):
+        return self._time
+
+    def times(self) -> List[time]:
+        return [_us_to_time(_) for _ in self._time]
+
+    def column(self, field: str):
+        return self._columns[field]
+
+    def to_numpy(self, field: str or None = None):
+        """field 为空时返回时间列(int64)；array 数据不复制"""
+        import numpy as np
+        _column = self._time if field is None else self._columns[field]
+        if isinstance(_column, array):
+            return np.frombuffer(_column, dtype=np.int64 if _column.typecode == 'q' else np.float64)
+        return np.asarray(_column)
+
+    @property
+    def nbytes(self) -> int:
+        _columns = [self._time] + list(self._columns.values())
+        return sum([len(_) * _.itemsize for _ in _columns])
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}: {self.ticker.name}, {self.date}, {len(self)} rows'
+
+
+class BarDataSeries(_MarketDataSeries):
+    __slots__ = ()
+
+    RowClass = BarData
+    FloatFields = ('open', 'high', 'low', 'close', 'volume', 'price', 'open_interest')
+
+
+class TickDataSeries(_MarketDataSeries):
+    """localtime 可为空，以 -1 表示"""
+    __slots__ = ('_localtime', )
+
+    RowClass = TickData
+    FloatFields = tuple([
+        _field for _field in TickData.__annotations__.keys()
+        if TickData.__annotations__[_field] is float
+    ])
+
+    def __init__(self, ticker: Ticker, date: date):
+        super().__init__(ticker, date)
+        self._localtime = array('q')
+
+    @classmethod
+    def from_columns(cls, ticker: Ticker, date: date, time_us, columns: dict, localtime_us=None):
+        _series = super().from_columns(ticker, date, time_us, columns)
+        if localtime_us is None:
+            localtime_us = array('q', [-1]) * len(time_us)
+        _series._localtime = localtime_us
+        return _series
+
+    def append(self, row):
+        super().append(row)
+        self._localtime.append(-1 if row.localtime is None else _time_to_us(row.localtime))
+
+    def append_values(self, t: time or int, localtime: time or int or None = None, **values):
+        super().append_values(t, **values)
+        if localtime is None:
+            self._localtime.append(-1)
+        else:
+            self._localtime.append(localtime if type(localtime) is int else _time_to_us(localtime))
+
+    def _row_kwargs(self, i) -> dict:
+        _kwargs = super()._row_kwargs(i)
+        _localtime = self._localtime[i]
+        _kwargs['localtime'] = None if _localtime < 0 else _us_to_time(_localtime)
+        return _kwargs
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.from_columns(
+                self.ticker, self.date, self._time[i],
+                {_field: _column[i] for _field, _column in self._columns.items()},
+                localtime_us=self._localtime[i]
+            )
+        return super().__getitem__(i)
+
+    @property
+    def localtime_us(self):
+        return self._localtime
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + len(self._localtime) * self._localtime.itemsize
+
+
 # @dataclass
 # class LogData:
 #     """
@@ -394,8 +584,9 @@ class HolidayManager:
         self._data: Dict[str, List[date]] = HolidayFile.read(path)
 
     @property
-    def data(self):
-        return self._data.copy()
+    def data(self) -> MappingProxyType:
+        """只读视图"""
+        return MappingProxyType(self._data)
 
 
 # class TradeSeriesFile:
@@ -0,0 +1,210 @@
+"""
+基础数据（reference data）的统一缓存
+
+    Release/Data/
+        {Area}.{TimeZoneIndex}/GeneralTickerInfo.csv
+        {Area}.{TimeZoneIndex}/TradingSession.csv
+        Holidays.csv
+
+- ReferenceDataStore
+    同一个 Release/Data 目录在进程内只读取一次（ReferenceDataStore.get()），
+    每个文件按 (mtime, size) 缓存; .refresh() 只重新读取有变化的文件。
+    可选 pickle 快照（snapshot_path），工具启动时先读取快照，只解析快照之后有变化的文件。
+
+    .general_ticker_info    { time_zone_index: { Product: TickerInfoData } }
+    .trading_session        { time_zone_index: TradingSessionDataSet }
+    .holidays               { exchange: [date] }
+    均为只读视图，不复制数据; refresh() 后视图内容随之更新。
+"""
+
+import os
+import pickle
+import threading
+import logging
+from datetime import date
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .object import Product, HolidayFile
+from .general_ticker_info import GeneralTickerInfoFile, TickerInfoData, GeneralTickerInfoManager
+from .trading_session import TradingSessionFile, TradingSessionDataSet, TradingSessionManager
+
+
+class ReferenceDataStore:
+    SnapshotVersion = 1
+    HolidayFileName = 'Holidays.csv'
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path, holiday_file: str or None = None, snapshot_path: str or None = None,
+                 logger: logging.Logger = logging.Logger('ReferenceDataStore')):
+        """
+        :param path: Release/Data 目录
+        :param holiday_file: 默认为 {path}/Holidays.csv
+        :param snapshot_path: 可选，pickle 快照文件路径
+        """
+        assert os.path.isdir(path)
+        self._path = os.path.abspath(path)
+        self._holiday_file = os.path.abspath(holiday_file) if holiday_file else \
+            os.path.join(self._path, self.HolidayFileName)
+        self._snapshot_path = snapshot_path
+        self.logger = logger
+        self._lock = threading.RLock()
+
+        # { file_path: ((mtime_ns, size), parsed_data) }
+        self._files: Dict[str, tuple] = {}
+        # 对外提供视图的数据，refresh() 时原地更新
+        self._general_ticker_info: Dict[str, Dict[Product, TickerInfoData]] = {}
+        self._trading_session: Dict[str, TradingSessionDataSet] = {}
+        self._holidays: Dict[str, List[date]] = {}
+
+        if self._snapshot_path:
+            self._load_snapshot()
+        self.refresh()
+
+    @classmethod
+    def get(cls, path, holiday_file: str or None = None, snapshot_path: str or None = None):
+        """进程内同一个 (目录, holiday_file, snapshot_path) 共用一个实例"""
+        _key = tuple([os.path.abspath(_p) if _p else None for _p in (path, holiday_file, snapshot_path)])
+        with cls._instances_lock:
+            if _key not in cls._instances:
+                cls._instances[_key] = cls(path, holiday_file=holiday_file, snapshot_path=snapshot_path)
+            return cls._instances[_key]
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def general_ticker_info(self) -> MappingProxyType:
+        return MappingProxyType(self._general_ticker_info)
+
+    @property
+    def trading_session(self) -> MappingProxyType:
+        return MappingProxyType(self._trading_session)
+
+    @property
+    def holidays(self) -> MappingProxyType:
+        return MappingProxyType(self._holidays)
+
+    def general_ticker_info_manager(self) -> GeneralTickerInfoManager:
+        """与 store 共用数据的 GeneralTickerInfoManager"""
+        return GeneralTickerInfoManager.from_data(self._general_ticker_info)
+
+    def trading_session_manager(self) -> TradingSessionManager:
+        """与 store 共用数据的 TradingSessionManager"""
+        return TradingSessionManager.from_data(self._trading_session)
+
+    # 需要读取的文件, [(file_path, kind, time_zone_index)]
+    def _list_files(self) -> list:
+        l_files = []
+        for _name in sorted(os.listdir(self._path)):
+            path_sub = os.path.join(self._path, _name)
+            if not os.path.isdir(path_sub):
+                continue
+            _time_zone_index = '.'.join(_name.split('.')[1:])
+            for _file_name, _kind in [
+                (GeneralTickerInfoFile.FileName, 'GeneralTickerInfo'),
+                (TradingSessionFile.FileName, 'TradingSession'),
+            ]:
+                _p = os.path.join(path_sub, _file_name)
+                if os.path.isfile(_p):
+                    l_files.append((_p, _kind, _time_zone_index))
+        if os.path.isfile(self._holiday_file):
+            l_files.append((self._holiday_file, 'Holiday', ''))
+        return l_files
+
+    @staticmethod
+    def _read_file(p, kind):
+        if kind == 'GeneralTickerInfo':
+            return GeneralTickerInfoFile.read(p)
+        elif kind == 'TradingSession':
+            return TradingSessionFile.read(p)
+        elif kind == 'Holiday':
+            return dict(HolidayFile.read(p))
+        else:
+            raise ValueError(kind)
+
+    def refresh(self) -> List[str]:
+        """重新读取有变化的文件，返回重新读取了的文件"""
+        with self._lock:
+            l_changed = []
+            _files = {}
+            _general_ticker_info = {}
+            _trading_session = {}
+            _holidays = {}
+            l_files = self._list_files()
+            d_signature = {}
+            for _p, _kind, _time_zone_index in l_files:
+                _stat = os.stat(_p)
+                d_signature[_p] = (_stat.st_mtime_ns, _stat.st_size)
+                _cached = self._files.get(_p)
+                if not (_cached and _cached[0] == d_signature[_p]):
+                    l_changed.append((_p, _kind))
+            # 有变化的文件相互独立，并行读取
+            d_new_data = {}
+            if l_changed:
+                with ThreadPoolExecutor(max_workers=len(l_changed)) as executor:
+                    d_future = {_p: executor.submit(self._read_file, _p, _kind) for _p, _kind in l_changed}
+                d_new_data = {_p: _future.result() for _p, _future in d_future.items()}
+            l_changed = [_p for _p, _ in l_changed]
+
+            for _p, _kind, _time_zone_index in l_files:
+                if _p in d_new_data:
+                    _data = d_new_data[_p]
+                else:
+                    _data = self._files[_p][1]
+                _files[_p] = (d_signature[_p], _data)
+                if _kind == 'GeneralTickerInfo':
+                    _general_ticker_info[_time_zone_index] = _data
+                elif _kind == 'TradingSession':
+                    if _data is not None:
+                        _trading_session[_time_zone_index] = _data
+                else:
+                    _holidays = _data
+            _removed = set(self._files.keys()) - set(_files.keys())
+            self._files = _files
+            # 原地更新，已有的视图、manager 可以看到新数据
+            for _target, _new in [
+                (self._general_ticker_info, _general_ticker_info),
+                (self._trading_session, _trading_session),
+                (self._holidays, _holidays),
+            ]:
+                for _k in list(_target.keys()):
+                    if _k not in _new:
+                        del _target[_k]
+                _target.update(_new)
+            if l_changed:
+                self.logger.info(f'读取基础数据文件, {len(l_changed)}')
+            if (l_changed or _removed) and self._snapshot_path:
+                self._dump_snapshot()
+            return l_changed
+
+    def _load_snapshot(self):
+        if not os.path.isfile(self._snapshot_path):
+            return
+        try:
+            with open(self._snapshot_path, 'rb') as f:
+                _snapshot = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f'基础数据快照读取失败, {self._snapshot_path}, {e}')
+            return
+        if type(_snapshot) is not dict or _snapshot.get('version') != self.SnapshotVersion:
+            return
+        if _snapshot.get('path') != self._path:
+            return
+        self._files = _snapshot['files']
+
+    def _dump_snapshot(self):
+        _p_folder = os.path.dirname(os.path.abspath(self._snapshot_path))
+        if not os.path.isdir(_p_folder):
+            os.makedirs(_p_folder)
+        _p_tmp = self._snapshot_path + '.tmp'
+        with open(_p_tmp, 'wb') as f:
+            pickle.dump(
+                {'version': self.SnapshotVersion, 'path': self._path, 'files': self._files},
+                f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(_p_tmp, self._snapshot_path)
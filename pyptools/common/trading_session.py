@@ -3,13 +3,21 @@ TradingSessionData: [Date, Product, TradingSession, ExchangeTimezone]
 TradingSessionFile.read() -> Dict[(Product, date), TradingSessionData]
 
 TradingSessionManager.data -> Dict[{_time_zone_index}, Dict[(Product, date), TradingSessionData]]
+
+TradingSessionDataSet
+    .get(product, date) -> List[List[time]]                 bisect 查找生效的交易时间
+    .is_trading_minute(product, time, date) -> bool         分钟掩码查询
 """
 
 import os
 from datetime import date, time, datetime
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Tuple
+from bisect import bisect_right
+from functools import lru_cache
+from types import MappingProxyType
 from .object import Product
+from .constant import AllMinuteTime
 from collections import defaultdict
 
 
@@ -21,32 +29,104 @@ class TradingSessionData:
     ExchangeTimezone: str           # 交易所所在时区，很少情况需要用到，所以作废（乱填）
 
 
+def gen_minute_mask(trading_session: List[List[time]]) -> bytes:
+    """
+    交易时间 -> 1440位的分钟掩码, mask[hour * 60 + minute] 为1表示该分钟在交易时间内;
+    与 AllMinuteTime 对应。start > end 时视为跨越0点。
+    """
+    return _gen_minute_mask(tuple([(_start, _end) for _start, _end in trading_session]))
+
+
+@lru_cache(maxsize=None)
+def _gen_minute_mask(trading_session: tuple) -> bytes:
+    _mask = bytearray(1440)
+    for _start, _end in trading_session:
+        # 包含 [start, end] 内的整分钟
+        _m_start = _start.hour * 60 + _start.minute + (1 if (_start.second or _start.microsecond) else 0)
+        _m_end = _end.hour * 60 + _end.minute
+        if _start <= _end:
+            _mask[_m_start: _m_end + 1] = b'\x01' * max(_m_end + 1 - _m_start, 0)
+        else:
+            _mask[_m_start:] = b'\x01' * max(1440 - _m_start, 0)
+            _mask[: _m_end + 1] = b'\x01' * (_m_end + 1)
+    return bytes(_mask)
+
+
 class TradingSessionDataSet:
+    """
+    每个 Product 的交易时间历史，按生效日期排序，
+    查询某一天的交易时间时使用 bisect; 每个交易时间预先生成分钟掩码。
+    """
+
     def __init__(self, data):
         self._data: Dict[Product, List[TradingSessionData]] = data
+        # { Product: ([生效日期], [TradingSessionData], [分钟掩码]) }, 按生效日期排序，相同日期只保留第一条
+        self._compiled: Dict[Product, Tuple[List[date], List[TradingSessionData], List[bytes]]] = {}
+        for _product, _product_ts_list in self._data.items():
+            _dates, _ts_list = [], []
+            for _ts in sorted(_product_ts_list, key=lambda x: x.Date):
+                if _dates and _dates[-1] == _ts.Date:
+                    continue
+                _dates.append(_ts.Date)
+                _ts_list.append(_ts)
+            _masks = [gen_minute_mask(_ts.TradingSession) for _ts in _ts_list]
+            self._compiled[_product] = (_dates, _ts_list, _masks)
+
+    def _index(self, product: Product, checking_date: date or None) -> (tuple, int) or (None, None):
+        _compiled = self._compiled.get(product)
+        if not _compiled:
+            return None, None
+        if checking_date is None:
+            checking_date = datetime.today().date()
+        # 最近的 生效日期 <= checking_date; 若没有，则使用最早的
+        _n = bisect_right(_compiled[0], checking_date) - 1
+        return _compiled, max(_n, 0)
+
+    def get_data(self, product: Product, checking_date: date or None = None) -> TradingSessionData or None:
+        _compiled, _n = self._index(product, checking_date)
+        if _compiled is None:
+            return None
+        return _compiled[1][_n]
 
-    def get(self, product: Product, checking_date=datetime.today().date()) -> List[List[time]] or None:
-        _product_ts_list: List[TradingSessionData] or None = self._data.get(product)
-        if not _product_ts_list:
+    def get(self, product: Product, checking_date: date or None = None) -> List[List[time]] or None:
+        """checking_date 默认当天"""
+        _ts = self.get_data(product, checking_date)
+        if _ts is None:
             return None
-        else:
-            if len(_product_ts_list) == 1:
-                return _product_ts_list[0].TradingSession
-            else:
-                _nearest_ts = [_ts for _ts in _product_ts_list if _ts.Date <= checking_date]
-                if _nearest_ts:
-                    return max(_nearest_ts, key=lambda x: x.Date).TradingSession
-                else:
-                    return min(_product_ts_list, key=lambda x: x.Date).TradingSession
+        return _ts.TradingSession
+
+    def get_minute_mask(self, product: Product, checking_date: date or None = None) -> bytes or None:
+        _compiled, _n = self._index(product, checking_date)
+        if _compiled is None:
+            return None
+        return _compiled[2][_n]
+
+    def is_trading_minute(self, product: Product, t: time, checking_date: date or None = None) -> bool:
+        _mask = self.get_minute_mask(product, checking_date)
+        if _mask is None:
+            return False
+        return _mask[t.hour * 60 + t.minute] == 1
+
+    def get_trading_minutes(self, product: Product, checking_date: date or None = None) -> List[time]:
+        """交易时间内的所有分钟"""
+        _mask = self.get_minute_mask(product, checking_date)
+        if _mask is None:
+            return []
+        return [AllMinuteTime[_m] for _m in range(1440) if _mask[_m]]
+
+
+def _parse_hms(s) -> time:
+    if len(s) == 6:
+        return time(int(s[0:2]), int(s[2:4]), int(s[4:6]))
+    return datetime.strptime(s, '%H%M%S').time()
 
 
 def _gen_trading_session(s) -> List[List[time]]:
     """ str to trading-session-data-list"""
     _l = []
     for _pair in s.split('&'):
-        _s = datetime.strptime(_pair.split('-')[0], '%H%M%S').time()
-        _e = datetime.strptime(_pair.split('-')[1], '%H%M%S').time()
-        _l.append([_s, _e])
+        _s, _e = _pair.split('-')
+        _l.append([_parse_hms(_s), _parse_hms(_e)])
     return _l
 
 
@@ -100,9 +180,17 @@ class TradingSessionManager:
         self._data: Dict[str, TradingSessionDataSet] = {}
         self._set(path)
 
+    @classmethod
+    def from_data(cls, data: Dict[str, TradingSessionDataSet]):
+        """使用已读取的数据（如 ReferenceDataStore），不复制"""
+        _manager = cls.__new__(cls)
+        _manager._data = data
+        return _manager
+
     @property
-    def data(self):
-        return self._data.copy()
+    def data(self) -> MappingProxyType:
+        """只读视图"""
+        return MappingProxyType(self._data)
 
     def _set(self, path):
         assert os.path.isdir(path)
@@ -120,7 +208,7 @@ class TradingSessionManager:
                     _time_zone_index = '.'.join(_name.split('.')[1:])
                     self._data[_time_zone_index] = _ts
 
-    def get(self, product, time_zone_index='210', checking_date=datetime.today().date()) -> List[List[time]] or None:
+    def get(self, product, time_zone_index='210', checking_date: date or None = None) -> List[List[time]] or None:
         if time_zone_index in self._data:
             return self._data[time_zone_index].get(product=product, checking_date=checking_date)
         else:
@@ -1,14 +1,27 @@
 from datetime import datetime
 import os
+import time
+import shutil
+import threading
 import subprocess
+import functools
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, Future
 
 import logging
 try:
     from .simpleLogger import MyLogger
+    from .filecache import FileCache
 except:
     from simpleLogger import MyLogger
+    from filecache import FileCache
+try:
+    from ..metrics import get_registry
+except:
+    # 作为脚本单独运行时不记录指标
+    get_registry = None
 
 
 PATH_ROOT = os.path.abspath(os.path.dirname(__file__))
@@ -38,6 +51,8 @@ class MessageClientRtnData:
     datetime: datetime
     exception: RunException or None
     msg: str = ''
+    path: str = ''              # getfile 的输出文件
+    cached: bool = False        # getfile 使用了本地缓存，没有下载
 
 
 class MessageClient:
@@ -45,7 +60,16 @@ class MessageClient:
             self,
             ip, port,
             logger: logging.Logger or None = None,
+            max_concurrency: int = 8,
+            cache_folder: str or None = None,
+            cache_max_bytes: int = 1024 * 1024 * 1024,
     ):
+        """
+        :param max_concurrency: *_async 方法同时运行的最大数量
+        :param cache_folder: getfile 的本地缓存文件夹，None 不使用缓存;
+            服务器上 dt#key 的时间戳与缓存相同时不再下载
+        :param cache_max_bytes: 缓存总大小上限，超过时删除最久未使用的 key
+        """
         self._ip = ip
         self._port = port
         self._message_client = PATH_MC
@@ -54,6 +78,12 @@ class MessageClient:
             self.logger = logger
         else:
             self.logger = MyLogger(name='MessageClient')
+        self._max_concurrency = max_concurrency
+        self._executor = None
+        self._cache = FileCache(cache_folder, max_bytes=cache_max_bytes) if cache_folder else None
+        self._cache_inflight: dict = {}
+        self._cache_inflight_lock = threading.Lock()
+        self._metrics = get_registry() if get_registry else None
 
     @staticmethod
     def _check_timeout_arg(timeout, default=5) -> float:
@@ -79,12 +109,14 @@ class MessageClient:
         finally:
             return max_try
 
-    def _run_tp_mc(self, s_cmd, timeout) -> MessageClientRtnData:
+    def _run_tp_mc(self, l_args: List[str], timeout) -> MessageClientRtnData:
+        """
+        直接运行 exe（不经过 shell），参数以列表传入，不需要处理引号
+        """
         p = subprocess.Popen(
-            s_cmd,
+            [self._message_client_exe] + l_args,
             cwd=self._message_client,
             stdout=subprocess.PIPE,
-            shell=True,
         )
 
         try:
@@ -92,6 +124,7 @@ class MessageClient:
             output_s = str(outs, encoding="utf-8")
         except subprocess.TimeoutExpired as e:
             p.kill()
+            p.communicate()
             self.logger.error('调用 MessageClient 超时:')
             self.logger.error(e)
             return MessageClientRtnData(datetime=datetime.now(), exception=RunException.TimeOut, msg=str(e))
@@ -102,42 +135,56 @@ class MessageClient:
             return MessageClientRtnData(datetime=datetime.now(), exception=RunException.Error, msg=str(e))
         else:
             if 'Exception' in output_s:
-                p.kill()
                 self.logger.warning('调用 MessageClient 失败:')
                 self.logger.warning(output_s)
-                return MessageClientRtnData(datetime=datetime.now(), exception=RunException.Timeout, msg=output_s)
+                return MessageClientRtnData(datetime=datetime.now(), exception=RunException.TimeOut, msg=output_s)
             else:
-                p.kill()
                 # print(output_s)
                 return MessageClientRtnData(
                     # datetime=datetime.now(), exception=None, msg=output_s.split('\n')[1].split('<<')[1].strip())
                     datetime=datetime.now(), exception=None, msg=output_s.split('<<')[-1].strip())
 
-    def _run(self, cmd, timeout=5, max_try=5) -> MessageClientRtnData:
+    def _run(self, l_args: List[str], timeout=5, max_try=5, backoff: float = 0) -> MessageClientRtnData:
+        """
+        :param backoff: 失败后等待 backoff * 2**n 秒再重试（指数退避），0 为立即重试
+        """
         timeout = self._check_timeout_arg(timeout, default=5)
         max_try = self._check_maxtry_arg(max_try, default=5)
 
-        s_cmd = f'TradingPlatform.MessageClient.exe {self._ip} {self._port} {cmd}'
+        _task = l_args[0]
+        l_args = [str(self._ip), str(self._port)] + l_args
         for n in range(max_try):
-            rtn_data: MessageClientRtnData = self._run_tp_mc(s_cmd=s_cmd, timeout=timeout)
+            _t0 = time.perf_counter()
+            rtn_data: MessageClientRtnData = self._run_tp_mc(l_args=l_args, timeout=timeout)
             error_type: RunException or None = rtn_data.exception
+            if self._metrics:
+                self._metrics.histogram('mc_call_seconds', task=_task).observe(time.perf_counter() - _t0)
+                self._metrics.counter('mc_calls', task=_task, result=error_type.name if error_type else 'ok').inc()
+                if n > 0:
+                    self._metrics.counter('mc_retries', task=_task).inc()
             if not error_type:
                 # print(rtn_data.msg)
                 return rtn_data
             else:
                 if error_type == RunException.TimeOut:
                     self.logger.error(f'第{n+1}次运行，超时')
-                    continue
                 if error_type == RunException.Error:
                     self.logger.error(f'第{n + 1}次运行，失败')
-                    continue
+                if backoff and n + 1 < max_try:
+                    time.sleep(backoff * 2 ** n)
         self.logger.error('超过最大运行次数')
         return MessageClientRtnData(datetime=datetime.now(), exception=RunException.Error, msg='')
 
-    def sendfile(self, key, file_path, timeout=5, max_try=5, with_timestamp: bool = False) -> MessageClientRtnData:
-        s_cmd = f'{MCTask.SendFile.value} "{key}" "{file_path}"'
-        self.logger.info(s_cmd)
-        mcr: MessageClientRtnData = self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
+    @staticmethod
+    def _cmd_string(l_args: List[str]) -> str:
+        return ' '.join([l_args[0]] + [f'"{_}"' for _ in l_args[1:]])
+
+    def sendfile(self, key, file_path, timeout=5, max_try=5, with_timestamp: bool = False,
+                 backoff: float = 0) -> MessageClientRtnData:
+        l_args = [MCTask.SendFile.value, key, file_path]
+        self.logger.info(self._cmd_string(l_args))
+        mcr: MessageClientRtnData = self._run(l_args, timeout=timeout, max_try=max_try, backoff=backoff)
+        self._record_file_bytes('send', mcr, file_path)
         if not with_timestamp:
             return mcr
         else:
@@ -150,10 +197,11 @@ class MessageClient:
                     self.logger.error('send dt key fault')
                 return mcr
 
-    def sendmessage(self, key, message, timeout=5, max_try=5, with_timestamp: bool = False) -> MessageClientRtnData:
-        s_cmd = f'{MCTask.SendMessage.value} "{key}" "{message}"'
-        self.logger.info(s_cmd)
-        mcr = self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
+    def sendmessage(self, key, message, timeout=5, max_try=5, with_timestamp: bool = False,
+                    backoff: float = 0) -> MessageClientRtnData:
+        l_args = [MCTask.SendMessage.value, key, message]
+        self.logger.info(self._cmd_string(l_args))
+        mcr = self._run(l_args, timeout=timeout, max_try=max_try, backoff=backoff)
         if not with_timestamp:
             return mcr
         else:
@@ -166,9 +214,12 @@ class MessageClient:
                     self.logger.error('send dt key fail')
                 return mcr
 
-    def _get_timestamp(self, key, gap) -> None or datetime:
+    def _get_timestamp(self, key, gap, timeout=5, max_try=5) -> None or datetime:
+        """
+        :param gap: None 时不检查时间间隔
+        """
         dt_key = 'dt#' + key
-        dt_mcr = self.getmessage(key=dt_key)
+        dt_mcr = self.getmessage(key=dt_key, timeout=timeout, max_try=max_try)
         if dt_mcr.exception:
             self.logger.error('get timestamp fail')
             return None
@@ -179,7 +230,7 @@ class MessageClient:
             self.logger.error(f'timestamp error {e}')
             return None
         dt_now = datetime.now()
-        if (dt_now - dt_timestamp).seconds > gap:
+        if gap and (dt_now - dt_timestamp).seconds > gap:
             self.logger.info(f'timestamp error,timestamp={dt_timestamp.strftime("%Y%m%d %H%M%S")}')
             return None
         else:
@@ -187,44 +238,209 @@ class MessageClient:
             return dt_timestamp
 
     def getfile(self, key, file_path, timeout=5, max_try=5,
-                with_timestamp_gap: int or None = None) -> MessageClientRtnData or None:
+                with_timestamp_gap: int or None = None, backoff: float = 0,
+                use_cache: bool = True,
+                batch_timestamp_key: str or None = None,
+                batch_timestamp: datetime or None = None) -> MessageClientRtnData or None:
+        """
+        使用缓存时以服务器上的时间戳作为文件版本:
+            默认为 dt#key，只有发送方使用 sendfile(with_timestamp=True) 时才会更新;
+            batch_timestamp_key 不为 None 时以 dt#batch_timestamp_key 为版本（send_many 只更新批次时间戳），
+            batch_timestamp 为调用方已读取的批次时间戳，不再查询 dt#key; batch_timestamp 为 None 时不使用缓存
+        """
         file_path = os.path.abspath(file_path)
-        if not os.path.isdir(os.path.dirname(file_path)):
-            os.makedirs(os.path.dirname(file_path))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-        s_cmd = f'{MCTask.GetFile.value} "{key}" "{file_path}"'
-        self.logger.info(s_cmd)
-        if not with_timestamp_gap:
-            return self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
-        else:
+        if (self._cache is None) or (not use_cache):
+            return self._getfile(key, file_path, timeout, max_try, with_timestamp_gap, backoff)
+
+        # 相同 key 的并发请求合并为一次，其他请求等待结果后复制文件
+        with self._cache_inflight_lock:
+            _future = self._cache_inflight.get(key)
+            _is_owner = _future is None
+            if _is_owner:
+                _future = Future()
+                self._cache_inflight[key] = _future
+        if _is_owner:
+            try:
+                _future.set_result(self._getfile_cached(
+                    key, file_path, timeout, max_try, with_timestamp_gap, backoff,
+                    batch_timestamp_key=batch_timestamp_key, batch_timestamp=batch_timestamp))
+            except Exception as e:
+                _future.set_exception(e)
+            finally:
+                with self._cache_inflight_lock:
+                    self._cache_inflight.pop(key, None)
+            return _future.result()
+        mcr = _future.result()
+        if not mcr:
+            return mcr
+        if (not mcr.exception) and os.path.isfile(mcr.path) and (mcr.path != file_path):
+            shutil.copyfile(mcr.path, file_path)
+        return replace(mcr, path=file_path)
+
+    def _getfile(self, key, file_path, timeout, max_try, with_timestamp_gap, backoff) -> MessageClientRtnData or None:
+        l_args = [MCTask.GetFile.value, key, file_path]
+        self.logger.info(self._cmd_string(l_args))
+        if with_timestamp_gap:
             key_dt = self._get_timestamp(key=key, gap=with_timestamp_gap)
-            if key_dt:
-                return self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
-            else:
+            if not key_dt:
                 return None
+        mcr = self._run(l_args, timeout=timeout, max_try=max_try, backoff=backoff)
+        mcr.path = file_path
+        self._record_file_bytes('get', mcr, file_path)
+        return mcr
+
+    def _record_file_bytes(self, direction, mcr: MessageClientRtnData, file_path):
+        if self._metrics and (not mcr.exception) and os.path.isfile(file_path):
+            self._metrics.counter('mc_file_bytes', direction=direction).inc(os.path.getsize(file_path))
+
+    def _getfile_cached(self, key, file_path, timeout, max_try, with_timestamp_gap, backoff,
+                        batch_timestamp_key: str or None = None, batch_timestamp: datetime or None = None) \
+            -> MessageClientRtnData or None:
+        if batch_timestamp_key:
+            # 批次时间戳已由调用方检查，不再逐个查询 dt#key
+            stamp_key = 'dt#' + batch_timestamp_key
+            dt_timestamp = batch_timestamp
+        else:
+            stamp_key = 'dt#' + key
+            dt_timestamp = self._get_timestamp(key=key, gap=with_timestamp_gap, timeout=timeout, max_try=max_try)
+            if with_timestamp_gap and not dt_timestamp:
+                return None
+        s_timestamp = dt_timestamp.strftime('%Y%m%d %H%M%S') if dt_timestamp else None
+        # 时间戳来自不同的 message key 时（如 dt#key 与 dt#批次）不能比较，按未命中处理;
+        # 缓存文件被删除 / 不完整时按未命中处理，重新下载
+        if s_timestamp and self._cache.restore(key, file_path, timestamp=s_timestamp, stamp_key=stamp_key):
+            self.logger.info(f'{key} 未更新，使用缓存, {stamp_key}={s_timestamp}')
+            if self._metrics:
+                self._metrics.counter('mc_getfile_cache', result='hit').inc()
+            return MessageClientRtnData(datetime=datetime.now(), exception=None, msg='', path=file_path, cached=True)
+
+        l_args = [MCTask.GetFile.value, key, file_path]
+        self.logger.info(self._cmd_string(l_args))
+        mcr = self._run(l_args, timeout=timeout, max_try=max_try, backoff=backoff)
+        mcr.path = file_path
+        self._record_file_bytes('get', mcr, file_path)
+        if self._metrics:
+            self._metrics.counter('mc_getfile_cache', result='miss').inc()
+        # 没有时间戳时无法判断是否更新，不缓存
+        if (not mcr.exception) and s_timestamp and os.path.isfile(file_path):
+            self._cache.put(key, file_path, timestamp=s_timestamp, stamp_key=stamp_key)
+        return mcr
 
     def getmessage(self, key, timeout=5, max_try=5,
-                   with_timestamp_gap: int or None = None) -> MessageClientRtnData or None:
-        s_cmd = f'{MCTask.GetMessage.value} "{key}"'
-        self.logger.info(s_cmd)
+                   with_timestamp_gap: int or None = None, backoff: float = 0) -> MessageClientRtnData or None:
+        l_args = [MCTask.GetMessage.value, key]
+        self.logger.info(self._cmd_string(l_args))
         if not with_timestamp_gap:
-            return self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
+            return self._run(l_args, timeout=timeout, max_try=max_try, backoff=backoff)
         else:
             key_dt = self._get_timestamp(key=key, gap=with_timestamp_gap)
             if key_dt:
-                return self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
+                return self._run(l_args, timeout=timeout, max_try=max_try, backoff=backoff)
             else:
                 return None
 
     def status(self, timeout=5, max_try=5) -> MessageClientRtnData:
-        s_cmd = f'{MCTask.Status.value} '
-        self.logger.info(s_cmd)
-        return self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
+        l_args = [MCTask.Status.value]
+        self.logger.info(self._cmd_string(l_args))
+        return self._run(l_args, timeout=timeout, max_try=max_try)
 
     def clear(self, key, timeout=5, max_try=5) -> MessageClientRtnData:
-        s_cmd = f'{MCTask.Clear.value} "{key}" '
-        self.logger.info(s_cmd)
-        return self._run(cmd=s_cmd, timeout=timeout, max_try=max_try)
+        l_args = [MCTask.Clear.value, key]
+        self.logger.info(self._cmd_string(l_args))
+        return self._run(l_args, timeout=timeout, max_try=max_try)
+
+    # 批量: 有上限的线程池并发运行，返回 { key: MessageClientRtnData or None }
+    def _run_many(self, func, d_items: dict, max_workers=None, **kwargs) -> Dict[str, MessageClientRtnData or None]:
+        if not d_items:
+            return {}
+        max_workers = max_workers if max_workers else self._max_concurrency
+        d_rtn = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(d_items))) as executor:
+            d_future = {_key: executor.submit(func, _key, _value, **kwargs) for _key, _value in d_items.items()}
+            for _key, _future in d_future.items():
+                try:
+                    d_rtn[_key] = _future.result()
+                except Exception as e:
+                    self.logger.error(f'{_key} 运行出错, {repr(e)}')
+                    d_rtn[_key] = MessageClientRtnData(datetime=datetime.now(), exception=RunException.Error, msg=str(e))
+        l_failed = [_key for _key, _mcr in d_rtn.items() if (_mcr is None) or _mcr.exception]
+        self.logger.info(f'完成 {len(d_rtn) - len(l_failed)}/{len(d_rtn)}')
+        if l_failed:
+            self.logger.error(f'失败: {l_failed}')
+        return d_rtn
+
+    def send_many(self, files: Dict[str, str], timeout=5, max_try=5, max_workers=None, backoff: float = 0.5,
+                  batch_timestamp_key: str or None = None) -> Dict[str, MessageClientRtnData]:
+        """
+        :param files: { key: file_path }
+        :param batch_timestamp_key: 全部发送成功后，只发送一次时间戳（而不是每个文件一次）;
+            实际的 message key 为 'dt#' + batch_timestamp_key（与 get_many 相同，不需要自己加 dt#）。
+            有文件发送失败时不发送时间戳，服务器上保留上一次的时间戳。
+        """
+        d_rtn = self._run_many(
+            self.sendfile, files, max_workers=max_workers, timeout=timeout, max_try=max_try, backoff=backoff)
+        if batch_timestamp_key and d_rtn:
+            l_failed = [_key for _key, _mcr in d_rtn.items() if _mcr.exception]
+            if l_failed:
+                self.logger.error(
+                    f'{len(l_failed)} 个文件发送失败, 没有发送批次时间戳 dt#{batch_timestamp_key}, '
+                    f'服务器上仍为上一次的时间戳')
+                return d_rtn
+            mcr_dt = self.sendmessage(
+                key='dt#' + batch_timestamp_key, message=datetime.now().strftime('%Y%m%d %H%M%S'),
+                timeout=timeout, max_try=max_try, backoff=backoff)
+            if mcr_dt.exception:
+                self.logger.error(f'send dt key fail, dt#{batch_timestamp_key}')
+        return d_rtn
+
+    def get_many(self, files: Dict[str, str], timeout=5, max_try=5, max_workers=None, backoff: float = 0.5,
+                 batch_timestamp_key: str or None = None,
+                 with_timestamp_gap: int or None = None) -> Dict[str, MessageClientRtnData or None]:
+        """
+        :param files: { key: file_path }
+        :param batch_timestamp_key: 只读取一次批次时间戳，不再逐个查询 dt#key;
+            与 with_timestamp_gap 一起使用时，检查不通过全部不下载（返回 { key: None }）;
+            使用缓存时以批次时间戳作为每个文件的版本;
+            实际的 message key 为 'dt#' + batch_timestamp_key（与 send_many 相同，不需要自己加 dt#）
+        """
+        d_kwargs = {}
+        if batch_timestamp_key:
+            dt_batch = None
+            if with_timestamp_gap or (self._cache is not None):
+                dt_batch = self._get_timestamp(
+                    key=batch_timestamp_key, gap=with_timestamp_gap, timeout=timeout, max_try=max_try)
+                if with_timestamp_gap and not dt_batch:
+                    return {_key: None for _key in files}
+            with_timestamp_gap = None
+            d_kwargs = dict(batch_timestamp_key=batch_timestamp_key, batch_timestamp=dt_batch)
+        return self._run_many(
+            self.getfile, files, max_workers=max_workers, timeout=timeout, max_try=max_try, backoff=backoff,
+            with_timestamp_gap=with_timestamp_gap, **d_kwargs)
+
+    # asyncio: 在线程池中运行，多个请求可以同时进行
+    async def _run_async(self, func, *args, **kwargs):
+        import asyncio
+        return await asyncio.get_event_loop().run_in_executor(
+            self._get_executor(), functools.partial(func, *args, **kwargs))
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        return self._executor
+
+    async def sendfile_async(self, key, file_path, **kwargs) -> MessageClientRtnData:
+        return await self._run_async(self.sendfile, key, file_path, **kwargs)
+
+    async def sendmessage_async(self, key, message, **kwargs) -> MessageClientRtnData:
+        return await self._run_async(self.sendmessage, key, message, **kwargs)
+
+    async def getfile_async(self, key, file_path, **kwargs) -> MessageClientRtnData or None:
+        return await self._run_async(self.getfile, key, file_path, **kwargs)
+
+    async def getmessage_async(self, key, **kwargs) -> MessageClientRtnData or None:
+        return await self._run_async(self.getmessage, key, **kwargs)
 
 
 
@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Dict
+
+
+def file_md5(path, chunk_size=1024 * 1024) -> str:
+    _md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for _chunk in iter(lambda: f.read(chunk_size), b''):
+            _md5.update(_chunk)
+    return _md5.hexdigest()
+
+
+class FileCache:
+    """
+    MessageClient.getfile 的本地缓存，每个 key 一个文件夹:
+        folder/<md5(key)>/data          最近一次下载的文件
+        folder/<md5(key)>/meta.json     {key, timestamp, stamp_key, md5, size, last_used}
+    timestamp 为下载时校验的服务器时间戳，stamp_key 为该时间戳所在的 message key（dt#key 或 dt#批次），
+    两者都相同时才命中。
+    总大小超过 max_bytes 时，按 last_used 删除最久未使用的 key。
+    """
+    DataFileName = 'data'
+    MetaFileName = 'meta.json'
+
+    def __init__(self, folder, max_bytes: int = 1024 * 1024 * 1024):
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        self._entries: Dict[str, dict] = self._load_entries()
+
+    def _entry_folder(self, key) -> str:
+        return os.path.join(self.folder, hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def _load_entries(self) -> Dict[str, dict]:
+        d_entries = {}
+        for _entry in os.scandir(self.folder):
+            _p_meta = os.path.join(_entry.path, self.MetaFileName)
+            if not (_entry.is_dir() and os.path.isfile(_p_meta)):
+                continue
+            try:
+                with open(_p_meta, encoding='utf-8') as f:
+                    _meta = json.load(f)
+            except Exception:
+                continue
+            if os.path.isfile(os.path.join(_entry.path, self.DataFileName)):
+                d_entries[_meta['key']] = _meta
+        return d_entries
+
+    def _write_meta(self, meta: dict):
+        _p_meta = os.path.join(self._entry_folder(meta['key']), self.MetaFileName)
+        with open(_p_meta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(_p_meta + '.tmp', _p_meta)
+
+    def get(self, key) -> dict or None:
+        with self._lock:
+            _meta = self._entries.get(key)
+            return dict(_meta) if _meta else None
+
+    def data_path(self, key) -> str:
+        return os.path.join(self._entry_folder(key), self.DataFileName)
+
+    def restore(self, key, dst, timestamp: str, stamp_key: str or None = None) -> bool:
+        """
+        缓存中 key 的时间戳为 timestamp 且来自 stamp_key 时，复制到 dst（dst 内容相同时不复制），返回是否命中;
+        缓存文件不存在或大小与 meta 不一致时删除该 key，返回 False。
+        在锁中复制，不会被其他 key 的 put / 删除打断。
+        """
+        with self._lock:
+            _meta = self._entries.get(key)
+            if (not _meta) or (_meta['timestamp'] != timestamp) or (_meta.get('stamp_key') != stamp_key):
+                return False
+            _p_data = self.data_path(key)
+            if not (os.path.isfile(_p_data) and os.path.getsize(_p_data) == _meta['size']):
+                shutil.rmtree(self._entry_folder(key), ignore_errors=True)
+                self._entries.pop(key)
+                return False
+            if not (os.path.isfile(dst) and os.path.getsize(dst) == _meta['size'] and file_md5(dst) == _meta['md5']):
+                shutil.copyfile(_p_data, dst)
+            _meta['last_used'] = time.time()
+            self._write_meta(_meta)
+            return True
+
+    def touch(self, key):
+        with self._lock:
+            _meta = self._entries.get(key)
+            if _meta:
+                _meta['last_used'] = time.time()
+                self._write_meta(_meta)
+
+    def put(self, key, src_path, timestamp: str, stamp_key: str or None = None) -> dict:
+        """复制 src_path 到缓存，返回 meta"""
+        # 临时文件放在 key 文件夹之外，复制过程中该 key 被删除(_evict)也不受影响
+        _p_tmp = self._entry_folder(key) + '.tmp'
+        shutil.copyfile(src_path, _p_tmp)
+        _meta = {
+            'key': key, 'timestamp': timestamp, 'stamp_key': stamp_key, 'md5': file_md5(_p_tmp),
+            'size': os.path.getsize(_p_tmp), 'last_used': time.time(),
+        }
+        with self._lock:
+            os.makedirs(self._entry_folder(key), exist_ok=True)
+            os.replace(_p_tmp, self.data_path(key))
+            self._write_meta(_meta)
+            self._entries[key] = _meta
+            self._evict(keep=key)
+        return dict(_meta)
+
+    def _evict(self, keep=None):
+        _total = sum([_meta['size'] for _meta in self._entries.values()])
+        for _meta in sorted(self._entries.values(), key=lambda x: x['last_used']):
+            if _total <= self.max_bytes:
+                break
+            if _meta['key'] == keep:
+                continue
+            shutil.rmtree(self._entry_folder(_meta['key']), ignore_errors=True)
+            self._entries.pop(_meta['key'])
+            _total -= _meta['size']
@@ -1,4 +1,6 @@
 import os
+from operator import itemgetter
+from typing import Dict, List, Iterator, Tuple
 
 
 class HeaderCsvReader:
@@ -6,53 +8,86 @@ class HeaderCsvReader:
     key, valueA, valueB,...
     读取有header的csv，返回 dict
         {
-            key1: {valuesA: valuesA1, valuesB: valuesB1}, 
+            key1: {valuesA: valuesA1, valuesB: valuesB1},
             key2: {}
-        }    
+        }
+
+    逐行读取，只取出 key / values 列（itemgetter 投影），空行跳过;
+        .read()             -> { key: { value: str } }
+        .read_columns()     -> { key/value: [str] }         列式
+        .iter_rows()        -> (key, (value1, value2, ...))  逐行，内存占用与文件大小无关
     """
-    def __init__(self, key: str, values: list):
+    def __init__(self, key: str, values: list, set_header=None, encoding='utf-8'):
+        """
+        :param set_header: 文件没有header时，指定列名
+        """
         if (type(key) != str) or (type(values) != list):
             raise ValueError
         self.key = key
         self.values = values
-    
-    def read(self, path) -> dict:
-        path = os.path.abspath(path)
-        if not os.path.isfile(path):
-            raise FileExistsError
+        self.set_header = set_header
+        self.encoding = encoding
 
-        with open(path, encoding='utf-8') as f:
-            l_lines = f.readlines()
-        if len(l_lines) < 1:
-            print('数据有误：%s' % path)
-            raise Exception
-
-        # 读取header，定位index
-        header = l_lines[0].strip().replace(' ', '').split(',')
+    def _gen_getter(self, header: list):
+        """定位 index，返回 row -> (key, value1, value2, ...)"""
         try:
             key_index = header.index(self.key)
-        except:
+        except ValueError:
             print('数据有误,不存在 key：%s' % self.key)
             raise Exception
         try:
-            values_index = {
-                value: header.index(value)
-                for value in self.values
-            }
-        except:
+            values_index = [header.index(value) for value in self.values]
+        except ValueError:
             print('header:\t', header)
             print('数据有误,不存在value行：%s' % self.values)
             raise Exception
+        _getter = itemgetter(key_index, *values_index)
+        if not values_index:
+            # itemgetter 单个参数时返回值而不是tuple
+            return lambda row: (_getter(row),)
+        return _getter
+
+    def _iter_projected(self, path) -> Iterator[tuple]:
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            raise FileExistsError
+
+        with open(path, encoding=self.encoding) as f:
+            # 读取header，定位index
+            if self.set_header:
+                header = list(self.set_header)
+            else:
+                line = f.readline()
+                if not line:
+                    print('数据有误：%s' % path)
+                    raise Exception
+                header = line.strip().replace(' ', '').split(',')
+            _getter = self._gen_getter(header)
 
-        # 读取信息
+            # 读取信息
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                yield _getter(line.split(','))
+
+    def iter_rows(self, path) -> Iterator[Tuple[str, tuple]]:
+        for _row in self._iter_projected(path):
+            yield _row[0], _row[1:]
+
+    def read(self, path) -> Dict[str, Dict[str, str]]:
+        _values = self.values
         d_data = {}
-        for line in l_lines[1:]:
-            line = line.strip()
-            line_split = line.split(',')
-            key_str = line_split[key_index]
-            value_dict = {
-                value: line_split[value_index]
-                for value, value_index in values_index.items()
-            }
-            d_data[key_str] = value_dict
+        for _row in self._iter_projected(path):
+            d_data[_row[0]] = dict(zip(_values, _row[1:]))
         return d_data
+
+    def read_columns(self, path) -> Dict[str, List[str]]:
+        """列式读取，{ key列名: [...], value列名: [...] }"""
+        _names = [self.key] + self.values
+        _columns = [[] for _ in _names]
+        _appends = [_column.append for _column in _columns]
+        for _row in self._iter_projected(path):
+            for _append, _value in zip(_appends, _row):
+                _append(_value)
+        return dict(zip(_names, _columns))
@@ -4,4 +4,5 @@
 # @File    : __init__.py.py
 
 from .rebuild import rebuild_structure
-from .fileconcat import DataFileConcator, FileMatch
\ No newline at end of file
+from .fileconcat import DataFileConcator, FileMatch
+from .plan import FilePlan, PlanOperation, plan_rebuild_structure, plan_concat
\ No newline at end of file
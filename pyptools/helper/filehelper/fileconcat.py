@@ -6,10 +6,15 @@ import shutil
 """
 
 import os
+import heapq
+import pickle
+import tempfile
 import datetime
+from operator import itemgetter, attrgetter
 from collections import namedtuple, defaultdict
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
 import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # from .csvreader import HeaderCsvReader
 
@@ -21,63 +26,145 @@ FileRelpathInfo = namedtuple(
 
 
 class FileMatch:
+    """
+    查找多个目录下的文件并配对
+        目录使用 os.scandir 遍历，一次遍历得到 relpath, filename, foldername;
+        多个目录并行遍历;
+        可选 index_path: 保存目录列表（pickle），下次运行时 mtime 未变化的目录不重新列出。
+            目录的 mtime 只在其中的文件/子目录增删、改名时变化，文件内容的修改不影响配对。
+    """
+    IndexVersion = 1
+
     def __init__(
             self,
             paths: list,
             match_method='filename',
             exist: bool = False,
+            index_path=None,
+            max_workers: int or None = None,
     ):
         """
         :param paths:
         :param match_method: str {'relpath', 'filename', 'foldername'}
+        :param index_path: 可选，目录列表的缓存文件
+        :param max_workers: 并行遍历的目录数量，默认 len(paths)
         """
         self._paths = paths
         self._match_method = match_method
         self._exist: bool = exist
+        self._index_path = index_path
+        self._max_workers = max_workers
 
     @classmethod
-    def _get_file_path_info(cls, path) -> List[FileRelpathInfo]:
+    def _scan(cls, path, cached_dirs: dict or None = None) -> (List[FileRelpathInfo], dict):
         """
+        遍历 path，返回 (文件信息, 目录列表)
+        目录列表: { 目录relpath: (mtime_ns, [文件名], [子目录名]) }, 根目录的 relpath 为 ''
+        cached_dirs 中 mtime 相同的目录直接使用缓存的列表
         """
+        cached_dirs = cached_dirs if cached_dirs else {}
         l_infos = []
-        for root, dirs, files in os.walk(path, topdown=True):
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-                file_relpath = os.path.relpath(path=file_path, start=path)
-                file_folder = os.path.basename(root)
+        d_dirs = {}
+        _root_foldername = os.path.basename(path)
+        l_stack = ['']
+        while l_stack:
+            _rel_dir = l_stack.pop()
+            _dir = os.path.join(path, _rel_dir) if _rel_dir else path
+            try:
+                _mtime = os.stat(_dir).st_mtime_ns
+            except OSError:
+                continue
+            _cached = cached_dirs.get(_rel_dir)
+            if _cached and _cached[0] == _mtime:
+                l_files, l_sub_dirs = _cached[1], _cached[2]
+            else:
+                l_files, l_sub_dirs = [], []
+                try:
+                    with os.scandir(_dir) as it:
+                        for entry in it:
+                            if entry.is_dir():
+                                # 与 os.walk 一致, 不进入链接的目录
+                                if not entry.is_symlink():
+                                    l_sub_dirs.append(entry.name)
+                            else:
+                                l_files.append(entry.name)
+                except OSError:
+                    continue
+            d_dirs[_rel_dir] = (_mtime, l_files, l_sub_dirs)
+
+            _foldername = os.path.basename(_rel_dir) if _rel_dir else _root_foldername
+            for file_name in l_files:
+                file_relpath = os.path.join(_rel_dir, file_name) if _rel_dir else file_name
                 l_infos.append(
                     FileRelpathInfo(
-                        path=file_path,
+                        path=os.path.join(_dir, file_name),
                         relpath=file_relpath,
-                        foldername=file_folder,
+                        foldername=_foldername,
                         filename=file_name
                     )
                 )
-        return l_infos
+            for _name in reversed(l_sub_dirs):
+                l_stack.append(os.path.join(_rel_dir, _name) if _rel_dir else _name)
+        return l_infos, d_dirs
+
+    @classmethod
+    def _get_file_path_info(cls, path) -> List[FileRelpathInfo]:
+        """
+        """
+        return cls._scan(path)[0]
+
+    def _load_index(self) -> dict:
+        if not (self._index_path and os.path.isfile(self._index_path)):
+            return {}
+        try:
+            with open(self._index_path, 'rb') as f:
+                _index = pickle.load(f)
+        except Exception:
+            return {}
+        if type(_index) is not dict or _index.get('version') != self.IndexVersion:
+            return {}
+        return _index['roots']
+
+    def _dump_index(self, d_roots: dict):
+        _p_folder = os.path.dirname(os.path.abspath(self._index_path))
+        os.makedirs(_p_folder, exist_ok=True)
+        _p_tmp = self._index_path + '.tmp'
+        with open(_p_tmp, 'wb') as f:
+            pickle.dump({'version': self.IndexVersion, 'roots': d_roots}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(_p_tmp, self._index_path)
+
+    def get_file_path_infos(self) -> Dict[str, List[FileRelpathInfo]]:
+        """{ path: [FileRelpathInfo] }"""
+        d_cached = self._load_index()
+        _max_workers = self._max_workers if self._max_workers else max(len(self._paths), 1)
+        with ThreadPoolExecutor(max_workers=_max_workers) as executor:
+            d_future = {
+                path: executor.submit(self._scan, path, d_cached.get(os.path.abspath(path)))
+                for path in self._paths
+            }
+        d_infos = {}
+        d_roots = dict(d_cached)
+        for path, _future in d_future.items():
+            d_infos[path], d_roots[os.path.abspath(path)] = _future.result()
+        if self._index_path:
+            self._dump_index(d_roots)
+        return d_infos
 
     def gen_match(self) -> (Dict[str, Dict[str, list]], bool):
         """
 
         :return:
         """
-        d_infos = dict()
-        for path in self._paths:
-            d_infos[path] = self._get_file_path_info(path)
+        if self._match_method not in FileRelpathInfo._fields:
+            raise ValueError(self._match_method)
+        d_infos = self.get_file_path_infos()
 
         # 生成配对
         d_match = defaultdict(lambda: defaultdict(list))
-        if self._match_method == 'filename':
-            for root_path, infos_list in d_infos.items():
-                for file_info in infos_list:
-                    d_match[file_info.filename][root_path].append(file_info)
-        elif self._match_method == 'foldername':
-            for root_path, infos_list in d_infos.items():
-                for file_info in infos_list:
-                    d_match[file_info.foldername][root_path].append(file_info)
-        elif self._match_method == 'relpath':
-            for root_path, infos_list in d_infos.items():
-                for file_info in infos_list:
-                    d_match[file_info.relpath][root_path].append(file_info)
+        _get_key = attrgetter(self._match_method)
+        for root_path, infos_list in d_infos.items():
+            for file_info in infos_list:
+                d_match[_get_key(file_info)][root_path].append(file_info)
 
         # 必须 是否唯一
         error = False
@@ -85,7 +172,7 @@ class FileMatch:
             for root_name, l_file_path in _.items():
                 if len(l_file_path) > 1:
                     error = True
-                    print('文件匹配，不唯一: %s' % '; '.join(l_file_path))
+                    print('文件匹配，不唯一: %s' % '; '.join([_info.path for _info in l_file_path]))
 
         # 是否存在
         if self._exist:
@@ -101,6 +188,271 @@ class FileMatch:
             return d_match, False
 
 
+# ---------------------------------------------------------------------------------------------------------
+# 流式合并
+#   每个文件按 key 排序、去重（相同 key 保留最后一行）后，逐行归并输出，内存占用与文件大小无关。
+#   文件已按 key 排序时直接逐行读取; 否则外部排序: 每 chunk_lines 行排序后写入临时文件，再 k 路归并。
+# ---------------------------------------------------------------------------------------------------------
+
+def _line_key(line: str, data_key_num: int, data_sperator: str) -> str:
+    return line.split(data_sperator)[data_key_num - 1]
+
+
+def _read_header(p, has_header) -> str:
+    if not has_header:
+        return ''
+    with open(p) as f:
+        return f.readline().strip()
+
+
+def _iter_file_records(p, data_key_num, has_header, data_sperator) -> Iterator[Tuple[str, str]]:
+    """逐行读取 (key, line)，跳过 header 和空行"""
+    with open(p) as f:
+        if has_header:
+            f.readline()
+        for line in f:
+            line = line.strip()
+            if line == '':
+                continue
+            yield _line_key(line, data_key_num, data_sperator), line
+
+
+def _is_sorted_by_key(p, data_key_num, has_header, data_sperator) -> bool:
+    _last = None
+    for _k, _ in _iter_file_records(p, data_key_num, has_header, data_sperator):
+        if _last is not None and _k < _last:
+            return False
+        _last = _k
+    return True
+
+
+def _external_sort(
+        records: Iterator[Tuple[str, str]], data_key_num, data_sperator, chunk_lines: int, temp_folder=None
+) -> Iterator[Tuple[str, str]]:
+    """分块排序写入临时文件，再 k 路归并; 排序稳定，相同 key 保持原文件中的先后顺序"""
+    l_chunk_files = []
+    try:
+        _chunk = []
+        for _record in records:
+            _chunk.append(_record)
+            if len(_chunk) >= chunk_lines:
+                l_chunk_files.append(_write_sorted_chunk(_chunk, temp_folder))
+                _chunk = []
+        if _chunk:
+            l_chunk_files.append(_write_sorted_chunk(_chunk, temp_folder))
+            _chunk = []
+
+        l_f = [open(_p) for _p in l_chunk_files]
+        try:
+            l_iters = [
+                ((_line_key(line, data_key_num, data_sperator), line) for line in (_.rstrip('\n') for _ in f))
+                for f in l_f
+            ]
+            for _record in heapq.merge(*l_iters, key=itemgetter(0)):
+                yield _record
+        finally:
+            for f in l_f:
+                f.close()
+    finally:
+        for _p in l_chunk_files:
+            if os.path.isfile(_p):
+                os.remove(_p)
+
+
+def _write_sorted_chunk(chunk: List[Tuple[str, str]], temp_folder=None) -> str:
+    chunk.sort(key=itemgetter(0))
+    _fd, _p = tempfile.mkstemp(prefix='FileConcat.', suffix='.tmp', dir=temp_folder)
+    with os.fdopen(_fd, 'w') as f:
+        for _, line in chunk:
+            f.write(line + '\n')
+    return _p
+
+
+def _unique_keep_last(records: Iterator[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+    """已排序的 records，相同 key 只保留最后一个（与读入 dict 时的覆盖一致）"""
+    _last = None
+    for _record in records:
+        if _last is not None and _record[0] != _last[0]:
+            yield _last
+        _last = _record
+    if _last is not None:
+        yield _last
+
+
+def _iter_sorted_unique(p, data_key_num, has_header, data_sperator, chunk_lines, temp_folder=None):
+    _records = _iter_file_records(p, data_key_num, has_header, data_sperator)
+    if not _is_sorted_by_key(p, data_key_num, has_header, data_sperator):
+        _records = _external_sort(_records, data_key_num, data_sperator, chunk_lines, temp_folder)
+    return _unique_keep_last(_records)
+
+
+def _merge_sorted_unique(base, insert, prefer_insert: bool) -> Iterator[Tuple[str, str]]:
+    """两个已排序、无重复 key 的序列归并; 相同 key 时取 base 或 insert"""
+    _none = (None, None)
+    _b = next(base, _none)
+    _i = next(insert, _none)
+    while _b is not _none and _i is not _none:
+        if _b[0] < _i[0]:
+            yield _b
+            _b = next(base, _none)
+        elif _i[0] < _b[0]:
+            yield _i
+            _i = next(insert, _none)
+        else:
+            yield _i if prefer_insert else _b
+            _b = next(base, _none)
+            _i = next(insert, _none)
+    while _b is not _none:
+        yield _b
+        _b = next(base, _none)
+    while _i is not _none:
+        yield _i
+        _i = next(insert, _none)
+
+
+def _concat_files_in_memory(
+        path_base, path_insert, path_file_output,
+        data_key_num, has_header, data_sperator, sort_by_key, concat_method,
+) -> (str or None, List[str]):
+    """
+    读取 合并 输出 一组文件，返回 (最大的key, 错误信息)
+    不使用 logger，可以在进程池中运行
+    """
+    l_errors = []
+
+    def _read_file_data(p) -> (Dict[str, str], str) or (None, None):
+        with open(p) as f:
+            l_lines = f.readlines()
+        if len(l_lines) < 1:
+            return None, None
+        header = ''
+        if has_header:
+            header = l_lines[0]
+            l_lines = l_lines[1:]
+
+        d_data = {}
+        for line in l_lines:
+            line = line.strip()
+            if line == '':
+                continue
+            _k = line.split(data_sperator)[data_key_num-1]
+            d_data[_k] = line
+        return d_data, header
+
+    d_base_file_line, header = _read_file_data(path_base)
+    if not d_base_file_line:
+        l_errors.append('文件读取失败 %s' % path_base)
+        return None, l_errors
+
+    if path_insert is None:
+        d_insert_file_line = {}
+    else:
+        d_insert_file_line, _ = _read_file_data(path_insert)
+        if not d_insert_file_line:
+            l_errors.append('文件读取失败: %s' % path_insert)
+
+    # 【3】合并 / 输出
+    os.makedirs(os.path.dirname(path_file_output), exist_ok=True)
+    if concat_method == 'base' or concat_method == 'insert':
+        if concat_method == 'base':
+            base_key = list(d_base_file_line.keys()).copy()
+            if d_insert_file_line:
+                for k, v in d_insert_file_line.items():
+                    if k not in base_key:
+                        d_base_file_line[k] = v
+        elif concat_method == 'insert':
+            d_base_file_line.update(d_insert_file_line)
+
+        # 输出
+        if sort_by_key:
+            _keys = sorted(d_base_file_line)
+        else:
+            _keys = d_base_file_line.keys()
+        l_output_lines = []
+        if header:
+            l_output_lines.append(header + '\n')
+        for k in _keys:
+            l_output_lines.append(d_base_file_line[k] + '\n')
+        with open(path_file_output, 'w', encoding='utf-8') as f:
+            f.writelines(l_output_lines)
+        return max(_keys), l_errors
+    elif concat_method == 'all':
+        l_output_lines = []
+        if header:
+            l_output_lines.append(header + '\n')
+
+        if sort_by_key:
+            _keys_base = sorted(d_base_file_line)
+            _keys_insert = sorted(d_insert_file_line)
+
+        else:
+            _keys_base = d_base_file_line.keys()
+            _keys_insert = d_insert_file_line.keys()
+        for k in _keys_base:
+            l_output_lines.append(d_base_file_line[k] + '\n')
+        for k in _keys_insert:
+            l_output_lines.append(d_insert_file_line[k] + '\n')
+        with open(path_file_output, 'w', encoding='utf-8') as f:
+            f.writelines(l_output_lines)
+        return max(max(_keys_base, _keys_insert)), l_errors
+
+
+def _concat_files_streaming(
+        path_base, path_insert, path_file_output,
+        data_key_num, has_header, data_sperator, concat_method, chunk_lines, temp_folder=None,
+) -> (str or None, List[str]):
+    """
+    与 _concat_files_in_memory 相同的合并规则，逐行归并输出:
+        base:   相同 key 取 base
+        insert: 相同 key 取 insert
+        all:    base 全部 + insert 全部
+    先写入 .tmp 文件，完成后替换
+    """
+    l_errors = []
+
+    def _iter(p):
+        return _iter_sorted_unique(p, data_key_num, has_header, data_sperator, chunk_lines, temp_folder)
+
+    def _has_data(p) -> bool:
+        _records = _iter_file_records(p, data_key_num, has_header, data_sperator)
+        try:
+            return next(_records, None) is not None
+        finally:
+            _records.close()
+
+    if not _has_data(path_base):
+        l_errors.append('文件读取失败 %s' % path_base)
+        return None, l_errors
+    if path_insert is not None and not _has_data(path_insert):
+        l_errors.append('文件读取失败: %s' % path_insert)
+        path_insert = None
+    header = _read_header(path_base, has_header)
+
+    if concat_method == 'all':
+        l_records = [_iter(path_base)]
+        if path_insert is not None:
+            l_records.append(_iter(path_insert))
+    elif path_insert is None:
+        l_records = [_iter(path_base)]
+    else:
+        l_records = [_merge_sorted_unique(
+            _iter(path_base), _iter(path_insert), prefer_insert=(concat_method == 'insert'))]
+
+    os.makedirs(os.path.dirname(path_file_output), exist_ok=True)
+    path_tmp = path_file_output + '.tmp'
+    last_key = None
+    with open(path_tmp, 'w', encoding='utf-8') as f:
+        if header:
+            f.write(header + '\n')
+        for _records in l_records:
+            for _k, line in _records:
+                f.write(line + '\n')
+                if last_key is None or _k > last_key:
+                    last_key = _k
+    os.replace(path_tmp, path_file_output)
+    return last_key, l_errors
+
+
 class DataFileConcator:
     CONCAT_METHOD_OPTIONS = ['base', 'insert', 'all']
     MATCH_METHOD_OPTIONS = ['relpath', 'filename', 'foldername']
@@ -119,6 +471,8 @@ class DataFileConcator:
         self._insert_path = os.path.abspath(path_insert_folder)
         self._output_path = os.path.abspath(path_output)
         self._logger = logger
+        # 最近一次 concat 中失败的文件组, { 匹配key: 错误信息 }
+        self.failed: Dict[str, str] = {}
 
     """
     如何匹配文件：
@@ -136,6 +490,47 @@ class DataFileConcator:
     2 头部
     """
 
+    def gen_tasks(
+            self, match_method="foldername", match_index_path=None, pause_on_error=True,
+    ) -> Dict[str, Tuple[str, str or None, str]]:
+        """
+        查找、配对文件，生成每个文件组的任务
+        :return: { key: (path_base, path_insert, path_file_output) }, path_insert 可能为 None
+        """
+        # 【1】查找文件
+        # d_match: { match_method_A: { rootA: [fileA, fileB], rootB: [fileA, fielB], }, }
+        d_match, is_error = FileMatch(
+            paths=[self._base_path, self._insert_path],
+            match_method=match_method,
+            index_path=match_index_path,
+        ).gen_match()
+        # 不唯一
+        if is_error:
+            self._logger.error('文件匹配不唯一')
+            if pause_on_error:
+                self._logger.info('暂停,请查看')
+                os.system('pause')
+
+        # 【2】生成 每个文件组的任务
+        d_tasks = {}
+        for key, match_group in d_match.items():
+            # 2个文件的信息
+            if self._base_path not in match_group.keys():
+                self._logger.warning(f'此Key文件只存在于 insert 中，不存在于 base 中: {key}')
+                continue
+            base_file_info: FileRelpathInfo = match_group[self._base_path][0]
+            if self._insert_path not in match_group.keys():
+                self._logger.warning(f'此Key文件只存在于 base 中，不存在于 insert 中: {key}')
+                insert_file_info = None
+            else:
+                insert_file_info: FileRelpathInfo = match_group[self._insert_path][0]
+            d_tasks[key] = (
+                base_file_info.path,
+                insert_file_info.path if insert_file_info else None,
+                os.path.join(self._output_path, base_file_info.relpath),
+            )
+        return d_tasks
+
     def concat(
             self,
             data_key_num: int,
@@ -144,124 +539,96 @@ class DataFileConcator:
             data_sperator: str = ",",
             match_method="foldername",  # 文件匹配方式，
             concat_method="base",       # 合并方法
+            streaming=False,
+            chunk_lines: int = 1000000,
+            temp_folder=None,
+            max_workers: int = 1,
+            use_process=False,
+            pause_on_error=True,
+            match_index_path=None,
     ) -> dict:
         """
 
         :param match_method: str {'relpath', 'filename', 'foldername'}
         :param concat_method: str {'base', 'insert', 'all'}
+        :param streaming: 流式合并（用于大文件），输出总是按 key 排序，内存占用与文件大小无关
+        :param chunk_lines: streaming 时，文件未按 key 排序则外部排序，每个临时文件的行数
+        :param temp_folder: 外部排序的临时文件目录，默认系统临时目录
+        :param max_workers: 同时处理的文件组数量; 各文件组相互独立，>1 时并行处理
+        :param use_process: 并行时使用进程池（解析为主、CPU密集）, 否则使用线程池（IO为主）
+        :param pause_on_error: 文件匹配不唯一时是否暂停; 单个文件组出错时只记录到 .failed，不影响其他文件组
+        :param match_index_path: 可选，FileMatch 的目录列表缓存文件
         :return:
 
         match_method : str {'relpath', 'filename', 'foldername'}
 
         """
-
-        def _read_file_data(p) -> (Dict[str, str], str) or (None, None):
-            with open(p) as f:
-                l_lines = f.readlines()
-            if len(l_lines) < 1:
-                return None, None
-            header = ''
-            if has_header:
-                header = l_lines[0]
-                l_lines = l_lines[1:]
-
-            d_data = {}
-            for line in l_lines:
-                line = line.strip()
-                if line == '':
-                    continue
-                _k = line.split(data_sperator)[data_key_num-1]
-                d_data[_k] = line
-            return d_data, header
-
         if concat_method not in self.CONCAT_METHOD_OPTIONS:
             print('FileConcator Error, arg "concat_method" not in %s' % self.CONCAT_METHOD_OPTIONS)
             raise Exception
         if match_method not in self.MATCH_METHOD_OPTIONS:
             print('FileConcator Error, arg "match_method" not in %s' % self.MATCH_METHOD_OPTIONS)
             raise Exception
+        if streaming and not sort_by_key:
+            self._logger.warning('streaming 模式总是按 key 排序输出')
+
+        d_tasks = self.gen_tasks(
+            match_method=match_method, match_index_path=match_index_path, pause_on_error=pause_on_error)
+
+        # 【3】读取 合并 输出
+        if streaming:
+            _func = _concat_files_streaming
+            _kwargs = dict(
+                data_key_num=data_key_num, has_header=has_header, data_sperator=data_sperator,
+                concat_method=concat_method, chunk_lines=chunk_lines, temp_folder=temp_folder,
+            )
+        else:
+            _func = _concat_files_in_memory
+            _kwargs = dict(
+                data_key_num=data_key_num, has_header=has_header, data_sperator=data_sperator,
+                sort_by_key=sort_by_key, concat_method=concat_method,
+            )
 
-        # 【1】查找文件
-        # d_match: { match_method_A: { rootA: [fileA, fileB], rootB: [fileA, fielB], }, }
-        d_match, is_error = FileMatch(
-            paths=[self._base_path, self._insert_path],
-            match_method=match_method,
-        ).gen_match()
-        # 不唯一
-        if is_error:
-            self._logger.error('文件匹配不唯一')
-            self._logger.info('暂停,请查看')
-            os.system('pause')
-
-        # 【2】遍历 读取 文件
         file_last_key = {}
-        for key, match_group in d_match.items():
-            # 2个文件的信息
-            if self._base_path not in match_group.keys():
-                self._logger.warning(f'此Key文件只存在于 insert 中，不存在于 base 中: {key}')
-                continue
-            base_file_info: FileRelpathInfo = match_group[self._base_path][0]
-            d_base_file_line, header = _read_file_data(base_file_info.path)
-            if not d_base_file_line:
-                self._logger.error('文件读取失败 %s' % base_file_info.path)
-                continue
-
-            if self._insert_path not in match_group.keys():
-                self._logger.warning(f'此Key文件只存在于 base 中，不存在于 insert 中: {key}')
-                # continue
-                d_insert_file_line = {}
-            else:
-                insert_file_info: FileRelpathInfo = match_group[self._insert_path][0]
-                d_insert_file_line, _ = _read_file_data(insert_file_info.path)
-                if not d_insert_file_line:
-                    self._logger.error('文件读取失败: %s' % insert_file_info.path)
-                    # continue
-
-            # 【3】合并 / 输出
-            path_file_output = os.path.join(self._output_path, base_file_info.relpath)
-            if not os.path.isdir(os.path.dirname(path_file_output)):
-                os.makedirs(os.path.dirname(path_file_output))
-            if concat_method == 'base' or concat_method == 'insert':
-                if concat_method == 'base':
-                    base_key = list(d_base_file_line.keys()).copy()
-                    if d_insert_file_line:
-                        for k, v in d_insert_file_line.items():
-                            if k not in base_key:
-                                d_base_file_line[k] = v
-                elif concat_method == 'insert':
-                    d_base_file_line.update(d_insert_file_line)
-
-                # 输出
-                if sort_by_key:
-                    _keys = sorted(d_base_file_line)
-                else:
-                    _keys = d_base_file_line.keys()
-                l_output_lines = []
-                if header:
-                    l_output_lines.append(header + '\n')
-                for k in _keys:
-                    l_output_lines.append(d_base_file_line[k] + '\n')
-                with open(path_file_output, 'w', encoding='utf-8') as f:
-                    f.writelines(l_output_lines)
-                file_last_key[path_file_output] = max(_keys)
-            elif concat_method == 'all':
-                l_output_lines = []
-                if header:
-                    l_output_lines.append(header + '\n')
-
-                if sort_by_key:
-                    _keys_base = sorted(d_base_file_line)
-                    _keys_insert = sorted(d_insert_file_line)
-
+        self.failed = {}
+        _n_total = len(d_tasks)
+        _n_progress = max(_n_total // 20, 1)
+        _n_done = 0
+
+        def _on_done(_key, _result, _error):
+            nonlocal _n_done
+            _n_done += 1
+            _last_key = None
+            if _result is not None:
+                _last_key, l_errors = _result
+                for _msg in l_errors:
+                    self._logger.error(_msg)
+            if _error is not None:
+                self.failed[_key] = _error
+                self._logger.error(f'文件合并失败: {_key}, {_error}')
+            elif _last_key is not None:
+                file_last_key[d_tasks[_key][2]] = _last_key
+            if _n_done % _n_progress == 0 or _n_done == _n_total:
+                self._logger.info(f'文件合并进度: {_n_done}/{_n_total}')
+
+        if max_workers <= 1:
+            for key, _task in d_tasks.items():
+                try:
+                    _result = _func(*_task, **_kwargs)
+                except Exception as e:
+                    _on_done(key, None, repr(e))
                 else:
-                    _keys_base = d_base_file_line.keys()
-                    _keys_insert = d_insert_file_line.keys()
-                for k in _keys_base:
-                    l_output_lines.append(d_base_file_line[k] + '\n')
-                for k in _keys_insert:
-                    l_output_lines.append(d_insert_file_line[k] + '\n')
-                with open(path_file_output, 'w', encoding='utf-8') as f:
-                    f.writelines(l_output_lines)
-                file_last_key[path_file_output] = max(max(_keys_base, _keys_insert))
+                    _on_done(key, _result, None)
+        else:
+            _executor_class = ProcessPoolExecutor if use_process else ThreadPoolExecutor
+            with _executor_class(max_workers=max_workers) as executor:
+                d_future = {executor.submit(_func, *_task, **_kwargs): key for key, _task in d_tasks.items()}
+                for _future in as_completed(d_future):
+                    key = d_future[_future]
+                    try:
+                        _result = _future.result()
+                    except Exception as e:
+                        _on_done(key, None, repr(e))
+                    else:
+                        _on_done(key, _result, None)
         return file_last_key
-
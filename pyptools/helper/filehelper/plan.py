@@ -0,0 +1,244 @@
+"""
+文件操作计划: 先列出 rebuild_structure / DataFileConcator.concat 的全部操作，查看后再执行
+
+    plan = plan_rebuild_structure(input_root, output_root, path_target, key_by_folder=True)
+    plan = plan_concat(DataFileConcator(...), data_key_num=1, ...)
+    print(plan.report())                                    # 各类操作的数量、字节数、预计时间
+    plan.dump('plan.json')                                  # 保存，之后执行
+    FilePlan.load('plan.json').execute(checkpoint_path='plan.checkpoint')
+
+    操作: copy / merge / skip / delete
+    checkpoint: 每完成一个操作追加一行操作id; 中断后使用同一个 checkpoint 文件重新执行，已完成的操作跳过;
+        失败的操作（包括 merge 读取文件失败）不记录，重新执行时再运行
+    missing: input 中缺少的组件 key，记录在计划中并显示在 report 里
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .rebuild import plan_rebuild, RebuildOperation, _execute_operation, LINK_MODE_OPTIONS
+from .fileconcat import DataFileConcator, _concat_files_in_memory, _concat_files_streaming
+
+
+@dataclass
+class PlanOperation:
+    action: str                                     # 'copy' / 'merge' / 'skip' / 'delete'
+    dst: str
+    srcs: List[str] = field(default_factory=list)
+    size: int = 0                                   # 需要读取的字节数
+    key: str = ''
+    params: dict = field(default_factory=dict)      # merge 的参数
+
+    @property
+    def id(self) -> str:
+        _s = json.dumps([self.action, self.dst, self.srcs], ensure_ascii=False)
+        return hashlib.md5(_s.encode('utf-8')).hexdigest()
+
+
+class FilePlan:
+    # 预计时间的参数
+    CopyBytesPerSecond = 200 * 1024 * 1024
+    MergeBytesPerSecond = 30 * 1024 * 1024
+    SecondsPerFile = 0.002
+
+    def __init__(self, operations: List[PlanOperation], link_mode='auto',
+                 logger: logging.Logger = logging.Logger('FilePlan'),
+                 missing: List[str] or None = None):
+        if link_mode not in LINK_MODE_OPTIONS:
+            raise ValueError(f'link_mode not in {LINK_MODE_OPTIONS}')
+        self.operations = operations
+        self.link_mode = link_mode
+        self.missing = list(missing) if missing else []
+        self.logger = logger
+
+    def summary(self) -> Dict[str, dict]:
+        """{ action: {'count': , 'bytes': , 'seconds': } }"""
+        d_summary = defaultdict(lambda: {'count': 0, 'bytes': 0, 'seconds': 0.0})
+        for _op in self.operations:
+            _d = d_summary[_op.action]
+            _d['count'] += 1
+            _d['bytes'] += _op.size
+            _d['seconds'] += self._estimate_seconds(_op)
+        return dict(d_summary)
+
+    def _estimate_seconds(self, op: PlanOperation) -> float:
+        if op.action == 'copy':
+            # auto 是否能链接取决于文件系统，按复制估计
+            if self.link_mode in ('hardlink', 'reflink'):
+                return self.SecondsPerFile
+            return self.SecondsPerFile + op.size / self.CopyBytesPerSecond
+        elif op.action == 'merge':
+            return self.SecondsPerFile + op.size / self.MergeBytesPerSecond
+        elif op.action == 'delete':
+            return self.SecondsPerFile
+        return 0.0
+
+    def report(self, detail=False) -> str:
+        l_lines = []
+        _total_seconds = 0.0
+        for _action, _d in sorted(self.summary().items()):
+            _total_seconds += _d['seconds']
+            l_lines.append(
+                f'{_action:<8}{_d["count"]:>10} files{_d["bytes"] / 1024 / 1024:>14.1f} MB'
+                f'{_d["seconds"]:>12.1f} s')
+        l_lines.append(f'预计时间: {_total_seconds:.1f} s (link_mode={self.link_mode})')
+        if self.missing:
+            l_lines.append(f'"input"路径缺少组件 {len(self.missing)}: {", ".join(self.missing)}')
+        if detail:
+            for _op in self.operations:
+                if _op.action == 'skip':
+                    continue
+                l_lines.append(f'{_op.action}\t{_op.dst}\t<- {"; ".join(_op.srcs)}')
+        return '\n'.join(l_lines)
+
+    def dump(self, p):
+        _p_tmp = p + '.tmp'
+        with open(_p_tmp, 'w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    'link_mode': self.link_mode, 'missing': self.missing,
+                    'operations': [asdict(_op) for _op in self.operations],
+                },
+                f, ensure_ascii=False, indent=1
+            )
+        os.replace(_p_tmp, p)
+
+    @classmethod
+    def load(cls, p, logger: logging.Logger = logging.Logger('FilePlan')):
+        with open(p, encoding='utf-8') as f:
+            _d = json.load(f)
+        return cls(
+            [PlanOperation(**_op) for _op in _d['operations']],
+            link_mode=_d['link_mode'], logger=logger, missing=_d.get('missing')
+        )
+
+    @staticmethod
+    def _read_checkpoint(p) -> set:
+        if not (p and os.path.isfile(p)):
+            return set()
+        with open(p, encoding='utf-8') as f:
+            return set([_.strip() for _ in f if _.strip()])
+
+    def _execute_operation(self, op: PlanOperation):
+        if op.action == 'merge':
+            _params = dict(op.params)
+            _path_insert = op.srcs[1] if len(op.srcs) > 1 else None
+            if _params.pop('streaming', False):
+                _last_key, l_errors = _concat_files_streaming(op.srcs[0], _path_insert, op.dst, **_params)
+            else:
+                _last_key, l_errors = _concat_files_in_memory(op.srcs[0], _path_insert, op.dst, **_params)
+            for _msg in l_errors:
+                self.logger.error(_msg)
+            # 读取失败时不能记录为完成，否则从 checkpoint 继续时会跳过
+            if l_errors:
+                raise IOError('; '.join(l_errors))
+        else:
+            _execute_operation(
+                RebuildOperation(action=op.action, dst=op.dst, src=op.srcs[0] if op.srcs else None),
+                link_mode=self.link_mode
+            )
+
+    def execute(self, checkpoint_path=None, max_workers=8) -> Dict[str, int]:
+        """
+        执行计划; checkpoint_path 中已记录的操作跳过。
+        :return: { 'done': , 'resumed': , 'failed': }
+        """
+        _done_ids = self._read_checkpoint(checkpoint_path)
+        l_operations = [_op for _op in self.operations if _op.action != 'skip']
+        l_todo = [_op for _op in l_operations if _op.id not in _done_ids]
+        d_count = {'done': 0, 'resumed': len(l_operations) - len(l_todo), 'failed': 0}
+        if _done_ids:
+            self.logger.info(f'从 checkpoint 继续, 已完成 {len(_done_ids)}')
+        if self.missing:
+            self.logger.warning(f'"input"路径缺少组件: {self.missing}')
+
+        _lock = threading.Lock()
+        f_checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                d_future = {executor.submit(self._execute_operation, _op): _op for _op in l_todo}
+                for _future in as_completed(d_future):
+                    _op = d_future[_future]
+                    try:
+                        _future.result()
+                    except Exception as e:
+                        d_count['failed'] += 1
+                        self.logger.error(f'执行失败, {_op.action}, {_op.dst}, {e}')
+                        continue
+                    d_count['done'] += 1
+                    if f_checkpoint:
+                        with _lock:
+                            f_checkpoint.write(_op.id + '\n')
+                            f_checkpoint.flush()
+        finally:
+            if f_checkpoint:
+                f_checkpoint.close()
+        self.logger.info(f'计划执行完成, {d_count}')
+        return d_count
+
+
+def plan_rebuild_structure(
+        input_root, output_root, path_target,
+        key_by_folder, not_sub_folder=True, need_file=True,
+        check_hash=False, link_mode='auto',
+        _logger: None or logging.Logger = None
+) -> FilePlan:
+    l_operations, l_missing = plan_rebuild(
+        input_root, output_root, path_target,
+        key_by_folder=key_by_folder, not_sub_folder=not_sub_folder, need_file=need_file,
+        check_hash=check_hash, _logger=_logger,
+    )
+    return FilePlan(
+        [
+            PlanOperation(action=_op.action, dst=_op.dst, srcs=[_op.src] if _op.src else [],
+                          size=_op.size, key=_op.key)
+            for _op in l_operations
+        ],
+        link_mode=link_mode,
+        missing=l_missing,
+    )
+
+
+def plan_concat(
+        concator: DataFileConcator,
+        data_key_num: int,
+        has_header=True,
+        sort_by_key=True,
+        data_sperator: str = ",",
+        match_method="foldername",
+        concat_method="base",
+        streaming=False,
+        chunk_lines: int = 1000000,
+        temp_folder=None,
+        match_index_path=None,
+) -> FilePlan:
+    """参数与 DataFileConcator.concat 相同，每个文件组为一个 merge 操作"""
+    if concat_method not in DataFileConcator.CONCAT_METHOD_OPTIONS:
+        raise ValueError(f'concat_method not in {DataFileConcator.CONCAT_METHOD_OPTIONS}')
+    d_tasks = concator.gen_tasks(
+        match_method=match_method, match_index_path=match_index_path, pause_on_error=False)
+    if streaming:
+        _params = dict(
+            streaming=True, data_key_num=data_key_num, has_header=has_header, data_sperator=data_sperator,
+            concat_method=concat_method, chunk_lines=chunk_lines, temp_folder=temp_folder,
+        )
+    else:
+        _params = dict(
+            data_key_num=data_key_num, has_header=has_header, data_sperator=data_sperator,
+            sort_by_key=sort_by_key, concat_method=concat_method,
+        )
+    l_operations = []
+    for key, (path_base, path_insert, path_file_output) in d_tasks.items():
+        _srcs = [path_base] if path_insert is None else [path_base, path_insert]
+        l_operations.append(PlanOperation(
+            action='merge', dst=path_file_output, srcs=_srcs,
+            size=sum([os.path.getsize(_p) for _p in _srcs]), key=key, params=_params,
+        ))
+    return FilePlan(l_operations)
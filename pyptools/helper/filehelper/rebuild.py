@@ -5,12 +5,17 @@
 
 
 import os
+import sys
 import time
 import shutil
 import json
+import hashlib
 import logging
 import datetime
 from collections import defaultdict
+from dataclasses import dataclass
+from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 """
@@ -25,6 +30,16 @@ from collections import defaultdict
         如果input下缺少target下的组件，会报错
         目录下应该避免有重复的key，因为这样的话会无法辨别组件，只保留第一个，报错并pause
 
+    重建分为两步:
+        plan_rebuild()      先列出所有操作（复制 / 跳过 / 删除），不做任何修改
+        execute_rebuild()   线程池执行
+    输出中已存在、大小和 mtime 与输入相同（可选再比较 hash）的文件跳过;
+    link_mode:
+        'auto'      默认; 输入与输出在同一文件系统 (st_dev 相同) 时依次尝试 reflink、硬链接，否则复制
+        'copy'      复制
+        'hardlink'  输入与输出在同一文件系统时使用硬链接, 注意硬链接与输入是同一个文件，修改会相互影响
+        'reflink'   使用 reflink (FICLONE, btrfs/xfs 等)，不支持时复制
+    同一个输入对应多个输出时，输入只读取一次: 先输出第一个，其余从第一个输出 reflink / 复制
 """
 
 
@@ -75,21 +90,71 @@ def get_structure_items(
     return d_item
 
 
-def rebuild_structure(
+LINK_MODE_OPTIONS = ['auto', 'copy', 'hardlink', 'reflink']
+
+# linux/fs.h FICLONE
+_FICLONE = 0x40049409
+
+
+@dataclass
+class RebuildOperation:
+    action: str         # 'copy' / 'skip' / 'delete'
+    dst: str
+    src: str or None = None
+    size: int = 0
+    key: str = ''       # 组件 key
+
+
+def _file_hash(p, _cache: dict or None = None) -> str:
+    if _cache is not None and p in _cache:
+        return _cache[p]
+    _md5 = hashlib.md5()
+    with open(p, 'rb') as f:
+        for _chunk in iter(lambda: f.read(1024 * 1024), b''):
+            _md5.update(_chunk)
+    _hash = _md5.hexdigest()
+    if _cache is not None:
+        _cache[p] = _hash
+    return _hash
+
+
+def _is_unchanged(src, dst, check_hash=False, _hash_cache: dict or None = None) -> bool:
+    """dst 与 src 是否相同: 同一个文件（硬链接），或 大小、mtime 相同; check_hash 时 mtime 不同再比较 hash"""
+    try:
+        _dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    _src_stat = os.stat(src)
+    if (_src_stat.st_dev, _src_stat.st_ino) == (_dst_stat.st_dev, _dst_stat.st_ino):
+        return True
+    if _src_stat.st_size != _dst_stat.st_size:
+        return False
+    if _src_stat.st_mtime_ns == _dst_stat.st_mtime_ns:
+        return True
+    if check_hash:
+        return _file_hash(src, _hash_cache) == _file_hash(dst, _hash_cache)
+    return False
+
+
+def _list_folder_files(path) -> Dict[str, str]:
+    """{ relpath: path }"""
+    d_files = {}
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            _p = os.path.join(root, file)
+            d_files[os.path.relpath(_p, start=path)] = _p
+    return d_files
+
+
+def plan_rebuild(
         input_root, output_root, path_target,
         key_by_folder, not_sub_folder=True, need_file=True,
+        check_hash=False,
         _logger: None or logging.Logger = None
-):
+) -> (List[RebuildOperation], List[str]):
     """
-    input中项目必须唯一，target中可以多个——一对多
-    :param input_root:  输入的结构
-    :param output_root: 输出的路径
-    :param path_target: 目标结构
-    :param key_by_folder:  是否按文件夹重构，或文件
-    :param not_sub_folder: 是否允许包含子文件夹
-    :param need_file: 是否允许空文件夹
-    :param _logger:
-    :return:
+    只列出操作，不做修改
+    :return: (操作, input中缺少的组件key)
     """
     if isinstance(_logger, logging.Logger):
         logger = _logger
@@ -112,29 +177,179 @@ def rebuild_structure(
         need_file=need_file
     )
 
-    # 重建
+    l_operations = []
+    l_missing = []
+    _hash_cache = {}
+    # 同一个输入的文件列表只读取一次
+    d_input_folder_files = {}
+
+    def _add_file(key_name, src, dst):
+        _size = os.path.getsize(src)
+        if _is_unchanged(src, dst, check_hash=check_hash, _hash_cache=_hash_cache):
+            l_operations.append(RebuildOperation(action='skip', src=src, dst=dst, size=_size, key=key_name))
+        else:
+            l_operations.append(RebuildOperation(action='copy', src=src, dst=dst, size=_size, key=key_name))
+
     # 遍历 目标
-    _error = False
     for key_name, l_target_item_path in d_target_items.items():
         # input中缺少 target的内容
         if key_name not in d_input_items:
             logger.warning('"input"路径缺少此组件: %s, | %s' % (
                 key_name, ','.join([os.path.relpath(path, start=path_target) for path in l_target_item_path])))
-            _error = True
-        else:
-            for target_item_path in l_target_item_path:
-                input_item_path = d_input_items[key_name][0]
-                target_item_relpath = os.path.relpath(target_item_path, start=path_target)
-                output_item_path = os.path.join(output_root, target_item_relpath)
-                if key_by_folder:
-                    # 拷贝文件夹
-                    if os.path.isdir(output_item_path):
-                        shutil.rmtree(output_item_path)
-                        # time.sleep(0.0001)
-                    shutil.copytree(src=input_item_path, dst=output_item_path)
-                else:
-                    # 拷贝文件
-                    os.makedirs(os.path.dirname(output_item_path))
-                    shutil.copyfile(src=input_item_path, dst=output_item_path)
-    if _error:
+            l_missing.append(key_name)
+            continue
+        input_item_path = d_input_items[key_name][0]
+        for target_item_path in l_target_item_path:
+            target_item_relpath = os.path.relpath(target_item_path, start=path_target)
+            output_item_path = os.path.join(output_root, target_item_relpath)
+            if key_by_folder:
+                # 文件夹: 输出与输入一致，删除输出中多余的文件
+                if input_item_path not in d_input_folder_files:
+                    d_input_folder_files[input_item_path] = _list_folder_files(input_item_path)
+                d_src_files = d_input_folder_files[input_item_path]
+                for _relpath, _src in d_src_files.items():
+                    _add_file(key_name, _src, os.path.join(output_item_path, _relpath))
+                if os.path.isdir(output_item_path):
+                    for _relpath, _dst in _list_folder_files(output_item_path).items():
+                        if _relpath not in d_src_files:
+                            l_operations.append(RebuildOperation(action='delete', dst=_dst, key=key_name))
+            else:
+                _add_file(key_name, input_item_path, output_item_path)
+    return l_operations, l_missing
+
+
+def _reflink(src, dst) -> bool:
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    try:
+        with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+            fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+    except OSError:
+        if os.path.isfile(dst):
+            os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _same_device(src, dst_folder) -> bool:
+    try:
+        return os.stat(src).st_dev == os.stat(dst_folder).st_dev
+    except OSError:
+        return False
+
+
+def _execute_operation(operation: RebuildOperation, link_mode='auto') -> str:
+    """返回实际使用的方式"""
+    if operation.action == 'skip':
+        return 'skip'
+    if operation.action == 'delete':
+        if os.path.isfile(operation.dst) or os.path.islink(operation.dst):
+            os.remove(operation.dst)
+        return 'delete'
+
+    os.makedirs(os.path.dirname(operation.dst), exist_ok=True)
+    if os.path.isfile(operation.dst) or os.path.islink(operation.dst):
+        os.remove(operation.dst)
+    if link_mode == 'auto':
+        if _same_device(operation.src, os.path.dirname(operation.dst)):
+            if _reflink(operation.src, operation.dst):
+                return 'reflink'
+            try:
+                os.link(operation.src, operation.dst)
+                return 'hardlink'
+            except OSError:
+                pass
+    elif link_mode == 'hardlink':
+        try:
+            os.link(operation.src, operation.dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    elif link_mode == 'reflink':
+        if _reflink(operation.src, operation.dst):
+            return 'reflink'
+    shutil.copy2(src=operation.src, dst=operation.dst)
+    return 'copy'
+
+
+def _execute_group(operations: List[RebuildOperation], link_mode='auto') -> List[str]:
+    """
+    执行一组操作: 同一个输入的全部 copy，或单个 skip / delete;
+    copy 时输入只读取一次，其余输出从第一个输出生成（同在输出目录，可以 reflink），
+    link_mode='copy' 时其余输出也只 reflink / 复制，不使用硬链接
+    """
+    l_method = [_execute_operation(operations[0], link_mode)]
+    _first_dst = operations[0].dst
+    for _operation in operations[1:]:
+        l_method.append(_execute_operation(
+            RebuildOperation(action='copy', dst=_operation.dst, src=_first_dst, size=_operation.size,
+                             key=_operation.key),
+            'reflink' if link_mode == 'copy' else link_mode
+        ))
+    return l_method
+
+
+def execute_rebuild(
+        operations: List[RebuildOperation],
+        link_mode='auto', max_workers=8,
+        _logger: None or logging.Logger = None
+) -> Dict[str, int]:
+    """
+    执行 plan_rebuild 的操作, 返回 { 方式: 数量 }
+    """
+    if isinstance(_logger, logging.Logger):
+        logger = _logger
+    else:
+        logger = logging.Logger(name=__name__)
+    if link_mode not in LINK_MODE_OPTIONS:
+        raise ValueError(f'link_mode not in {LINK_MODE_OPTIONS}')
+
+    d_count = defaultdict(int)
+    # 同一个目标文件只执行一次
+    d_operations = {}
+    for _operation in operations:
+        d_operations[_operation.dst] = _operation
+    # copy 按输入分组，每组一个任务; skip / delete 每个一组
+    d_group = defaultdict(list)
+    for _operation in d_operations.values():
+        _group_key = ('copy', _operation.src) if _operation.action == 'copy' else (_operation.action, _operation.dst)
+        d_group[_group_key].append(_operation)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        l_future = [executor.submit(_execute_group, _ops, link_mode) for _ops in d_group.values()]
+        for _future in as_completed(l_future):
+            for _method in _future.result():
+                d_count[_method] += 1
+    logger.info('重建完成, %s' % ', '.join([f'{k}: {v}' for k, v in sorted(d_count.items())]))
+    return dict(d_count)
+
+
+def rebuild_structure(
+        input_root, output_root, path_target,
+        key_by_folder, not_sub_folder=True, need_file=True,
+        _logger: None or logging.Logger = None,
+        link_mode='auto', max_workers=8, check_hash=False,
+):
+    """
+    input中项目必须唯一，target中可以多个——一对多
+    :param input_root:  输入的结构
+    :param output_root: 输出的路径
+    :param path_target: 目标结构
+    :param key_by_folder:  是否按文件夹重构，或文件
+    :param not_sub_folder: 是否允许包含子文件夹
+    :param need_file: 是否允许空文件夹
+    :param _logger:
+    :param link_mode: {'auto', 'copy', 'hardlink', 'reflink'}
+    :param max_workers: 复制的线程数
+    :param check_hash: 大小相同、mtime不同时，是否比较hash判断文件未变化
+    :return:
+    """
+    l_operations, l_missing = plan_rebuild(
+        input_root, output_root, path_target,
+        key_by_folder=key_by_folder, not_sub_folder=not_sub_folder, need_file=need_file,
+        check_hash=check_hash, _logger=_logger,
+    )
+    execute_rebuild(l_operations, link_mode=link_mode, max_workers=max_workers, _logger=_logger)
+    if l_missing:
         raise Exception
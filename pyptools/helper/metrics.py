@@ -0,0 +1,224 @@
+"""
+运行指标 (counter / gauge / histogram)，定期写入本地文件，用于查看长期的吞吐量、延时趋势
+
+    from pyptools.helper.metrics import get_registry
+    metrics = get_registry()
+    metrics.counter('rows_downloaded').inc(len(rows))
+    metrics.gauge('file_size_bytes', file='xxx.csv').set(1024)
+    metrics.histogram('db_seconds', op='download').observe(0.12)
+    with metrics.timer('phase_seconds', phase='download'):
+        ...
+    metrics.start_flush('logs/metrics.jsonl', interval=60)
+
+    文件格式（按扩展名）:
+        .prom       Prometheus text format，每次覆盖（可用于 node_exporter textfile）; counter 名称加 _total
+        其他        JSON lines，每次追加一行 {"time": , "metrics": [...]};
+                    按日期写入不同文件: logs/metrics.jsonl -> logs/metrics_YYYYMMDD.jsonl
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+_LOGGER = logging.getLogger(__name__)
+
+# 默认延时 bucket (s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 文件大小 bucket (bytes)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'type': self.type, 'labels': self.labels, 'value': self.value}
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, labels: dict, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)         # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'name': self.name, 'type': self.type, 'labels': self.labels,
+                'buckets': list(self.buckets), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count,
+            }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[tuple, Counter or Gauge or Histogram] = {}
+        self._flush_thread = None
+        self._flush_stop_event = threading.Event()
+
+    def _get(self, cls, name, labels: dict, **kwargs):
+        _key = (name, tuple(sorted(labels.items())))
+        _metric = self._metrics.get(_key)
+        if _metric is None:
+            with self._lock:
+                _metric = self._metrics.get(_key)
+                if _metric is None:
+                    _metric = cls(name, {_k: str(_v) for _k, _v in labels.items()}, **kwargs)
+                    self._metrics[_key] = _metric
+        if not isinstance(_metric, cls):
+            raise TypeError(f'metric {name} 已经是 {_metric.type}')
+        return _metric
+
+    def counter(self, name, **labels) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, **labels) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        """buckets 只在第一次创建时使用"""
+        return self._get(Histogram, name, labels, buckets=buckets)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录 with 块的运行时间(s) 到 histogram"""
+        _t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - _t0)
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            l_metrics = list(self._metrics.values())
+        return [_metric.to_dict() for _metric in l_metrics]
+
+    # 输出
+    @staticmethod
+    def _prometheus_labels(labels: dict) -> str:
+        if not labels:
+            return ''
+        _s = ','.join([
+            '%s="%s"' % (_k, _v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for _k, _v in sorted(labels.items())
+        ])
+        return '{%s}' % _s
+
+    def to_prometheus(self) -> str:
+        l_lines = []
+        _typed = set()
+        for _d in sorted(self.snapshot(), key=lambda x: x['name']):
+            _name = _d['name']
+            # Prometheus 的 counter 名称以 _total 结尾
+            if _d['type'] == 'counter' and not _name.endswith('_total'):
+                _name += '_total'
+            if _name not in _typed:
+                l_lines.append(f'# TYPE {_name} {_d["type"]}')
+                _typed.add(_name)
+            if _d['type'] != 'histogram':
+                l_lines.append(f'{_name}{self._prometheus_labels(_d["labels"])} {_d["value"]}')
+                continue
+            _cumulative = 0
+            for _bound, _n in zip(list(_d['buckets']) + ['+Inf'], _d['counts']):
+                _cumulative += _n
+                _labels = dict(_d['labels'], le=str(_bound))
+                l_lines.append(f'{_name}_bucket{self._prometheus_labels(_labels)} {_cumulative}')
+            l_lines.append(f'{_name}_sum{self._prometheus_labels(_d["labels"])} {_d["sum"]}')
+            l_lines.append(f'{_name}_count{self._prometheus_labels(_d["labels"])} {_d["count"]}')
+        return '\n'.join(l_lines) + '\n'
+
+    def to_json_line(self) -> str:
+        return json.dumps(
+            {'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'metrics': self.snapshot()},
+            ensure_ascii=False
+        )
+
+    @staticmethod
+    def dated_path(path, day=None) -> str:
+        """JSON lines 的实际文件: xxx.jsonl -> xxx_YYYYMMDD.jsonl"""
+        _root, _ext = os.path.splitext(path)
+        return '%s_%s%s' % (_root, (day or datetime.now()).strftime('%Y%m%d'), _ext)
+
+    def flush(self, path):
+        path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith('.prom'):
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(path + '.tmp', path)
+        else:
+            with open(self.dated_path(path), 'a', encoding='utf-8') as f:
+                f.write(self.to_json_line() + '\n')
+
+    def _safe_flush(self, path):
+        try:
+            self.flush(path)
+        except Exception as e:
+            _LOGGER.error(f'metrics 输出失败, {repr(e)}')
+
+    def start_flush(self, path, interval=60):
+        """后台线程每 interval 秒写一次; 程序退出时再写一次"""
+        if self._flush_thread is not None:
+            return
+
+        def _loop():
+            while not self._flush_stop_event.wait(timeout=interval):
+                self._safe_flush(path)
+            self._safe_flush(path)
+
+        self._flush_stop_event.clear()
+        self._flush_thread = threading.Thread(target=_loop, name='MetricsFlush', daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.stop_flush)
+
+    def stop_flush(self):
+        if self._flush_thread is None:
+            return
+        self._flush_stop_event.set()
+        self._flush_thread.join()
+        self._flush_thread = None
+
+
+_REGISTRY = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """进程内共用的 registry"""
+    return _REGISTRY
@@ -3,21 +3,98 @@ import time
 import abc
 import threading
 import logging
+from dataclasses import dataclass, field
+from typing import List, Callable
+from concurrent.futures import ThreadPoolExecutor
+
+_SECONDS_PER_DAY = 24 * 3600
+
+
+def _time_to_seconds(t: datetime.time) -> float:
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1000000
+
+
+def _compile_running_time(running_time) -> List[tuple]:
+    """
+    [[start, end], ] -> [(start_seconds, end_seconds)]
+    end 包含该秒（与原来的 time_now <= end 在秒级一致）, end_seconds 为不包含的结束时间;
+    start > end 时为跨午夜的区间
+    """
+    l_ranges = []
+    for _start, _end in running_time:
+        _end_seconds = _time_to_seconds(_end)
+        if _end.microsecond == 0:
+            _end_seconds += 1
+        l_ranges.append((_time_to_seconds(_start), _end_seconds))
+    return l_ranges
+
+
+def _is_in_ranges(ranges: List[tuple], dt: datetime.datetime) -> bool:
+    _t = _time_to_seconds(dt.time())
+    for _start, _end in ranges:
+        if _start <= _end:
+            if _start <= _t < _end:
+                return True
+        else:
+            if _t >= _start or _t < _end:
+                return True
+    return False
+
+
+def next_transition(ranges: List[tuple], now: datetime.datetime) -> datetime.datetime or None:
+    """now 之后，第一个 运行状态变化 的时间; 全天运行 / 全天不运行时返回 None"""
+    _state = _is_in_ranges(ranges, now)
+    _midnight = datetime.datetime.combine(now.date(), datetime.time(0, 0, 0))
+    l_bounds = sorted(set([_ % _SECONDS_PER_DAY for _range in ranges for _ in _range]))
+    for _days in range(3):
+        for _bound in l_bounds:
+            _dt = _midnight + datetime.timedelta(days=_days, seconds=_bound)
+            if _dt > now and _is_in_ranges(ranges, _dt) != _state:
+                return _dt
+    return None
+
+
+@dataclass
+class ScheduleJob:
+    name: str
+    running_time: list
+    start: Callable or None = None
+    end: Callable or None = None
+    timeout: float or None = None               # 回调超时(s)，超时报警
+    in_running: bool = False
+    ranges: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self.ranges = _compile_running_time(self.running_time)
 
 
 class ScheduleRunner:
     """
     self.star_loop() 使用多线程，因为
         调用 self._start 和 self._end 是可能出现阻塞的
+
+    计算下一个状态变化的时间，sleep 到该时间（最长 loop_interval，用于应对系统时间调整）;
+    支持跨午夜的时间区间（start > end），支持多个任务（add_job）;
+    回调在每个任务各自的单线程中执行（同一任务的 start / end 按顺序执行，不阻塞调度和其他任务），
+    超过 timeout 未完成时报警。
+    也可以在 asyncio 中运行: await self.run_async(), 协程回调超时会被取消。
     """
     def __init__(self,
                  running_time=[[datetime.time(0, 0, 0), datetime.time(23, 59, 59)], ],
-                 loop_interval=60 * 1, logger=logging.Logger('ScheduleRunner')):
+                 loop_interval=60 * 1, logger=logging.Logger('ScheduleRunner'),
+                 callback_timeout: float or None = None):
         self._schedule_running_time = running_time
         self._schedule_in_running = False
         self._schedule_loop_interval = loop_interval
+        self._schedule_callback_timeout = callback_timeout
         self.logger = logger
 
+        self._schedule_jobs: List[ScheduleJob] = []
+        self._schedule_executors = {}
+        self._schedule_stop_event = threading.Event()
+        self._schedule_async_stop_event = None
+        self._schedule_async_loop = None
+
     @abc.abstractmethod
     def _start(self):
         pass
@@ -26,40 +103,148 @@ class ScheduleRunner:
     def _end(self):
         pass
 
+    def add_job(self, running_time, start: Callable or None = None, end: Callable or None = None,
+                name: str or None = None, timeout: float or None = None) -> ScheduleJob:
+        """start / end 可以是普通函数或协程函数（协程函数只能在 run_async 中使用）"""
+        _job = ScheduleJob(
+            name=name if name else f'Job{len(self._schedule_jobs)}',
+            running_time=running_time, start=start, end=end, timeout=timeout,
+        )
+        self._schedule_jobs.append(_job)
+        return _job
+
+    def _get_jobs(self) -> List[ScheduleJob]:
+        # 子类实现了 _start / _end, 或者没有添加任务时，使用 running_time 作为默认任务
+        _cls = type(self)
+        if (_cls._start is not ScheduleRunner._start or _cls._end is not ScheduleRunner._end) \
+                or not self._schedule_jobs:
+            if not [_job for _job in self._schedule_jobs if _job.name == _cls.__name__]:
+                _job = ScheduleJob(
+                    name=_cls.__name__, running_time=self._schedule_running_time,
+                    start=self._start, end=self._end, timeout=self._schedule_callback_timeout,
+                )
+                self._schedule_jobs.insert(0, _job)
+        return self._schedule_jobs
+
+    def _update_jobs(self, now: datetime.datetime) -> List[tuple]:
+        """检查各任务状态变化, 返回 [(job, callback, action)]"""
+        l_calls = []
+        for _job in self._get_jobs():
+            _is_in_running_time = _is_in_ranges(_job.ranges, now)
+            # 开始
+            if (not _job.in_running) and _is_in_running_time:
+                _job.in_running = True
+                self.logger.info(f'开始运行... {_job.name}')
+                l_calls.append((_job, _job.start, 'start'))
+            # 结束运行
+            elif _job.in_running and (not _is_in_running_time):
+                _job.in_running = False
+                self.logger.info(f'暂停运行... {_job.name}')
+                l_calls.append((_job, _job.end, 'end'))
+        self._schedule_in_running = True in [_job.in_running for _job in self._schedule_jobs]
+        return l_calls
+
+    def _seconds_to_next(self, now: datetime.datetime) -> float:
+        l_next = [next_transition(_job.ranges, now) for _job in self._get_jobs()]
+        l_next = [_ for _ in l_next if _ is not None]
+        _seconds = self._schedule_loop_interval
+        if l_next:
+            _seconds = min(_seconds, (min(l_next) - now).total_seconds())
+        return max(_seconds, 0)
+
+    def _call_in_thread(self, job: ScheduleJob, func: Callable, action: str):
+        if func is None:
+            return
+        if job.name not in self._schedule_executors:
+            self._schedule_executors[job.name] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f'ScheduleRunner.{job.name}')
+        _future = self._schedule_executors[job.name].submit(func)
+
+        def _on_done(_f):
+            if _f.exception() is not None:
+                self.logger.error(f'{job.name}.{action} 运行出错, {repr(_f.exception())}')
+        _future.add_done_callback(_on_done)
+
+        if job.timeout:
+            def _check_timeout():
+                if not _future.done():
+                    self.logger.warning(f'{job.name}.{action} 超时未完成, {job.timeout}s')
+            _timer = threading.Timer(job.timeout, _check_timeout)
+            _timer.daemon = True
+            _timer.start()
+
     def start_loop(self):
         print('启动运行...')
         print('等待进入运行时间区间')
-        # 初始化，用于检查上一次上传的时间，防止长时间没有上传
-        while True:
-            time_now = datetime.datetime.now().time()
-            is_in_running_time = True in [
-                (time_now >= time_range[0]) and (time_now <= time_range[1])
-                for time_range in self._schedule_running_time
-            ]
-
-            # 运行时间中
-            if self._schedule_in_running and is_in_running_time:
-                pass
-            # 不在运行时间
-            elif (not self._schedule_in_running) and (not is_in_running_time):
-                # time.sleep(self.loop_interval)
-                # continue
-                # print('不在运行时间')
+        self._schedule_stop_event.clear()
+        try:
+            while not self._schedule_stop_event.is_set():
+                _now = datetime.datetime.now()
+                for _job, _func, _action in self._update_jobs(_now):
+                    self._call_in_thread(_job, _func, _action)
+                self._schedule_stop_event.wait(timeout=self._seconds_to_next(datetime.datetime.now()))
+        finally:
+            for _executor in self._schedule_executors.values():
+                _executor.shutdown(wait=False)
+            self._schedule_executors = {}
+
+    def stop(self):
+        """可以在其他线程中调用"""
+        self._schedule_stop_event.set()
+        _loop = self._schedule_async_loop
+        if (_loop is not None) and (self._schedule_async_stop_event is not None):
+            # asyncio.Event 不是线程安全的，在事件循环的线程中 set
+            try:
+                _loop.call_soon_threadsafe(self._schedule_async_stop_event.set)
+            except RuntimeError:
+                # 事件循环已关闭
                 pass
-            # 开始
-            elif (not self._schedule_in_running) and is_in_running_time:
-                self._schedule_in_running = True
-                self.logger.info('开始运行...')
-                # t = threading.Thread(target=self._start)
-                # t.start()
-                self._start()
-            # 结束运行
-            else:
-                self._schedule_in_running = False
-                self.logger.info('暂停运行...')
-                # t = threading.Thread(target=self._end)
-                # t.start()
-                self._end()
-
-            #
-            time.sleep(self._schedule_loop_interval)
+
+    async def _call_async(self, job: ScheduleJob, func: Callable, action: str, lock):
+        import asyncio
+        if func is None:
+            return
+        async with lock:
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    _aw = func()
+                else:
+                    if job.name not in self._schedule_executors:
+                        self._schedule_executors[job.name] = ThreadPoolExecutor(
+                            max_workers=1, thread_name_prefix=f'ScheduleRunner.{job.name}')
+                    _aw = asyncio.get_event_loop().run_in_executor(self._schedule_executors[job.name], func)
+                await asyncio.wait_for(_aw, timeout=job.timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f'{job.name}.{action} 超时, {job.timeout}s')
+            except Exception as e:
+                self.logger.error(f'{job.name}.{action} 运行出错, {repr(e)}')
+
+    async def run_async(self):
+        """在 asyncio 事件循环中运行，直到 stop()"""
+        import asyncio
+        self._schedule_async_stop_event = asyncio.Event()
+        self._schedule_async_loop = asyncio.get_event_loop()
+        d_locks = {}
+        l_tasks = set()
+        try:
+            while not self._schedule_async_stop_event.is_set():
+                _now = datetime.datetime.now()
+                for _job, _func, _action in self._update_jobs(_now):
+                    _lock = d_locks.setdefault(_job.name, asyncio.Lock())
+                    _task = asyncio.ensure_future(self._call_async(_job, _func, _action, _lock))
+                    l_tasks.add(_task)
+                    _task.add_done_callback(l_tasks.discard)
+                try:
+                    await asyncio.wait_for(
+                        self._schedule_async_stop_event.wait(),
+                        timeout=self._seconds_to_next(datetime.datetime.now())
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._schedule_async_loop = None
+            for _task in list(l_tasks):
+                _task.cancel()
+            for _executor in self._schedule_executors.values():
+                _executor.shutdown(wait=False)
+            self._schedule_executors = {}
@@ -7,35 +7,150 @@
 import logging
 import datetime
 import os
+import glob
+import time
+import queue
+import atexit
+import threading
 
 
-# logger计数
+# logger计数，同时记录到 metrics: log_records{logger, level}
 class MsgCounterHandler(logging.Handler):
     level2count = {}
 
     def __init__(self, *args, **kwargs):
         super(MsgCounterHandler, self).__init__(*args, **kwargs)
         self.level2count = {}
+        from .metrics import get_registry
+        self._metrics = get_registry()
 
     def emit(self, record):
         l = record.levelname
         if l not in self.level2count:
             self.level2count[l] = 0
         self.level2count[l] += 1
+        self._metrics.counter('log_records', logger=record.name, level=l).inc()
+
+
+# 按日期输出到 log_YYYYMMDD.txt，跨日时切换文件; backup_count 不为 None 时只保留最近 backup_count 个
+class DailyFileHandler(logging.FileHandler):
+    def __init__(self, output_root, backup_count: int or None = None, encoding='gb2312'):
+        self.output_root = output_root
+        self.backup_count = backup_count
+        self._date = datetime.date.today()
+        super(DailyFileHandler, self).__init__(self._gen_path(self._date), mode='a', encoding=encoding)
+
+    def _gen_path(self, date) -> str:
+        return os.path.join(self.output_root, 'log_%s.txt' % date.strftime('%Y%m%d'))
+
+    def emit(self, record):
+        _date = datetime.date.fromtimestamp(record.created)
+        if _date > self._date:
+            self.acquire()
+            try:
+                if _date > self._date:
+                    self._date = _date
+                    self.close()
+                    self.baseFilename = self._gen_path(_date)
+                    self._remove_old_files()
+            finally:
+                self.release()
+        super(DailyFileHandler, self).emit(record)
+
+    def _remove_old_files(self):
+        if not self.backup_count:
+            return
+        l_files = sorted(glob.glob(os.path.join(self.output_root, 'log_' + '[0-9]' * 8 + '.txt')))
+        for _p in l_files[:-self.backup_count]:
+            try:
+                os.remove(_p)
+            except OSError:
+                pass
+
+
+# 同一位置(文件,行)、内容相同的日志，每 interval 秒最多输出 limit 条，其余合并为一条计数;
+# 内容不同的日志（如每条报告不同的数据行）不合并
+class RateLimitFilter(logging.Filter):
+    def __init__(self, limit=20, interval=60):
+        super(RateLimitFilter, self).__init__()
+        self.limit = limit
+        self.interval = interval
+        self._lock = threading.Lock()
+        # (pathname, lineno, message) -> [window_start, n_passed, n_suppressed, 最后一条被合并的日志]
+        self._windows = {}
+
+    def filter(self, record) -> bool:
+        # 多个 handler 共用时，每条日志只判断一次
+        if not hasattr(record, '_rate_limit_pass'):
+            record._rate_limit_pass = self._check(record)
+        return record._rate_limit_pass
+
+    def _check(self, record) -> bool:
+        _key = (record.pathname, record.lineno, record.getMessage())
+        with self._lock:
+            _window = self._windows.get(_key)
+            if (_window is None) or (record.created - _window[0] >= self.interval):
+                _suppressed = _window[2] if _window else 0
+                self._windows[_key] = [record.created, 1, 0, None]
+                if _suppressed:
+                    record.msg = '%s (上 %ss 内重复日志被合并 %s 条)' % (_key[2], self.interval, _suppressed)
+                    record.args = None
+                return True
+            if _window[1] < self.limit:
+                _window[1] += 1
+                return True
+            _window[2] += 1
+            _window[3] = record
+            return False
+
+    def pop_suppressed(self, expired_only=True) -> list:
+        """
+        返回被合并日志的汇总记录（最后一条被合并的日志 + 条数），并清除对应的区间;
+        expired_only: 只处理已经结束的区间（之后没有同一位置的日志，汇总不会再输出）;
+        同时删除已经结束、没有被合并日志的区间
+        """
+        _now = time.time()
+        l_records = []
+        with self._lock:
+            for _key, _window in list(self._windows.items()):
+                _expired = _now - _window[0] >= self.interval
+                if not _window[2]:
+                    if _expired:
+                        self._windows.pop(_key)
+                    continue
+                if expired_only and (not _expired):
+                    continue
+                _record = logging.makeLogRecord(dict(_window[3].__dict__))
+                _record.msg = '%s (重复日志被合并 %s 条)' % (_window[3].getMessage(), _window[2])
+                _record.args = None
+                _record._rate_limit_pass = True
+                l_records.append(_record)
+                self._windows.pop(_key)
+        return l_records
 
 
 class MyLogger(logging.Logger):
+    """
+    console + 文件(log_YYYYMMDD.txt, 跨日切换) + 计数
+        async_mode:     日志放入队列，由后台线程写 console / 文件，调用方不等待 I/O;
+                        程序退出时自动写完，也可以调用 .flush()
+        file_backup_count:  None 不删除旧的日志文件; 为数字时只保留最近 file_backup_count 个 log_YYYYMMDD.txt
+        rate_limit:     同一位置、内容相同的日志每 rate_interval 秒最多输出 rate_limit 条（计数不受影响）
+                        被合并的条数在下一个区间的第一条日志、区间结束后的定时检查、flush() / stop() 时输出
+    """
 
     def __init__(
             self, name, level=logging.INFO,
             is_file=True, output_root=None,
-            file_name='log.txt', file_backup_count=15, file_level=logging.INFO,
+            file_name='log.txt', file_backup_count: int or None = None, file_level=logging.INFO,
             format_string='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            file_format_string='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            file_format_string='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            async_mode=False, rate_limit: int or None = None, rate_interval=60,
     ):
         self.name = name
         self.level = level
         logging.Logger.__init__(self, self.name, self.level)
+        self._output_handlers = []
         # (1)stream handler
         self.__setStreamHandler__(format_string=format_string, level=level)
         # (2)file handler
@@ -53,7 +168,11 @@ class MyLogger(logging.Logger):
             self.__setFileHandler__(output_root=path_file_output_root,
                                     format_string=file_format_string,
                                     level=file_level, backup_count=file_backup_count)
-        # (3)count handler
+        # (3)异步 / 限流
+        self._queue = None
+        self._listener = None
+        self.__setOutput__(async_mode=async_mode, rate_limit=rate_limit, rate_interval=rate_interval)
+        # (4)count handler
         self.__setMsgCountHandler__()
 
     # console输出
@@ -61,7 +180,7 @@ class MyLogger(logging.Logger):
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(logging.Formatter(format_string))
         stream_handler.setLevel(level)
-        self.addHandler(stream_handler)
+        self._output_handlers.append(stream_handler)
 
     # 文件输出
     def __setFileHandler__(self, output_root, format_string, level, backup_count):
@@ -69,13 +188,64 @@ class MyLogger(logging.Logger):
         # file_handler = handlers.TimedRotatingFileHandler(
         #     filename=file_name, backupCount=backup_count, when='D', encoding='utf-8'
         # )
-        path_file = os.path.join(output_root, 'log_%s.txt' % datetime.datetime.today().strftime('%Y%m%d'))
-        file_handler = logging.FileHandler(
-            path_file, mode='a', encoding='gb2312'
-        )
+        file_handler = DailyFileHandler(output_root, backup_count=backup_count, encoding='gb2312')
         file_handler.setLevel(level)
         file_handler.setFormatter(logging.Formatter(format_string))
-        self.addHandler(file_handler)
+        self._output_handlers.append(file_handler)
+
+    def __setOutput__(self, async_mode, rate_limit, rate_interval):
+        _filter = RateLimitFilter(limit=rate_limit, interval=rate_interval) if rate_limit else None
+        self._rate_filter = _filter
+        self._queue_handler = None
+        if async_mode:
+            # logging.handlers 导入 socket / pickle，只在异步输出时导入
+            from logging.handlers import QueueHandler, QueueListener
+            self._queue = queue.Queue(-1)
+            self._queue_handler = QueueHandler(self._queue)
+            if _filter:
+                self._queue_handler.addFilter(_filter)
+            self.addHandler(self._queue_handler)
+            self._listener = QueueListener(self._queue, *self._output_handlers, respect_handler_level=True)
+            self._listener.start()
+        else:
+            for _handler in self._output_handlers:
+                if _filter:
+                    _handler.addFilter(_filter)
+                self.addHandler(_handler)
+        # 限流: 定时输出已结束区间的合并计数（突发结束后不会再有同一位置的日志）
+        self._rate_stop_event = threading.Event()
+        if _filter:
+            def _loop():
+                while not self._rate_stop_event.wait(timeout=rate_interval):
+                    self._flush_suppressed(expired_only=True)
+            threading.Thread(target=_loop, name=f'MyLogger.{self.name}.RateLimit', daemon=True).start()
+        if async_mode or _filter:
+            atexit.register(self.stop)
+
+    def _flush_suppressed(self, expired_only=True):
+        """输出被合并日志的计数（不经过计数 handler，计数已包含这些日志）"""
+        if self._rate_filter is None:
+            return
+        for _record in self._rate_filter.pop_suppressed(expired_only=expired_only):
+            if self._queue_handler is not None:
+                self._queue_handler.handle(_record)
+            else:
+                for _handler in self._output_handlers:
+                    if _record.levelno >= _handler.level:
+                        _handler.handle(_record)
+
+    def flush(self):
+        """输出所有被合并日志的计数; async_mode 时，等待队列中的日志写完"""
+        self._flush_suppressed(expired_only=False)
+        if self._listener is not None:
+            self._queue.join()
+
+    def stop(self):
+        self._rate_stop_event.set()
+        self._flush_suppressed(expired_only=False)
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
 
     # 统计状态个数
     def __setMsgCountHandler__(self):
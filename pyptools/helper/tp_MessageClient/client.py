@@ -2,10 +2,10 @@ import subprocess
 import datetime
 import os
 from enum import Enum
-from typing import Tuple
+from typing import Tuple, List
 import logging
 
-from .constant import MESSAGE_CLIENT_ADDRESS
+from .constant import MESSAGE_CLIENT_ADDRESS, MESSAGE_CLIENT_EXE
 
 
 class RunException(Enum):
@@ -16,12 +16,12 @@ class RunException(Enum):
     Success = 1
 
 
-def _run_mc(s_cmd, timeout, logger: logging.Logger) -> Tuple[RunException, str] or None:
+def _run_mc(l_args: List[str], timeout, logger: logging.Logger) -> Tuple[RunException, str] or None:
+    """直接运行 exe（不经过 shell），参数以列表传入"""
     p = subprocess.Popen(
-        s_cmd,
+        [MESSAGE_CLIENT_EXE] + [str(_) for _ in l_args],
         cwd=MESSAGE_CLIENT_ADDRESS,
         stdout=subprocess.PIPE,
-        shell=True,
     )
 
     try:
@@ -29,6 +29,7 @@ def _run_mc(s_cmd, timeout, logger: logging.Logger) -> Tuple[RunException, str]
         output_s = str(outs, encoding="utf-8")
     except subprocess.TimeoutExpired as e:
         p.kill()
+        p.communicate()
         logger.error('调用 MessageClient 超时:')
         logger.error(e)
         return RunException.TimeOut, e
@@ -40,12 +41,10 @@ def _run_mc(s_cmd, timeout, logger: logging.Logger) -> Tuple[RunException, str]
         return RunException.Error, e
     else:
         if 'Exception' in output_s:
-            p.kill()
             logger.warning('调用 MessageClient 失败:')
             logger.warning(output_s)
             return RunException.TimeOut, output_s
         else:
-            p.kill()
             return None, output_s.strip()
 
 
@@ -68,10 +67,9 @@ def send_file(mc_ip, mc_port, upload_name, path_target_file, timeout, logger: lo
         max_try = 1
 
     for n in range(max_try):
-        s_cmd = '''TradingPlatform.MessageClient.exe %s %s sendfile "%s" "%s" ''' % (
-            mc_ip, mc_port, upload_name, path_target_file)
+        l_args = [mc_ip, mc_port, 'sendfile', upload_name, path_target_file]
 
-        error_type, msg = _run_mc(s_cmd=s_cmd, timeout=timeout, logger=logger)
+        error_type, msg = _run_mc(l_args=l_args, timeout=timeout, logger=logger)
         if not error_type:
             return datetime.datetime.now()
         else:
@@ -108,10 +106,9 @@ def get_file(mc_ip, mc_port, file_key: str, output_root, timeout, logger: loggin
 
     path_file_output = os.path.join(output_root, file_key)
     for n in range(max_try):
-        s_cmd = '''TradingPlatform.MessageClient.exe %s %s getfile "%s" "%s" ''' % (
-            mc_ip, mc_port, file_key, path_file_output)
+        l_args = [mc_ip, mc_port, 'getfile', file_key, path_file_output]
 
-        error_type, return_msg = _run_mc(s_cmd=s_cmd, timeout=timeout, logger=logger)
+        error_type, return_msg = _run_mc(l_args=l_args, timeout=timeout, logger=logger)
         if not error_type:
             # logger.info(f'downloaded {file_key}')
             return datetime.datetime.now()
@@ -144,11 +141,9 @@ def get_message(mc_ip, mc_port, message_key: str, timeout, logger: logging.Logge
         max_try = 1
 
     for n in range(max_try):
-        s_cmd = '''TradingPlatform.MessageClient.exe %s %s getmessage "%s"''' % (
-            mc_ip, mc_port, message_key)
-        # print(s_cmd)
+        l_args = [mc_ip, mc_port, 'getmessage', message_key]
 
-        error_type, msg = _run_mc(s_cmd=s_cmd, timeout=timeout, logger=logger)
+        error_type, msg = _run_mc(l_args=l_args, timeout=timeout, logger=logger)
         # print(msg)
         if error_type:
             logger.error(msg)
@@ -177,9 +172,8 @@ def send_message(mc_ip, mc_port, key, msg, timeout, logger: logging.Logger,
         max_try = 1
 
     for n in range(max_try):
-        s_cmd = '''TradingPlatform.MessageClient.exe %s %s sendmessage "%s" "%s"''' % (
-            mc_ip, mc_port, key, msg)
-        error_type, msg = _run_mc(s_cmd=s_cmd, timeout=timeout, logger=logger)
+        l_args = [mc_ip, mc_port, 'sendmessage', key, msg]
+        error_type, output_s = _run_mc(l_args=l_args, timeout=timeout, logger=logger)
         if not error_type:
             return datetime.datetime.now()
         else:
@@ -2,3 +2,4 @@ import os
 
 P_PKG = os.path.dirname(os.path.abspath(__file__))
 MESSAGE_CLIENT_ADDRESS = os.path.join(P_PKG, 'TradingPlatform.MessageClient')
+MESSAGE_CLIENT_EXE = os.path.join(MESSAGE_CLIENT_ADDRESS, 'TradingPlatform.MessageClient.exe')
@@ -1,2 +1,3 @@
 from .object import find_bm_simulation_sub_folder
-from .object import TraderPnlsData, TraderPnlsCsv, RawSignalsData, RawSignalsCsv
+from .object import BMSimulationScanner, BMSimulationSummaryData, summarize_trader_pnls
+from .object import TraderPnlsData, TraderPnlsCsv, TraderPnlsDateIndex, RawSignalsData, RawSignalsCsv
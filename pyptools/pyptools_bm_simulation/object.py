@@ -1,7 +1,11 @@
 import os
 from datetime import datetime, date, time
 from dataclasses import dataclass
-from typing import List
+from typing import List, Dict, FrozenSet, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import threading
 
 """
 ./TraderPnls.csv
@@ -94,6 +98,92 @@ class TraderPnlsCsv:
         return [_.Date for _ in l_trader_pnls_datas]
 
 
+class TraderPnlsDateIndex:
+    """
+    TraderPnls.csv 的 日期/Trader 索引, { Trader: frozenset(date) }
+    只解析每行的前两列（Date, Trader），不生成 TraderPnlsData;
+    按文件的 (mtime, size) 缓存，文件没有变化时不再读取; 返回的日期集合不可修改（与缓存共用）。
+    用于快速检查 "某些日期每个trader是否都有数据"。
+    """
+    _cache = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _read(cls, p) -> Dict[str, FrozenSet[date]]:
+        d_index = defaultdict(set)
+        d_date = {}
+        with open(p) as f:
+            f.readline()     # 第一行为列头
+            for line in f:
+                l_data = line.split(',', 2)
+                if len(l_data) < 3:
+                    if line.strip() == '':
+                        continue
+                    raise ValueError(f'TraderPnls.csv 数据错误, {p}, {line}')
+                _s_date = l_data[0]
+                _date = d_date.get(_s_date)
+                if _date is None:
+                    _date = datetime.strptime(_s_date, '%Y%m%d').date()
+                    d_date[_s_date] = _date
+                d_index[l_data[1]].add(_date)
+        return {_trader: frozenset(_dates) for _trader, _dates in d_index.items()}
+
+    @classmethod
+    def read(cls, p) -> Dict[str, FrozenSet[date]]:
+        p = os.path.abspath(p)
+        assert os.path.isfile(p)
+        _stat = os.stat(p)
+        _signature = (_stat.st_mtime_ns, _stat.st_size)
+        with cls._lock:
+            _cached = cls._cache.get(p)
+        if _cached and _cached[0] == _signature:
+            return dict(_cached[1])
+        _index = cls._read(p)
+        with cls._lock:
+            cls._cache[p] = (_signature, _index)
+        return dict(_index)
+
+    @classmethod
+    def get_dates(cls, p) -> List[date]:
+        """文件中所有日期，去重、排序"""
+        _dates = set()
+        for _trader_dates in cls.read(p).values():
+            _dates.update(_trader_dates)
+        return sorted(_dates)
+
+    @classmethod
+    def find_missing(
+            cls, paths: List[str], dates: List[date], traders: List[str] or None = None, max_workers=16
+    ) -> Dict[str, List[Tuple[str, date]]]:
+        """
+        一次检查多个 TraderPnls.csv，返回每个文件缺少的 (trader, date)
+        :param paths: TraderPnls.csv 文件路径
+        :param dates: 需要检查的日期
+        :param traders: 需要检查的trader，默认为文件中出现的所有trader
+        :param max_workers:
+        :return: { path: [(trader, date), ] }
+        """
+        def _find(p) -> List[Tuple[str, date]]:
+            _index = cls.read(p)
+            _traders = traders if traders is not None else sorted(_index.keys())
+            _l_missing = []
+            for _trader in _traders:
+                _trader_dates = _index.get(_trader, set())
+                for _date in dates:
+                    if _date not in _trader_dates:
+                        _l_missing.append((_trader, _date))
+            return _l_missing
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            d_future = {_p: executor.submit(_find, _p) for _p in paths}
+        return {_p: _future.result() for _p, _future in d_future.items()}
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+
 # RawSignals.csv
 @dataclass(order=True)
 class RawSignalsData:
@@ -224,10 +314,28 @@ class RawSignalsCsv:
         pass
 
 
+# simulation文件夹名 的前14位为时间 %Y%m%d%H%M%S，可直接按字符串排序
+def _is_simulation_folder_name(name, exclude_fake=True) -> bool:
+    if exclude_fake and not name.isdigit():
+        return False
+    return len(name) >= 14 and name[:14].isdigit()
+
+
+def _is_valid_simulation_folder_time(name) -> bool:
+    try:
+        datetime.strptime(name[:14], '%Y%m%d%H%M%S')
+    except:
+        return False
+    else:
+        return True
+
+
 # 找最新的simulation文件夹
 def find_bm_simulation_sub_folder(p, exclude_fake=True, reverse=True, ) -> None or str:
     """
     输入bm路径，返回最新（或最旧）的simulation文件夹路径。
+    文件夹名的前14位数字按字符串排序即为时间顺序，只需对排序后的候选逐个做 strptime 校验，
+    一般只需校验1次。
     :param p: bm文件夹路径
     :param exclude_fake: 是否跳过假的simulation文件夹
     :param reverse: 默认True，返回最新的文件夹；若False，则返回最旧的文件夹
@@ -244,20 +352,157 @@ def find_bm_simulation_sub_folder(p, exclude_fake=True, reverse=True, ) -> None
 
     # 查找符合要求的文件夹
     l_simulation_folder = []
-    for _simulation_folder_name in os.listdir(p_simulation_root):
-        p_simulation_folder = os.path.join(p_simulation_root, _simulation_folder_name)
-        if not os.path.isdir(p_simulation_folder):
-            continue
-        if exclude_fake:
-            if not _simulation_folder_name.isdigit():
+    with os.scandir(p_simulation_root) as it:
+        for _entry in it:
+            if not _is_simulation_folder_name(_entry.name, exclude_fake=exclude_fake):
                 continue
-        try:
-            _name_dt = datetime.strptime(_simulation_folder_name[:14], '%Y%m%d%H%M%S')
-        except:
-            continue
-        else:
-            l_simulation_folder.append([_name_dt, p_simulation_folder])
+            if not _entry.is_dir():
+                continue
+            l_simulation_folder.append([_entry.name[:14], _entry.path])
     # 返回最新或最旧的文件夹
-    if len(l_simulation_folder) == 0:
-        return None
-    return sorted(l_simulation_folder, key=lambda x: x[0], reverse=reverse)[0][1]
+    l_simulation_folder.sort(key=lambda x: x[0], reverse=reverse)
+    for _name, _path in l_simulation_folder:
+        if _is_valid_simulation_folder_time(_name):
+            return _path
+    return None
+
+
+@dataclass
+class BMSimulationSummaryData:
+    BM: str
+    SimulationFolder: str
+    Trader: str
+    StartDate: date
+    EndDate: date
+    Days: int
+    Pnl: float
+    Commission: float
+    Slippage: float
+    TradeAmount: float
+
+
+class BMSimulationScanner:
+    """
+    并行扫描 root 目录下所有 bm 的 Simulation 文件夹，
+        1) 查找每个bm最新的 simulation 文件夹,
+        2) 读取其中的 TraderPnls.csv, 按 Trader 汇总,
+        3) 返回合并后的汇总表 List[BMSimulationSummaryData]
+    bm 文件夹一般位于网络共享盘，耗时主要在I/O等待，所以使用线程池。
+    """
+    TraderPnlsFileName = 'TraderPnls.csv'
+    SkippingString = ['bak', 'offline']
+
+    def __init__(self, root, max_workers=16, exclude_fake=True, logger=logging.Logger('BMSimulationScanner')):
+        assert os.path.isdir(root)
+        self._root = os.path.abspath(root)
+        self._max_workers = max_workers
+        self._exclude_fake = exclude_fake
+        self.logger = logger
+
+    @property
+    def root(self):
+        return self._root
+
+    def find_bm_folders(self) -> List[str]:
+        """root 下的 bm 文件夹（跳过 bak, offline）"""
+        l_bm_folders = []
+        with os.scandir(self._root) as it:
+            for _entry in it:
+                if not _entry.is_dir():
+                    continue
+                _name_lower = _entry.name.lower()
+                if True in [_s in _name_lower for _s in self.SkippingString]:
+                    continue
+                l_bm_folders.append(_entry.path)
+        l_bm_folders.sort()
+        return l_bm_folders
+
+    def _find_trader_pnls_file(self, p_bm, warn=False) -> Tuple[str or None, str or None]:
+        """-> (最新simulation文件夹, TraderPnls.csv路径); 找不到时为 None"""
+        if not os.path.isdir(os.path.join(p_bm, 'Simulation')):
+            return None, None
+        p_simulation = find_bm_simulation_sub_folder(p_bm, exclude_fake=self._exclude_fake)
+        if not p_simulation:
+            if warn:
+                self.logger.warning(f'找不到simulation文件夹, {p_bm}')
+            return None, None
+        p_trader_pnls = os.path.join(p_simulation, self.TraderPnlsFileName)
+        if not os.path.isfile(p_trader_pnls):
+            if warn:
+                self.logger.warning(f'找不到TraderPnls.csv, {p_simulation}')
+            return p_simulation, None
+        return p_simulation, p_trader_pnls
+
+    def _scan_a_bm(self, p_bm) -> List[BMSimulationSummaryData]:
+        p_simulation, p_trader_pnls = self._find_trader_pnls_file(p_bm, warn=True)
+        if not p_trader_pnls:
+            return []
+        return summarize_trader_pnls(
+            TraderPnlsCsv.read_file(p_trader_pnls),
+            bm=os.path.basename(p_bm), simulation_folder=p_simulation
+        )
+
+    def scan(self) -> List[BMSimulationSummaryData]:
+        l_bm_folders = self.find_bm_folders()
+        l_summary = []
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            d_future = {executor.submit(self._scan_a_bm, _p): _p for _p in l_bm_folders}
+            for _future in as_completed(d_future):
+                try:
+                    l_summary += _future.result()
+                except Exception as e:
+                    self.logger.error(f'读取simulation失败, {d_future[_future]}, {e}')
+        l_summary.sort(key=lambda x: (x.BM, x.Trader))
+        return l_summary
+
+    def find_trader_pnls_files(self) -> Dict[str, str]:
+        """{ bm文件夹名: 最新simulation的TraderPnls.csv路径 }"""
+        def _find(p_bm) -> str or None:
+            return self._find_trader_pnls_file(p_bm)[1]
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            d_future = {os.path.basename(_p): executor.submit(_find, _p) for _p in self.find_bm_folders()}
+        return {_bm: _future.result() for _bm, _future in d_future.items() if _future.result()}
+
+    def find_missing_trader_pnls(
+            self, dates: List[date], traders: List[str] or None = None) -> Dict[str, List[Tuple[str, date]]]:
+        """所有bm最新simulation中，缺少的 (trader, date); { bm文件夹名: [(trader, date), ] }"""
+        d_files = self.find_trader_pnls_files()
+        d_missing = TraderPnlsDateIndex.find_missing(
+            list(d_files.values()), dates=dates, traders=traders, max_workers=self._max_workers)
+        return {_bm: d_missing[_p] for _bm, _p in d_files.items()}
+
+    @staticmethod
+    def to_csv(p, data: List[BMSimulationSummaryData]):
+        l_lines = [','.join(BMSimulationSummaryData.__annotations__.keys())]
+        for _data in data:
+            l_lines.append(','.join([
+                _data.BM, _data.SimulationFolder, _data.Trader,
+                _data.StartDate.strftime('%Y%m%d'), _data.EndDate.strftime('%Y%m%d'), str(_data.Days),
+                str(_data.Pnl), str(_data.Commission), str(_data.Slippage), str(_data.TradeAmount),
+            ]))
+        with open(p, 'w') as f:
+            f.write('\n'.join(l_lines))
+
+
+def summarize_trader_pnls(data: List[TraderPnlsData], bm='', simulation_folder='') -> List[BMSimulationSummaryData]:
+    """按 Trader 汇总 TraderPnlsData"""
+    d_trader_data = defaultdict(list)
+    for _data in data:
+        d_trader_data[_data.Trader].append(_data)
+    l_summary = []
+    for _trader, _l_data in d_trader_data.items():
+        l_dates = [_.Date for _ in _l_data]
+        l_summary.append(BMSimulationSummaryData(
+            BM=bm,
+            SimulationFolder=simulation_folder,
+            Trader=_trader,
+            StartDate=min(l_dates),
+            EndDate=max(l_dates),
+            Days=len(set(l_dates)),
+            Pnl=sum([_.Pnl for _ in _l_data]),
+            Commission=sum([_.Commission for _ in _l_data]),
+            Slippage=sum([_.Slippage for _ in _l_data]),
+            TradeAmount=sum([_.TradeAmount for _ in _l_data]),
+        ))
+    return l_summary
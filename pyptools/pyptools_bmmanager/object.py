@@ -4,11 +4,15 @@
 
 import re
 import os
-from typing import List
+from typing import List, Dict
 from dataclasses import dataclass
 from datetime import datetime
 import shutil
-from lxml import etree
+import pickle
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import logging
 
 #
 SKIPPING_STRING = ['bak', 'offline']
@@ -22,11 +26,84 @@ def _contain_skipping_string(s: str) -> bool:
     return False
 
 
+class BMConfigParseCache:
+    """
+    进程内的配置文件解析缓存,
+        { path: ((mtime_ns, size), parsed_data) }
+    文件的 mtime 或 size 变化时重新解析，否则直接返回上次解析的结果。
+    缓存的是解析出的基础数据(dict / list of tuple)，而不是配置对象本身，
+    避免多个对象共享同一个可修改的实例。
+
+    可选持久化到 pickle 文件（.dump() / .load()），再次运行 bm manager 工具时只需解析有变化的文件。
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_signature(p) -> tuple:
+        _stat = os.stat(p)
+        return _stat.st_mtime_ns, _stat.st_size
+
+    def get(self, p, parser):
+        p = os.path.abspath(p)
+        _signature = self._file_signature(p)
+        with self._lock:
+            _cached = self._data.get(p)
+        if _cached and _cached[0] == _signature:
+            return _cached[1]
+        _parsed = parser(p)
+        with self._lock:
+            self._data[p] = (_signature, _parsed)
+        return _parsed
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def load(self, p):
+        """读取持久化的缓存; 文件不存在或损坏时忽略"""
+        if not os.path.isfile(p):
+            return
+        try:
+            with open(p, 'rb') as f:
+                _data = pickle.load(f)
+        except Exception:
+            return
+        if type(_data) is not dict:
+            return
+        with self._lock:
+            _data.update(self._data)
+            self._data = _data
+
+    def dump(self, p):
+        with self._lock:
+            _data = self._data.copy()
+        if not os.path.isdir(os.path.dirname(os.path.abspath(p))):
+            os.makedirs(os.path.dirname(os.path.abspath(p)))
+        _p_tmp = p + '.tmp'
+        with open(_p_tmp, 'wb') as f:
+            pickle.dump(_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(_p_tmp, p)
+
+
+# 进程内共享的解析缓存
+PARSE_CACHE = BMConfigParseCache()
+
+
 class BMRoot:
-    def __init__(self, p):
+    def __init__(self, p, cache_file=None):
+        """
+        :param p:
+        :param cache_file: 可选，持久化解析缓存的 pickle 文件路径
+        """
         assert os.path.isdir(p)
         self._path = os.path.abspath(p)
         self._bms: List[BrokerMini] = list()
+        self._cache_file = cache_file
+        if self._cache_file:
+            PARSE_CACHE.load(self._cache_file)
 
         self._find_bm_folder()
 
@@ -51,6 +128,11 @@ class BMRoot:
             _bms.append(BrokerMini(p_folder))
         self._bms = _bms
 
+    def save_cache(self):
+        """将解析缓存写入 cache_file"""
+        if self._cache_file:
+            PARSE_CACHE.dump(self._cache_file)
+
 
 class BrokerMini:
     folder_name_pattern = re.compile(r"^Broker\.(?P<BrokerId>\d{4})@(?P<FundName>.+)@(?P<StrategyName>.+)$")
@@ -61,22 +143,50 @@ class BrokerMini:
         self.FolderName = os.path.basename(p)
         assert self.parse_folder_name(self.FolderName)
 
-        self.BrokerConfig = BrokerConfig(os.path.join(self.path, 'Config', 'Broker.config'))
-        self.SubscribeCsv = BMSubscribeCsv(os.path.join(self.path, 'Config', 'Subscribe.csv'))
-        self.TraderConfigList: List[BMTraderConfig] = []
-        for _trader_file_name in os.listdir(os.path.join(self.path, 'Config', 'Strategies')):
-            if not _contain_skipping_string(_trader_file_name):
-                self.TraderConfigList.append(BMTraderConfig(
-                    os.path.join(self.path, 'Config', 'Strategies', _trader_file_name)))
-
-        self.BrokerId = self.BrokerConfig.BrokerId
-        self.FundName = self.BrokerConfig.FundName
-        self.StrategyName = self.BrokerConfig.StrategyName
+        # 配置文件在首次访问时才读取
+        self._broker_config: BrokerConfig or None = None
+        self._subscribe_csv: BMSubscribeCsv or None = None
+        self._trader_config_list: List[BMTraderConfig] or None = None
 
     @property
     def path(self):
         return self._path
 
+    @property
+    def BrokerConfig(self):
+        if self._broker_config is None:
+            self._broker_config = BrokerConfig(os.path.join(self.path, 'Config', 'Broker.config'))
+        return self._broker_config
+
+    @property
+    def SubscribeCsv(self):
+        if self._subscribe_csv is None:
+            self._subscribe_csv = BMSubscribeCsv(os.path.join(self.path, 'Config', 'Subscribe.csv'))
+        return self._subscribe_csv
+
+    @property
+    def TraderConfigList(self):
+        if self._trader_config_list is None:
+            _l = []
+            for _trader_file_name in os.listdir(os.path.join(self.path, 'Config', 'Strategies')):
+                if not _contain_skipping_string(_trader_file_name):
+                    _l.append(BMTraderConfig(
+                        os.path.join(self.path, 'Config', 'Strategies', _trader_file_name)))
+            self._trader_config_list = _l
+        return self._trader_config_list
+
+    @property
+    def BrokerId(self):
+        return self.BrokerConfig.BrokerId
+
+    @property
+    def FundName(self):
+        return self.BrokerConfig.FundName
+
+    @property
+    def StrategyName(self):
+        return self.BrokerConfig.StrategyName
+
     @classmethod
     def parse_folder_name(cls, s) -> dict or None:
         try:
@@ -110,15 +220,22 @@ class BrokerConfig:
         self.Account = None
         self.read()
 
-    def read(self):
-        _tree: etree._ElementTree = etree.parse(self.path)
+    @staticmethod
+    def _parse(p) -> dict:
+        from lxml import etree      # 缓存命中时不需要 lxml
+        _tree: etree._ElementTree = etree.parse(p)
         _root: etree._Element = _tree.getroot()
+        return {
+            'BrokerId': _root.find('BrokerId').text,
+            'StrategyName': _root.find('StrategyName').text,
+            'FundName': _root.find('FundName').text,
+            'DataPath': _root.find('DataPath').text,
+            'Account': _root.find('Accounts').find('AccountConfig').find('Account').text,
+        }
 
-        self.BrokerId = _root.find('BrokerId').text
-        self.StrategyName = _root.find('StrategyName').text
-        self.FundName = _root.find('FundName').text
-        self.DataPath = _root.find('DataPath').text
-        self.Account = _root.find('Accounts').find('AccountConfig').find('Account').text
+    def read(self):
+        for _k, _v in PARSE_CACHE.get(self.path, self._parse).items():
+            setattr(self, _k, _v)
 
     def __str__(self):
         return f'BrokerConfig: BrokerId={self.BrokerId}, FundName={self.FundName},' \
@@ -146,9 +263,10 @@ class BMSubscribeCsv:
         self.data: List[BMSubscribeData] = []
         self.read()
     
-    def read(self):
+    @staticmethod
+    def _parse(p) -> List[tuple]:
         _data = []
-        with open(self.path) as f:
+        with open(p) as f:
             l_lines = f.readlines()
         for line in l_lines:
             line = line.strip()
@@ -156,8 +274,11 @@ class BMSubscribeCsv:
                 continue
             _sub, _pub, _allocation = line.split(',')
             _allocation = float(_allocation)
-            _data.append(BMSubscribeData(_sub, _pub, _allocation))
-        self.data = _data
+            _data.append((_sub, _pub, _allocation))
+        return _data
+
+    def read(self):
+        self.data = [BMSubscribeData(*_) for _ in PARSE_CACHE.get(self.path, self._parse)]
             
     def write(self, bak=True):
         # 备份
@@ -170,9 +291,138 @@ class BMSubscribeCsv:
                 )
             )
         # 写
-        l_lines = '\n'.join([str(_sub_data) for _sub_data in self.data])
         with open(self.path, 'w') as f:
-            f.writelines(l_lines)
+            f.writelines(self.render(self.data))
+
+    @staticmethod
+    def render(data: List[BMSubscribeData]) -> str:
+        return '\n'.join([str(_sub_data) for _sub_data in data])
+
+
+class BMSubscribeTransaction:
+    """
+    批量修改多个 Subscribe.csv，一次提交:
+        1) 与文件当前数据对比，跳过没有变化的文件;
+        2) 所有有变化的文件，原内容打包为一个 zip 备份;
+        3) 并行写入临时文件，全部成功后再逐个 rename 替换;
+           写临时文件失败，则不修改任何文件; rename 过程中失败，则恢复已替换的文件。
+
+    with BMSubscribeTransaction(bak_root) as trans:
+        for bm in bm_root.bms:
+            ... 修改 bm.SubscribeCsv.data
+            trans.stage(bm.SubscribeCsv)
+    """
+
+    TmpSuffix = '.tmp'
+
+    def __init__(self, bak_root=None, bak=True, max_workers=8, logger=logging.Logger('BMSubscribeTransaction')):
+        """
+        :param bak_root: 备份zip输出的文件夹，默认为所有修改文件的公共上级目录
+        :param bak: 是否备份
+        :param max_workers: 并行写文件的线程数
+        """
+        self._bak_root = bak_root
+        self._bak = bak
+        self._max_workers = max_workers
+        self.logger = logger
+        self._staged: Dict[str, List[BMSubscribeData]] = {}
+
+    def stage(self, subscribe_csv: BMSubscribeCsv):
+        self.stage_data(subscribe_csv.path, subscribe_csv.data)
+
+    def stage_data(self, p, data: List[BMSubscribeData]):
+        self._staged[os.path.abspath(p)] = list(data)
+
+    def _gen_bak_file(self, d_old_content: Dict[str, bytes]) -> str:
+        _common_root = os.path.commonpath([os.path.dirname(_p) for _p in d_old_content])
+        _bak_root = self._bak_root if self._bak_root else _common_root
+        if not os.path.isdir(_bak_root):
+            os.makedirs(_bak_root)
+        # 同一秒内多次提交时，文件名不能重复
+        _s_time = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        p_bak = os.path.join(_bak_root, f'Subscribe.{_s_time}.bak.zip')
+        _n = 0
+        while os.path.exists(p_bak):
+            _n += 1
+            p_bak = os.path.join(_bak_root, f'Subscribe.{_s_time}_{_n}.bak.zip')
+        with zipfile.ZipFile(p_bak, 'x', compression=zipfile.ZIP_DEFLATED) as f:
+            for _p, _content in d_old_content.items():
+                f.writestr(os.path.relpath(_p, start=_common_root), _content)
+        return p_bak
+
+    @classmethod
+    def _write_tmp(cls, p, content: str or bytes):
+        with open(p + cls.TmpSuffix, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+
+    def commit(self) -> List[str]:
+        """返回实际修改了的文件"""
+        # [1] 对比解析后的数据，跳过没有变化的文件（不受换行符、"1" / "1.0" 等格式差异影响）
+        d_old_content = {}
+        d_new_content = {}
+        for _p, _data in self._staged.items():
+            _new_rows = [(_d.SubTrader, _d.PubTrader, float(_d.Allocation)) for _d in _data]
+            if BMSubscribeCsv._parse(_p) == _new_rows:
+                continue
+            # 原文件按字节保存，备份 / 恢复时内容不变
+            with open(_p, 'rb') as f:
+                d_old_content[_p] = f.read()
+            d_new_content[_p] = BMSubscribeCsv.render(_data)
+        self._staged = {}
+        if not d_new_content:
+            self.logger.info('Subscribe.csv 没有变化')
+            return []
+
+        # [2] 备份
+        if self._bak:
+            p_bak = self._gen_bak_file(d_old_content)
+            self.logger.info(f'备份 Subscribe.csv, {p_bak}')
+
+        # [3] 并行写临时文件
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            l_futures = [executor.submit(self._write_tmp, _p, _c) for _p, _c in d_new_content.items()]
+        _error = None
+        for _future in l_futures:
+            if _future.exception():
+                _error = _future.exception()
+        if _error:
+            for _p in d_new_content:
+                if os.path.isfile(_p + self.TmpSuffix):
+                    os.remove(_p + self.TmpSuffix)
+            self.logger.error(f'写入 Subscribe.csv 失败, 没有修改任何文件, {_error}')
+            raise _error
+
+        # [4] 替换
+        l_replaced = []
+        try:
+            for _p in d_new_content:
+                os.replace(_p + self.TmpSuffix, _p)
+                l_replaced.append(_p)
+        except Exception as e:
+            self.logger.error(f'替换 Subscribe.csv 失败, 恢复已修改的文件, {e}')
+            for _p in l_replaced:
+                self._write_tmp(_p, d_old_content[_p])
+                os.replace(_p + self.TmpSuffix, _p)
+            for _p in d_new_content:
+                if os.path.isfile(_p + self.TmpSuffix):
+                    os.remove(_p + self.TmpSuffix)
+            raise e
+        for _p in l_replaced:
+            self.logger.info(f'修改 Subscribe.csv, {_p}')
+        return l_replaced
+
+    def rollback(self):
+        """放弃所有未提交的修改"""
+        self._staged = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
 
 
 class BMTraderConfig:
@@ -192,23 +442,32 @@ class BMTraderConfig:
         self.UsePreloadCache = None
         self.read()
 
-    def read(self):
-        _tree: etree._ElementTree = etree.parse(self.path)
+    @staticmethod
+    def _parse(p) -> dict:
+        from lxml import etree      # 缓存命中时不需要 lxml
+        _tree: etree._ElementTree = etree.parse(p)
         _root: etree._Element = _tree.getroot()
 
-        self.Identity = _root.find('Identity').text
-        self.InitX = float(_root.find('Params').find('InitX').text)
-        self.TimeZoneIndex = _root.find('Params').find('TimeZoneIndex').text
-        self.StrategyMode = _root.find('Params').find('StrategyMode').text
-        if self.StrategyMode == 'Subscribe':
-            self.ExecutorUrgency = _root.find('Params').find('ExecutorUrgency').text
-            self.UseTwapAdjust = bool(str(_root.find('Params').find('UseTwapAdjust').text).lower() == 'true')
-            self.TwapN = float(_root.find('Params').find('TwapN').text)
-            self.UseSignalCache = bool(str(_root.find('Params').find('UseSignalCache').text).lower() == 'true')
+        _d = {
+            'Identity': _root.find('Identity').text,
+            'InitX': float(_root.find('Params').find('InitX').text),
+            'TimeZoneIndex': _root.find('Params').find('TimeZoneIndex').text,
+            'StrategyMode': _root.find('Params').find('StrategyMode').text,
+        }
+        if _d['StrategyMode'] == 'Subscribe':
+            _d['ExecutorUrgency'] = _root.find('Params').find('ExecutorUrgency').text
+            _d['UseTwapAdjust'] = bool(str(_root.find('Params').find('UseTwapAdjust').text).lower() == 'true')
+            _d['TwapN'] = float(_root.find('Params').find('TwapN').text)
+            _d['UseSignalCache'] = bool(str(_root.find('Params').find('UseSignalCache').text).lower() == 'true')
         else:
-            self.EndPoint = _root.find('Params').find('EndPoint').text
-            self.PreloadDays = float(_root.find('Params').find('PreloadDays').text)
-            self.UsePreloadCache = _root.find('Params').find('UsePreloadCache').text
+            _d['EndPoint'] = _root.find('Params').find('EndPoint').text
+            _d['PreloadDays'] = float(_root.find('Params').find('PreloadDays').text)
+            _d['UsePreloadCache'] = _root.find('Params').find('UsePreloadCache').text
+        return _d
+
+    def read(self):
+        for _k, _v in PARSE_CACHE.get(self.path, self._parse).items():
+            setattr(self, _k, _v)
 
     def __str__(self):
         return f'TraderConfig: Trader={self.Identity}'
@@ -1 +1,3 @@
 from .ds import DSChecker, DSManager
+from .tick import TickDataReader, TickDataFile, TickDataCache
+from .tick_monitor import TickArrivalMonitor
@@ -34,14 +34,34 @@ import logging
 
 from ..common.object import (
     Product, Ticker,
-    BarData, TickData,
+    BarData, TickData, BarDataSeries, TickDataSeries,
     HolidayFile
 )
 from ..common.constant import AllMinuteTime, BarDataMode
 from ..common.common_util import (gen_date_range, gen_list_diff)
-from ..common.trading_session import TradingSessionDataSet, TradingSessionData, TradingSessionManager
+from ..common.trading_session import (
+    TradingSessionDataSet, TradingSessionData, TradingSessionManager, gen_minute_mask)
 from ..common.general_ticker_info import GeneralTickerInfoFile, GeneralTickerInfoManager, TickerInfoData
+from ..common.reference_data import ReferenceDataStore
 from .most_activate_ticker import MostActivateTickerInfo, MostActivateTickerFile, MostActivateTickerManager
+from .tick import TickDataReader
+from .tick_monitor import TickArrivalMonitor
+from ..helper.metrics import get_registry, SIZE_BUCKETS
+
+_METRICS = get_registry()
+
+
+def _parse_bar_time_us(s) -> int:
+    """
+    HH:MM:SS -> 当天的微秒数; 与 _read_a_bar_file 相同，也接受不补 0 的格式 (如 9:5:0)，
+    格式错误时 ValueError
+    """
+    if len(s) == 8 and s[2] == ':' and s[5] == ':':
+        _h, _m, _s = int(s[0:2]), int(s[3:5]), int(s[6:8])
+        if _h < 24 and _m < 60 and _s < 60:
+            return (_h * 3600 + _m * 60 + _s) * 1000000
+    _t = datetime.strptime(s, '%H:%M:%S').time()
+    return (_t.hour * 3600 + _t.minute * 60 + _t.second) * 1000000
 
 
 class DSManager:
@@ -69,12 +89,14 @@ class DSManager:
         获取数据:
             1) 获取数据文件路径
                 ge_bar_data_file()
-            2) 获取bar数据, List[BarData]
+            2) 获取bar数据, List[BarData] / BarDataSeries (series=True)
                 get_bar_data()
                 数据类型 ({Type}_{Mode}) :
                     1) Ticker_NormalData
                     2) Product_NormalData
                     3) Product_BackAdjustedData
+            3) 获取tick数据, TickDataSeries
+                get_tick_data()
 
 
 
@@ -102,7 +124,12 @@ class DSManager:
             cls._instances[root] = _instance
         return cls._instances[root]
 
-    def __init__(self, root, logger=logging.Logger('DSManager')):
+    def __init__(self, root, logger=logging.Logger('DSManager'), reference_snapshot: str or None = None):
+        """
+        :param root: DS 目录
+        :param logger:
+        :param reference_snapshot: 可选，基础数据（GeneralTickerInfo, TradingSession, Holidays）的 pickle 快照路径
+        """
         assert os.path.isdir(root)
         self._root = root
         self.logger = logger
@@ -121,30 +148,23 @@ class DSManager:
             raise NotADirectoryError
 
         # 初始化
+        # 基础数据，进程内共用
+        self.reference_data = ReferenceDataStore.get(
+            self._release_data_folder, holiday_file=self._holiday_file, snapshot_path=reference_snapshot)
         # 假期信息
-        self._holiday_infos: Dict[str, List[date]] = self._read_holiday_file()
+        self._holiday_infos: Dict[str, List[date]] = self.reference_data.holidays
         # 主力合约、复权因子
         self.most_activate_tickers_manager = MostActivateTickerManager(self._most_activate_ticker_file)
         # 合约基本信息
-        self.general_ticker_info_manager = GeneralTickerInfoManager(self._release_data_folder)
+        self.general_ticker_info_manager = self.reference_data.general_ticker_info_manager()
         # 交易时间
-        self.trading_session_manager = TradingSessionManager(self._release_data_folder)
+        self.trading_session_manager = self.reference_data.trading_session_manager()
 
-        # bar 数据文件路径
+        # bar / tick 数据文件路径索引, { (folder_relpath, prefix, date): { Ticker: path } }
+        # 当天及之后的日期文件可能还在增加，不缓存
         self.bar_data_files = {}
-
-    def _read_holiday_file(self):
-        _d = defaultdict(list)
-        with open(self._holiday_file) as f:
-            l_lines = f.readlines()
-        for line in l_lines:
-            line = line.strip()
-            if line == '':
-                continue
-            _exchange, _date = line.split(',')
-            _date = datetime.strptime(_date, '%Y/%m/%d').date()
-            _d[_exchange].append(_date)
-        return _d
+        self._data_file_index: Dict[tuple, Dict[Ticker, str]] = {}
+        self._tick_data_reader = None
 
     # 基础方法-获取数据/数据文件
     # (1) ticker
@@ -198,19 +218,57 @@ class DSManager:
 
         d_ticker_files = {}
         for _prefix in _checking_prefix:
-            _path_date = os.path.join(
-                self._root, self.BarDataFolderRelpath, _prefix,
-                query_date.strftime('%Y%m%d'),
-            )
-            if not os.path.isdir(_path_date):
-                continue
+            d_ticker_files.update(self._list_date_data_files(self.BarDataFolderRelpath, _prefix, query_date))
+        return d_ticker_files
+
+    # 获取某一天的所有tick文件
+    def get_date_tick_data_file(self, query_date: date, prefix: str or None = None) -> Dict[Ticker, str]:
+        if prefix and prefix in self.PrefixFolderName:
+            _checking_prefix = [prefix]
+        else:
+            _checking_prefix = self.PrefixFolderName
+        d_ticker_files = {}
+        for _prefix in _checking_prefix:
+            d_ticker_files.update(self._list_date_data_files(self.TickDataFolderName, _prefix, query_date))
+        return d_ticker_files
+
+    def _list_date_data_files(self, folder_relpath, prefix, query_date: date) -> Dict[Ticker, str]:
+        """{DS}/{folder_relpath}/{prefix}/{YYYYMMDD}/{Ticker}.csv"""
+        _key = (folder_relpath, prefix, query_date)
+        if _key in self._data_file_index:
+            _METRICS.counter('ds_file_index', result='hit').inc()
+            return self._data_file_index[_key]
+        _METRICS.counter('ds_file_index', result='miss').inc()
+        d_ticker_files = {}
+        _path_date = os.path.join(self._root, folder_relpath, prefix, query_date.strftime('%Y%m%d'))
+        if os.path.isdir(_path_date):
             for ticker_file_name in os.listdir(_path_date):
                 _ticker_name = ticker_file_name.replace('.csv', '')
                 _ticker = Ticker.from_name(_ticker_name)
                 _ticker_file = os.path.join(_path_date, ticker_file_name)
                 d_ticker_files[_ticker] = _ticker_file
+        if query_date < datetime.now().date():
+            self._data_file_index[_key] = d_ticker_files
         return d_ticker_files
 
+    # tick 数据
+    @property
+    def tick_data_reader(self) -> TickDataReader:
+        if self._tick_data_reader is None:
+            self._tick_data_reader = TickDataReader(self)
+        return self._tick_data_reader
+
+    def set_tick_data_cache(self, cache_root: str or None):
+        """设置 tick 数据的二进制缓存目录，None 则不使用缓存"""
+        self._tick_data_reader = TickDataReader(self, cache_root=cache_root)
+
+    def get_tick_data(
+            self, ticker: Ticker, query_date: date,
+            start: time or None = None, end: time or None = None) -> TickDataSeries or None:
+        """获取某个ticker某一天 [start, end) 的tick数据"""
+        with _METRICS.timer('ds_read_seconds', kind='tick'):
+            return self.tick_data_reader.read(ticker, query_date, start=start, end=end)
+
     #
     def get_product_mat(self, product: Product, query_date: date) -> Ticker:
         return self.most_activate_tickers_manager.get_a_most_activate_ticker(product, query_date)
@@ -231,7 +289,7 @@ class DSManager:
         if not using_holiday:
             _holidays = []
         else:
-            holiday: Dict[str, List[date]] = self._holiday_infos.copy()
+            holiday: Dict[str, List[date]] = self._holiday_infos
             if symbol.exchange in holiday.keys():
                 _holidays: List[date] = holiday[symbol.exchange]
             else:
@@ -263,7 +321,7 @@ class DSManager:
         if not using_holiday:
             _holidays = []
         else:
-            holiday: Dict[str, List[date]] = self._holiday_infos.copy()
+            holiday: Dict[str, List[date]] = self._holiday_infos
             if exchange in holiday.keys():
                 _holidays: List[date] = holiday[exchange]
             else:
@@ -339,29 +397,32 @@ class DSManager:
             symbol: Ticker or Product,
             start: date, end: date or None,
             mode: BarDataMode = BarDataMode.NormalData,
-            using_holiday: bool = True
-    ) -> List[List[BarData]]:
-        """读取并返回BarData"""
+            using_holiday: bool = True,
+            series: bool = False,
+    ) -> List[List[BarData]] or List[BarDataSeries]:
+        """
+        读取并返回BarData, 每个文件一个 List[BarData];
+        series=True 时每个文件一个列式存储的 BarDataSeries
+        """
         # TODO 未完成
         # holiday 处理
-        # 查询日期
-        l_query_dates = self._gen_trading_dates(symbol, start, end, using_holiday)
-
         #
         d_files: Dict[date, list] = self.get_bar_data_file(symbol, start, end, mode, using_holiday)
+        _read = self._read_a_bar_file_series if series else self._read_a_bar_file
         # 获取数据
         l_data = []
         if type(symbol) is Ticker:
-            for _date, _files in d_files:
+            for _date, _files in d_files.items():
                 for _file in _files:
-                    l_data.append(self._read_a_bar_file(_file))
+                    l_data.append(_read(_file))
         elif type(symbol) is Product:
             if mode == BarDataMode.NormalData:
-                for _date, _files in d_files:
+                for _date, _files in d_files.items():
                     for _file in _files:
-                        l_data.append(self._read_a_bar_file(_file))
+                        l_data.append(_read(_file))
             elif mode == BarDataMode.BackAdjustedData:
                 pass
+        return l_data
 
     @staticmethod
     def _read_a_bar_file(file) -> List[BarData]:
@@ -394,8 +455,41 @@ class DSManager:
                 price=float(line_split[6]),
                 open_interest=float(line_split[7]),
             ))
+        DSManager._record_bar_file_metrics(file, len(_l_data))
         return _l_data
 
+    @staticmethod
+    def _record_bar_file_metrics(file, n_rows):
+        _METRICS.counter('ds_files_read', kind='bar').inc()
+        _METRICS.counter('ds_rows_read', kind='bar').inc(n_rows)
+        _METRICS.histogram('ds_file_size_bytes', buckets=SIZE_BUCKETS, kind='bar').observe(os.path.getsize(file))
+
+    @staticmethod
+    def _read_a_bar_file_series(file) -> BarDataSeries:
+        """同 _read_a_bar_file，返回列式存储的 BarDataSeries"""
+        file_name = os.path.basename(file)
+        s_date = os.path.basename(os.path.dirname(file))
+        _ticker = Ticker.from_name(file_name[:-4])
+        _date = datetime.strptime(s_date, '%Y%m%d').date()
+
+        _series = BarDataSeries(_ticker, _date)
+        _time_us = _series.time_us
+        _columns = [_series.column(_field) for _field in BarDataSeries.FloatFields]
+        with open(file) as f:
+            for line in f:
+                line = line.strip()
+                if line == '':
+                    continue
+                line_split = line.split(',')
+                if len(line_split) != 8:
+                    print(f'Bar数据文件错误, {file}, {line}')
+                    raise ValueError
+                _time_us.append(_parse_bar_time_us(line_split[0]))
+                for _column, _value in zip(_columns, line_split[1:]):
+                    _column.append(float(_value))
+        DSManager._record_bar_file_metrics(file, len(_time_us))
+        return _series
+
 
 
     def _get_product_mat_bar(self, product: Product, query_date: date, _baj=False):
@@ -416,12 +510,22 @@ class DSChecker:
                 MostActivate
                 TradingSession
         2) Tick数据盘中监控,
+            monitor_tick(), 见 TickArrivalMonitor
     """
 
     def __init__(self, root, logger=logging.Logger('DSChecker')):
         self.ds_manager = DSManager(root, logger=logger)
         self.logger = logger
 
+    def monitor_tick(self, tickers: List[Ticker] or None = None, **kwargs):
+        """
+        盘中Tick数据接收监控，阻塞运行，参数见 TickArrivalMonitor
+        :param tickers: 默认为当天的所有最活跃合约
+        """
+        import asyncio
+        monitor = TickArrivalMonitor(self.ds_manager, tickers=tickers, logger=self.logger, **kwargs)
+        asyncio.run(monitor.run())
+
     def _check_bar_data(self, data: List[BarData]):
         for _a_bar in data:
             pass
@@ -451,36 +555,13 @@ class DSChecker:
     @staticmethod
     def _check_trading_session(
             data: List[BarData], trading_session_data: TradingSessionData) -> List[time]:
-        _data_times: List[time] = [_.time for _ in data]        # 所有bar 时间
-        _data_times.sort()
-        _checking_time_n = -1       # 用于遍历 需要检查的 交易时间
-        _data_time_n = 0            # 用于遍历 所有bar的 数据时间
+        """返回交易时间内缺少的bar时间"""
+        _data_times = set([_.time for _ in data])        # 所有bar 时间
+        _mask: bytes = gen_minute_mask(trading_session_data.TradingSession)
         l_losing_time = []      # 存储缺少的时间
-        # 根据trading session 指定的时间区间进行检查
-        for _a_session in trading_session_data.TradingSession:
-            _session_start: time = _a_session[0]
-            _session_end: time = _a_session[1]
-            while True:
-                # 需要检查的 交易时间
-                _checking_time_n += 1
-                _checking_time = AllMinuteTime[_checking_time_n]
-                if _checking_time < _session_start:
-                    continue
-                if _checking_time > _session_end:
-                    break
-                # 看看bar数据中有没有此时间
-                while True:
-                    _data_time = _data_times[_data_time_n]
-                    if _data_time < _checking_time:
-                        _data_time_n += 1
-                        continue
-                    elif _data_time == _checking_time:
-                        # 存在此时间的数据
-                        break
-                    else:
-                        # 不存在此时间的数据
-                        l_losing_time.append(_checking_time)
-                        break
+        for _m in range(1440):
+            if _mask[_m] and AllMinuteTime[_m] not in _data_times:
+                l_losing_time.append(AllMinuteTime[_m])
         return l_losing_time
 
 
@@ -0,0 +1,221 @@
+"""
+Tick 数据读取
+    {DS}/TickData/{Prefix}/{YYYYMMDD}/{Ticker}.csv
+
+    文件没有列头，每行:
+        time,open,high,low,close,volume,price,bid_price_1..5,ask_price_1..5,bid_volume_1..5,ask_volume_1..5,localtime
+    time/localtime 格式 HH:MM:SS 或 HH:MM:SS.ffffff; 列数不足时，缺少的列为 0 / None
+
+    1) 按时间区间读取（start, end）时，以 mmap 打开文件，二分查找区间的起止位置，只解析区间内的行;
+    2) 可选的二进制列式缓存（cache_root）, 首次读取后保存为 .npy (列 x 行, float64)，
+       之后以 mmap_mode='r' 读取，不需要解析csv; 源文件的 mtime/size 变化时重建。
+
+    夜盘: 一个交易日的数据从前一晚的夜盘开始，>= 18:00 的数据视为前一日，排在当天数据之前。
+"""
+
+import os
+import json
+import mmap
+from datetime import date, time
+from typing import List, Dict
+
+from ..common.object import Ticker, TickDataSeries
+
+_US_PER_DAY = 24 * 3600 * 1000000
+_NIGHT_START_US = 18 * 3600 * 1000000
+
+
+def _parse_time_us(s) -> int:
+    """HH:MM:SS[.ffffff] -> 当天的微秒数"""
+    _us = (int(s[0:2]) * 3600 + int(s[3:5]) * 60 + int(s[6:8])) * 1000000
+    if len(s) > 9:
+        _us += int(s[9:15].ljust(6, '0'))
+    return _us
+
+
+def _sort_key(time_us: int) -> int:
+    """交易日内的排序: 夜盘排在最前"""
+    return time_us - _US_PER_DAY if time_us >= _NIGHT_START_US else time_us
+
+
+class TickDataFile:
+    Columns = ['time'] + list(TickDataSeries.FloatFields) + ['localtime']
+
+    @classmethod
+    def _parse_lines(cls, lines, ticker: Ticker, query_date: date) -> TickDataSeries:
+        _series = TickDataSeries(ticker, query_date)
+        _time_us = _series.time_us
+        _localtime_us = _series.localtime_us
+        _columns = [_series.column(_field) for _field in TickDataSeries.FloatFields]
+        _n_float = len(_columns)
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            line_split = line.split(',')
+            _time_us.append(_parse_time_us(line_split[0]))
+            _values = line_split[1: 1 + _n_float]
+            for _column, _value in zip(_columns, _values):
+                _column.append(float(_value) if _value else 0)
+            for _column in _columns[len(_values):]:
+                _column.append(0)
+            if len(line_split) > 1 + _n_float and line_split[1 + _n_float]:
+                _localtime_us.append(_parse_time_us(line_split[1 + _n_float]))
+            else:
+                _localtime_us.append(-1)
+        return _series
+
+    @staticmethod
+    def _line_start(mm, position) -> int:
+        """position 及之后的第一个行首位置"""
+        if position <= 0:
+            return 0
+        _n = mm.find(b'\n', position - 1)
+        return len(mm) if _n < 0 else _n + 1
+
+    @classmethod
+    def _key_at(cls, mm, position) -> int or None:
+        """从 position 行开始第一条非空行的排序时间; 之后没有数据时返回 None"""
+        while position < len(mm):
+            _end = mm.find(b'\n', position)
+            _end = len(mm) if _end < 0 else _end
+            _s_time = mm[position: _end].split(b',', 1)[0].strip()
+            if _s_time:
+                return _sort_key(_parse_time_us(_s_time.decode()))
+            position = _end + 1
+        return None
+
+    @classmethod
+    def _bisect(cls, mm, key_us) -> int:
+        """
+        第一行 sort_key(time) >= key_us 的起始位置。
+        lo, hi 均为行首: lo 之前的行都 < key_us; hi 行 >= key_us (或 hi 为文件末尾)
+        """
+        lo, hi = 0, len(mm)
+        while lo < hi:
+            _pos = cls._line_start(mm, (lo + hi) // 2)
+            if _pos >= hi:
+                _pos = lo
+            _key = cls._key_at(mm, _pos)
+            if _key is not None and _key < key_us:
+                lo = cls._line_start(mm, _pos + 1)
+            else:
+                hi = _pos
+        return lo
+
+    @classmethod
+    def read(cls, p, ticker: Ticker, query_date: date,
+             start: time or None = None, end: time or None = None) -> TickDataSeries:
+        """读取 [start, end) 区间的数据; 不指定区间时读取全部"""
+        if os.path.getsize(p) == 0:
+            return TickDataSeries(ticker, query_date)
+        with open(p, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                _pos_start = 0 if start is None else cls._bisect(mm, _sort_key(_parse_time_us(str(start))))
+                _pos_end = len(mm) if end is None else cls._bisect(mm, _sort_key(_parse_time_us(str(end))))
+                if _pos_end <= _pos_start:
+                    return TickDataSeries(ticker, query_date)
+                _lines = mm[_pos_start: _pos_end].decode().split('\n')
+        return cls._parse_lines(_lines, ticker, query_date)
+
+
+class TickDataCache:
+    """
+    二进制列式缓存
+        {cache_root}/{YYYYMMDD}/{Ticker}.npy          float64, shape=(列数, 行数)
+        {cache_root}/{YYYYMMDD}/{Ticker}.json         源文件信息 {path, mtime_ns, size}
+    列: time, FloatFields..., localtime; 行按交易日内时间排序
+    """
+    Columns = TickDataFile.Columns
+
+    def __init__(self, root):
+        self._root = os.path.abspath(root)
+
+    def _paths(self, ticker: Ticker, query_date: date) -> (str, str):
+        _folder = os.path.join(self._root, query_date.strftime('%Y%m%d'))
+        return os.path.join(_folder, ticker.name + '.npy'), os.path.join(_folder, ticker.name + '.json')
+
+    @staticmethod
+    def _source_info(p_source) -> dict:
+        _stat = os.stat(p_source)
+        return {'path': os.path.abspath(p_source), 'mtime_ns': _stat.st_mtime_ns, 'size': _stat.st_size}
+
+    def is_valid(self, ticker: Ticker, query_date: date, p_source) -> bool:
+        p_data, p_info = self._paths(ticker, query_date)
+        if not (os.path.isfile(p_data) and os.path.isfile(p_info)):
+            return False
+        with open(p_info) as f:
+            _info = json.load(f)
+        return _info == self._source_info(p_source)
+
+    def build(self, ticker: Ticker, query_date: date, p_source) -> str:
+        import numpy as np
+        _series: TickDataSeries = TickDataFile.read(p_source, ticker, query_date)
+        _arr = np.empty((len(self.Columns), len(_series)), dtype=np.float64)
+        _arr[0] = _series.to_numpy()
+        for n, _field in enumerate(TickDataSeries.FloatFields):
+            _arr[n + 1] = _series.to_numpy(_field)
+        _arr[-1] = np.frombuffer(_series.localtime_us, dtype=np.int64)
+
+        p_data, p_info = self._paths(ticker, query_date)
+        if not os.path.isdir(os.path.dirname(p_data)):
+            os.makedirs(os.path.dirname(p_data))
+        with open(p_data + '.tmp', 'wb') as f:
+            np.save(f, _arr)
+        os.replace(p_data + '.tmp', p_data)
+        with open(p_info, 'w') as f:
+            json.dump(self._source_info(p_source), f)
+        return p_data
+
+    def read(self, ticker: Ticker, query_date: date,
+             start: time or None = None, end: time or None = None) -> TickDataSeries:
+        import numpy as np
+        p_data, _ = self._paths(ticker, query_date)
+        _arr = np.load(p_data, mmap_mode='r')
+        _time_us = _arr[0].astype(np.int64)
+        _key = np.where(_time_us >= _NIGHT_START_US, _time_us - _US_PER_DAY, _time_us)
+        _i_start = 0 if start is None else int(np.searchsorted(_key, _sort_key(_parse_time_us(str(start)))))
+        _i_end = len(_key) if end is None else int(np.searchsorted(_key, _sort_key(_parse_time_us(str(end)))))
+        return TickDataSeries.from_columns(
+            ticker, query_date,
+            _time_us[_i_start: _i_end],
+            {_field: _arr[n + 1][_i_start: _i_end] for n, _field in enumerate(TickDataSeries.FloatFields)},
+            localtime_us=_arr[-1][_i_start: _i_end].astype(np.int64),
+        )
+
+
+class TickDataReader:
+    """
+    读取 DS 目录下的 tick 数据，文件查找使用 DSManager 的文件索引
+    """
+
+    def __init__(self, ds_manager, cache_root: str or None = None):
+        self._ds_manager = ds_manager
+        self._cache: TickDataCache or None = TickDataCache(cache_root) if cache_root else None
+
+    def get_tick_data_file(self, ticker: Ticker, query_date: date) -> str or None:
+        return self._ds_manager.get_date_tick_data_file(query_date).get(ticker)
+
+    def read(self, ticker: Ticker, query_date: date,
+             start: time or None = None, end: time or None = None) -> TickDataSeries or None:
+        """读取某个ticker某一天 [start, end) 的tick数据; 找不到文件时返回 None"""
+        p_file = self.get_tick_data_file(ticker, query_date)
+        if not p_file:
+            return None
+        if self._cache is None:
+            return TickDataFile.read(p_file, ticker, query_date, start=start, end=end)
+        if not self._cache.is_valid(ticker, query_date, p_file):
+            self._cache.build(ticker, query_date, p_file)
+        return self._cache.read(ticker, query_date, start=start, end=end)
+
+    def read_date(self, query_date: date, tickers: List[Ticker] or None = None,
+                  start: time or None = None, end: time or None = None) -> Dict[Ticker, TickDataSeries]:
+        d_files = self._ds_manager.get_date_tick_data_file(query_date)
+        if tickers is None:
+            tickers = list(d_files.keys())
+        d_data = {}
+        for _ticker in tickers:
+            _series = self.read(_ticker, query_date, start=start, end=end)
+            if _series is not None:
+                d_data[_ticker] = _series
+        return d_data
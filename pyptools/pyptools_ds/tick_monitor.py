@@ -0,0 +1,237 @@
+"""
+盘中 Tick 数据接收监控
+
+    跟踪当天所有最活跃合约的 tick 文件，只读取文件新增的部分（记录每个文件的 offset），
+    记录每个ticker最后一次收到数据的时间;
+    在交易时间内超过 stale_seconds 没有新数据时，通过 WarningBoard（以及可选的 MessageClient）报警，
+    恢复接收后解除报警。
+
+    文件变化通知:
+        安装了 inotify_simple（Linux）时使用 inotify，否则按 poll_interval 轮询文件大小。
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, time
+from dataclasses import dataclass
+from typing import List, Dict, Callable
+
+from ..common.object import Ticker
+from ..helper.tp_WarningBoard import run_warning_board
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+    inotify_flags = None
+
+
+@dataclass
+class TickArrivalState:
+    ticker: Ticker
+    path: str or None = None
+    offset: int = 0
+    last_update: datetime or None = None        # 最后一次收到新数据的本地时间
+    last_tick_time: time or None = None        # 最后一条tick的数据时间
+    is_alerting: bool = False
+
+    def latency(self, now: datetime) -> float or None:
+        if self.last_update is None:
+            return None
+        return (now - self.last_update).total_seconds()
+
+
+class TickArrivalMonitor:
+    def __init__(
+            self,
+            ds_manager,
+            tickers: List[Ticker] or None = None,
+            trading_date: date or None = None,
+            stale_seconds: float = 60,
+            poll_interval: float = 1,
+            rescan_interval: float = 30,
+            time_zone_index: str = '210',
+            alert: Callable[[Ticker, str], None] or None = None,
+            message_client=None,
+            message_key: str = 'TickArrivalMonitor',
+            logger: logging.Logger = logging.Logger('TickArrivalMonitor'),
+    ):
+        """
+        :param ds_manager: DSManager
+        :param tickers: 需要监控的ticker，默认为 trading_date 的所有最活跃合约
+        :param trading_date: 默认当天
+        :param stale_seconds: 交易时间内，超过此时间没有新数据则报警
+        :param poll_interval: 轮询 / 检查间隔(s)
+        :param rescan_interval: 重新查找尚未出现的tick文件的间隔(s)
+        :param alert: 自定义报警方法 alert(ticker, msg)，默认使用 WarningBoard
+        :param message_client: 可选，PyMessageClient.MessageClient，报警时同时 sendmessage
+        """
+        self._ds_manager = ds_manager
+        self._trading_date = trading_date if trading_date else datetime.now().date()
+        if tickers is None:
+            tickers = list(
+                ds_manager.most_activate_tickers_manager.get_most_activate_tickers_at_date(self._trading_date).values())
+        self._stale_seconds = stale_seconds
+        self._poll_interval = poll_interval
+        self._rescan_interval = rescan_interval
+        self._time_zone_index = time_zone_index
+        self._alert = alert
+        self._message_client = message_client
+        self._message_key = message_key
+        self.logger = logger
+
+        self._states: Dict[Ticker, TickArrivalState] = {_ticker: TickArrivalState(ticker=_ticker) for _ticker in tickers}
+        self._last_rescan: datetime or None = None
+        self._start_time: datetime = datetime.now()
+        self._stop_event: asyncio.Event or None = None
+        # run() 中报警（WarningBoard / MessageClient 会启动进程、重试）在此线程中发送，不阻塞监控
+        self._alert_executor: ThreadPoolExecutor or None = None
+
+    @property
+    def states(self) -> Dict[Ticker, TickArrivalState]:
+        return self._states
+
+    # 查找尚未出现的tick文件
+    def _rescan_files(self):
+        _now = datetime.now()
+        if self._last_rescan and (_now - self._last_rescan).total_seconds() < self._rescan_interval:
+            return
+        self._last_rescan = _now
+        if True not in [_state.path is None for _state in self._states.values()]:
+            return
+        d_files: Dict[Ticker, str] = self._ds_manager.get_date_tick_data_file(self._trading_date)
+        for _ticker, _state in self._states.items():
+            if _state.path is None and _ticker in d_files:
+                _state.path = d_files[_ticker]
+                self.logger.info(f'开始监控tick文件, {_state.path}')
+
+    @staticmethod
+    def _read_new_data(state: TickArrivalState) -> bool:
+        """读取文件新增的完整行，返回是否有新数据"""
+        try:
+            _size = os.path.getsize(state.path)
+        except OSError:
+            return False
+        if _size < state.offset:
+            # 文件被重写
+            state.offset = 0
+        if _size == state.offset:
+            return False
+        with open(state.path, 'rb') as f:
+            f.seek(state.offset)
+            _bytes = f.read(_size - state.offset)
+        _n = _bytes.rfind(b'\n')
+        if _n < 0:
+            return False
+        state.offset += _n + 1
+        for _line in _bytes[:_n].split(b'\n')[::-1]:
+            _s_time = _line.split(b',', 1)[0].strip()
+            if _s_time:
+                try:
+                    state.last_tick_time = datetime.strptime(_s_time[:8].decode(), '%H:%M:%S').time()
+                except ValueError:
+                    pass
+                break
+        state.last_update = datetime.now()
+        return True
+
+    def _in_trading_time(self, ticker: Ticker, now: datetime) -> bool:
+        _trading_session_set = self._ds_manager.trading_session_manager.get_time_zone_data(self._time_zone_index)
+        if not _trading_session_set:
+            return False
+        return _trading_session_set.is_trading_minute(ticker.product, now.time(), checking_date=self._trading_date)
+
+    def _raise_alert(self, ticker: Ticker, msg: str):
+        self.logger.warning(msg)
+        if self._alert_executor is None:
+            self._send_alert(ticker, msg)
+            return
+        _future = self._alert_executor.submit(self._send_alert, ticker, msg)
+
+        def _on_done(_f):
+            if _f.exception() is not None:
+                self.logger.error(f'发送报警失败, {ticker.name}, {repr(_f.exception())}')
+        _future.add_done_callback(_on_done)
+
+    def _send_alert(self, ticker: Ticker, msg: str):
+        if self._alert:
+            self._alert(ticker, msg)
+        else:
+            run_warning_board(warning_msg=msg)
+        if self._message_client:
+            self._message_client.sendmessage(key=self._message_key, message=msg)
+
+    def check(self, now: datetime or None = None):
+        """读取所有文件的新数据，并检查是否超时"""
+        now = now if now else datetime.now()
+        self._rescan_files()
+        for _ticker, _state in self._states.items():
+            if _state.path:
+                self._read_new_data(_state)
+            if not self._in_trading_time(_ticker, now):
+                continue
+            _latency = _state.latency(now)
+            if _latency is None:
+                # 交易时间内还没有数据，从开始监控时计算
+                _latency = (now - self._start_time).total_seconds()
+            if _latency > self._stale_seconds:
+                if not _state.is_alerting:
+                    _state.is_alerting = True
+                    self._raise_alert(_ticker, f'Tick数据超时, {_ticker.name}, {int(_latency)}s')
+            elif _state.is_alerting:
+                _state.is_alerting = False
+                self.logger.info(f'Tick数据恢复, {_ticker.name}')
+
+    def _add_inotify_watch(self, inotify, watched: set):
+        for _state in self._states.values():
+            if _state.path:
+                _folder = os.path.dirname(_state.path)
+                if _folder not in watched:
+                    inotify.add_watch(_folder, inotify_flags.MODIFY | inotify_flags.CREATE)
+                    watched.add(_folder)
+
+    async def run(self):
+        """运行直到 stop(); 读取文件和发送报警都在线程中运行，不阻塞事件循环"""
+        import asyncio
+        self._stop_event = asyncio.Event()
+        self._start_time = datetime.now()
+        _loop = asyncio.get_event_loop()
+        self._alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='TickArrivalMonitor.alert')
+        _check_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='TickArrivalMonitor.check')
+        _changed = asyncio.Event()
+
+        inotify = None
+        _watched = set()
+        if INotify is not None:
+            inotify = INotify()
+
+            def _on_inotify():
+                inotify.read(timeout=0)
+                _changed.set()
+            _loop.add_reader(inotify.fd, _on_inotify)
+            self.logger.info('使用 inotify 监控tick文件')
+        else:
+            self.logger.info('使用轮询监控tick文件')
+
+        try:
+            while not self._stop_event.is_set():
+                await _loop.run_in_executor(_check_executor, self.check)
+                if inotify is not None:
+                    self._add_inotify_watch(inotify, _watched)
+                _changed.clear()
+                try:
+                    await asyncio.wait_for(_changed.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if inotify is not None:
+                _loop.remove_reader(inotify.fd)
+                inotify.close()
+            _check_executor.shutdown(wait=False)
+            self._alert_executor.shutdown(wait=False)
+            self._alert_executor = None
+
+    def stop(self):
+        if self._stop_event:
+            self._stop_event.set()
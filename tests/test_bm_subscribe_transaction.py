@@ -0,0 +1,95 @@
+import os
+import zipfile
+
+import pytest
+
+from pyptools.pyptools_bmmanager.object import BMSubscribeTransaction, BMSubscribeData
+
+
+def _write(p, content):
+    with open(p, 'w', newline='') as f:
+        f.write(content)
+
+
+def _read(p):
+    with open(p, newline='') as f:
+        return f.read()
+
+
+@pytest.fixture
+def bm_files(tmp_path):
+    l_paths = []
+    for _name in ['BM1', 'BM2']:
+        os.makedirs(tmp_path / _name)
+        _p = str(tmp_path / _name / 'Subscribe.csv')
+        _write(_p, 'A,B,1.0\nA,C,0.5')
+        l_paths.append(_p)
+    return tmp_path, l_paths
+
+
+def test_commit_skips_unchanged_data(bm_files):
+    root, (p1, p2) = bm_files
+    # 格式不同但数据相同: CRLF, 末尾换行, "1" 与 "1.0"
+    _write(p1, 'A,B,1\r\nA,C,0.5\r\n')
+    trans = BMSubscribeTransaction(bak_root=str(root / 'bak'))
+    trans.stage_data(p1, [BMSubscribeData('A', 'B', 1.0), BMSubscribeData('A', 'C', 0.5)])
+    assert trans.commit() == []
+    assert _read(p1) == 'A,B,1\r\nA,C,0.5\r\n'
+    assert not os.path.exists(root / 'bak')
+
+
+def test_commit_writes_changed_and_backs_up(bm_files):
+    root, (p1, p2) = bm_files
+    trans = BMSubscribeTransaction(bak_root=str(root / 'bak'))
+    trans.stage_data(p1, [BMSubscribeData('A', 'B', 2.0)])
+    trans.stage_data(p2, [BMSubscribeData('A', 'B', 1.0), BMSubscribeData('A', 'C', 0.5)])
+    assert trans.commit() == [p1]
+    assert _read(p1) == 'A,B,2.0'
+    assert _read(p2) == 'A,B,1.0\nA,C,0.5'
+    l_bak = os.listdir(root / 'bak')
+    assert len(l_bak) == 1
+    with zipfile.ZipFile(str(root / 'bak' / l_bak[0])) as f:
+        assert f.namelist() == ['Subscribe.csv']
+        assert f.read('Subscribe.csv') == b'A,B,1.0\nA,C,0.5'
+
+
+def test_backup_names_unique(bm_files):
+    root, (p1, p2) = bm_files
+    for _allocation in [2.0, 3.0, 4.0]:
+        trans = BMSubscribeTransaction(bak_root=str(root / 'bak'))
+        trans.stage_data(p1, [BMSubscribeData('A', 'B', _allocation)])
+        trans.commit()
+    assert len(os.listdir(root / 'bak')) == 3
+
+
+def test_replace_failure_restores_files(bm_files, monkeypatch):
+    root, (p1, p2) = bm_files
+    trans = BMSubscribeTransaction(bak=False)
+    trans.stage_data(p1, [BMSubscribeData('A', 'B', 2.0)])
+    trans.stage_data(p2, [BMSubscribeData('A', 'B', 3.0)])
+
+    _replace = os.replace
+    d_calls = {'n': 0}
+
+    def _failing_replace(src, dst):
+        d_calls['n'] += 1
+        if d_calls['n'] == 2:
+            raise OSError('replace failed')
+        return _replace(src, dst)
+    monkeypatch.setattr(os, 'replace', _failing_replace)
+
+    with pytest.raises(OSError):
+        trans.commit()
+    assert _read(p1) == 'A,B,1.0\nA,C,0.5'
+    assert _read(p2) == 'A,B,1.0\nA,C,0.5'
+    assert not [_ for _ in os.listdir(os.path.dirname(p1)) if _.endswith('.tmp')]
+    assert not [_ for _ in os.listdir(os.path.dirname(p2)) if _.endswith('.tmp')]
+
+
+def test_context_manager_rollback_on_error(bm_files):
+    root, (p1, p2) = bm_files
+    with pytest.raises(ValueError):
+        with BMSubscribeTransaction(bak=False) as trans:
+            trans.stage_data(p1, [BMSubscribeData('A', 'B', 2.0)])
+            raise ValueError
+    assert _read(p1) == 'A,B,1.0\nA,C,0.5'
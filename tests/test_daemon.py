@@ -0,0 +1,33 @@
+import logging
+from datetime import datetime
+
+import ticker_daemon
+
+
+class _Checker:
+    def run_once(self):
+        pass
+
+
+def _dt(s):
+    return datetime.strptime(s, '%Y%m%d %H:%M:%S')
+
+
+def _actions(daemon, s):
+    return [_action for _job, _func, _action in daemon._update_jobs(_dt(s))]
+
+
+def test_run_window_tolerates_late_wakeup():
+    daemon = ticker_daemon.MostActivateTickerDaemon(_Checker(), ['08:30'], logging.getLogger('test'))
+    assert _actions(daemon, '20260101 08:29:00') == []
+    assert _actions(daemon, '20260101 08:30:45') == ['start']
+    assert _actions(daemon, '20260101 08:32:00') == ['end']
+
+
+def test_missed_run_is_caught_up():
+    daemon = ticker_daemon.MostActivateTickerDaemon(_Checker(), ['08:30'], logging.getLogger('test'))
+    assert _actions(daemon, '20260101 08:29:59') == []
+    assert _actions(daemon, '20260101 08:31:01') == ['catch_up']
+    assert _actions(daemon, '20260101 09:00:00') == []
+    # 跨日休眠
+    assert _actions(daemon, '20260102 12:00:00') == ['catch_up']
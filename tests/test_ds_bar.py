@@ -0,0 +1,41 @@
+import os
+from datetime import date
+
+import pytest
+
+from pyptools.common.object import Ticker, BarDataSeries
+from pyptools.pyptools_ds.ds import DSManager, _parse_bar_time_us
+
+
+def _bar_file(tmp_path) -> str:
+    p = str(tmp_path / '20260105' / 'cu2602.csv')
+    os.makedirs(os.path.dirname(p))
+    with open(p, 'w') as f:
+        f.write('09:01:00,1,2,0.5,1.5,10,1.2,100\n9:2:0,2,3,1,2,20,2.2,110\n')
+    return p
+
+
+def test_parse_bar_time_us():
+    assert _parse_bar_time_us('09:05:00') == _parse_bar_time_us('9:5:0') == (9 * 3600 + 5 * 60) * 1000000
+    for _s in ['25:00:00', '09-05-00', '0905', '09:5x:00']:
+        with pytest.raises(ValueError):
+            _parse_bar_time_us(_s)
+
+
+def test_series_matches_rows(tmp_path):
+    p = _bar_file(tmp_path)
+    l_rows = DSManager._read_a_bar_file(p)
+    _series = DSManager._read_a_bar_file_series(p)
+    assert isinstance(_series, BarDataSeries)
+    assert list(_series) == l_rows
+
+
+def test_get_bar_data_series(tmp_path):
+    p = _bar_file(tmp_path)
+    # 不读取 DS 目录，只替换文件查询
+    ds = object.__new__(DSManager)
+    ds.get_bar_data_file = lambda *args, **kwargs: {date(2026, 1, 5): [p]}
+    _ticker = Ticker.from_name('cu2602')
+    l_series = ds.get_bar_data(_ticker, date(2026, 1, 5), None, series=True)
+    assert [type(_) for _ in l_series] == [BarDataSeries]
+    assert ds.get_bar_data(_ticker, date(2026, 1, 5), None) == [list(l_series[0])]
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+from pyptools.helper.PyMessageClient.filecache import FileCache
+from pyptools.helper.PyMessageClient.MessageClient import MessageClient, MessageClientRtnData
+
+
+def _write(p, content):
+    with open(p, 'w') as f:
+        f.write(content)
+
+
+def _read(p):
+    with open(p) as f:
+        return f.read()
+
+
+def test_eviction_least_recently_used(tmp_path):
+    p_src = str(tmp_path / 'src')
+    _write(p_src, 'x' * 10)
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=25)
+    cache.put('a', p_src, 't1')
+    time.sleep(0.01)
+    cache.put('b', p_src, 't1')
+    time.sleep(0.01)
+    # a 最近使用过，b 被删除
+    assert cache.restore('a', str(tmp_path / 'out_a'), 't1')
+    time.sleep(0.01)
+    cache.put('c', p_src, 't1')
+    assert cache.get('a') and cache.get('c')
+    assert cache.get('b') is None
+    assert not os.path.exists(os.path.dirname(cache.data_path('b')))
+
+    # 重新加载
+    cache2 = FileCache(str(tmp_path / 'cache'), max_bytes=25)
+    assert sorted(cache2._entries) == ['a', 'c']
+
+
+def test_restore(tmp_path):
+    p_src = str(tmp_path / 'src')
+    _write(p_src, 'content')
+    cache = FileCache(str(tmp_path / 'cache'))
+    cache.put('a', p_src, 't1')
+
+    assert not cache.restore('a', str(tmp_path / 'out'), 't2')
+    assert cache.restore('a', str(tmp_path / 'out'), 't1')
+    assert _read(str(tmp_path / 'out')) == 'content'
+
+    # 缓存文件不完整 -> 未命中，并删除该 key
+    _write(cache.data_path('a'), 'cont')
+    assert not cache.restore('a', str(tmp_path / 'out2'), 't1')
+    assert cache.get('a') is None
+    assert not os.path.exists(str(tmp_path / 'out2'))
+
+
+def test_getfile_coalesced_waiters_get_own_path(tmp_path):
+    mc = MessageClient('127.0.0.1', 0, logger=logging.getLogger('test'), cache_folder=str(tmp_path / 'cache'))
+    d_calls = {'n': 0}
+
+    def _slow_getfile_cached(key, file_path, *args, **kwargs):
+        d_calls['n'] += 1
+        time.sleep(0.3)
+        _write(file_path, 'data-' + key)
+        return MessageClientRtnData(datetime=datetime.now(), exception=None, path=file_path)
+    mc._getfile_cached = _slow_getfile_cached
+
+    l_paths = [str(tmp_path / 'out' / f'{i}.csv') for i in range(4)]
+    d_result = {}
+
+    def _get(p):
+        d_result[p] = mc.getfile('k', p)
+    l_threads = [threading.Thread(target=_get, args=(_p,)) for _p in l_paths]
+    for _t in l_threads:
+        _t.start()
+    for _t in l_threads:
+        _t.join()
+
+    assert d_calls['n'] == 1
+    for _p in l_paths:
+        assert d_result[_p].path == _p
+        assert _read(_p) == 'data-k'
@@ -0,0 +1,72 @@
+import pytest
+
+from pyptools.helper.filehelper.fileconcat import (
+    _external_sort, _unique_keep_last, _merge_sorted_unique,
+    _concat_files_in_memory, _concat_files_streaming,
+)
+
+
+def _write(p, lines):
+    with open(p, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _read_data(p):
+    with open(p) as f:
+        return [_.strip() for _ in f.readlines() if _.strip()]
+
+
+def test_external_sort_is_stable_across_chunks(tmp_path):
+    records = [('b', 'b,1'), ('a', 'a,1'), ('b', 'b,2'), ('c', 'c,1'), ('a', 'a,2'), ('b', 'b,3'), ('a', 'a,3')]
+    result = list(_external_sort(iter(records), 1, ',', chunk_lines=2, temp_folder=str(tmp_path)))
+    assert result == [
+        ('a', 'a,1'), ('a', 'a,2'), ('a', 'a,3'),
+        ('b', 'b,1'), ('b', 'b,2'), ('b', 'b,3'),
+        ('c', 'c,1'),
+    ]
+    # 临时文件已删除
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unique_keep_last():
+    records = [('a', 'a,1'), ('a', 'a,2'), ('b', 'b,1'), ('c', 'c,1'), ('c', 'c,2'), ('c', 'c,3')]
+    assert list(_unique_keep_last(iter(records))) == [('a', 'a,2'), ('b', 'b,1'), ('c', 'c,3')]
+
+
+@pytest.mark.parametrize('prefer_insert', [True, False])
+def test_merge_sorted_unique(prefer_insert):
+    base = [('a', 'a,base'), ('c', 'c,base')]
+    insert = [('b', 'b,insert'), ('c', 'c,insert'), ('d', 'd,insert')]
+    result = list(_merge_sorted_unique(iter(base), iter(insert), prefer_insert=prefer_insert))
+    assert [_[0] for _ in result] == ['a', 'b', 'c', 'd']
+    assert result[2][1] == ('c,insert' if prefer_insert else 'c,base')
+
+
+@pytest.mark.parametrize('concat_method', ['base', 'insert'])
+def test_streaming_matches_in_memory(tmp_path, concat_method):
+    p_base = str(tmp_path / 'base.csv')
+    p_insert = str(tmp_path / 'insert.csv')
+    # 未排序，含重复 key（保留最后一个）
+    _write(p_base, ['Date,Value', '20200103,b3', '20200101,b1', '20200102,b2', '20200101,b1_last'])
+    _write(p_insert, ['Date,Value', '20200104,i4', '20200102,i2', '20200102,i2_last'])
+
+    p_memory = str(tmp_path / 'out_memory' / 'out.csv')
+    p_streaming = str(tmp_path / 'out_streaming' / 'out.csv')
+    _key_memory, _errors = _concat_files_in_memory(
+        p_base, p_insert, p_memory, data_key_num=1, has_header=True, data_sperator=',',
+        sort_by_key=True, concat_method=concat_method)
+    assert not _errors
+    _key_streaming, _errors = _concat_files_streaming(
+        p_base, p_insert, p_streaming, data_key_num=1, has_header=True, data_sperator=',',
+        concat_method=concat_method, chunk_lines=2, temp_folder=str(tmp_path))
+    assert not _errors
+
+    assert _key_memory == _key_streaming == '20200104'
+    assert _read_data(p_memory) == _read_data(p_streaming)
+    assert _read_data(p_streaming) == [
+        'Date,Value',
+        '20200101,b1_last',
+        '20200102,b2' if concat_method == 'base' else '20200102,i2_last',
+        '20200103,b3',
+        '20200104,i4',
+    ]
@@ -0,0 +1,168 @@
+import os
+import logging
+from datetime import datetime, timedelta
+
+from pyptools.helper.PyMessageClient.MessageClient import MessageClient, MessageClientRtnData, RunException, MCTask
+
+
+class FakeServer:
+    """代替 TradingPlatform.MessageClient.exe，记录每次调用"""
+    def __init__(self):
+        self.d_data = {}
+        self.l_calls = []
+        self.fail_send_keys = set()
+
+    def run(self, l_args, timeout):
+        _task, l_rest = l_args[2], l_args[3:]
+        self.l_calls.append([_task] + l_rest)
+        _ok = lambda msg='': MessageClientRtnData(datetime=datetime.now(), exception=None, msg=msg)
+        _fail = MessageClientRtnData(datetime=datetime.now(), exception=RunException.TimeOut, msg='Exception')
+        if _task == MCTask.SendFile.value:
+            if l_rest[0] in self.fail_send_keys:
+                return _fail
+            with open(l_rest[1]) as f:
+                self.d_data[l_rest[0]] = f.read()
+            return _ok()
+        if _task == MCTask.SendMessage.value:
+            self.d_data[l_rest[0]] = l_rest[1]
+            return _ok()
+        if l_rest[0] not in self.d_data:
+            return _fail
+        if _task == MCTask.GetFile.value:
+            with open(l_rest[1], 'w') as f:
+                f.write(self.d_data[l_rest[0]])
+            return _ok()
+        return _ok(self.d_data[l_rest[0]])
+
+    def count(self, task: MCTask) -> int:
+        return len([_ for _ in self.l_calls if _[0] == task.value])
+
+
+def _client(tmp_path, cache=True):
+    mc = MessageClient(
+        '127.0.0.1', 0, logger=logging.getLogger('test'),
+        cache_folder=str(tmp_path / 'cache') if cache else None)
+    server = FakeServer()
+    mc._run_tp_mc = server.run
+    return mc, server
+
+
+def _write(p, content):
+    with open(p, 'w') as f:
+        f.write(content)
+
+
+def _read(p):
+    with open(p) as f:
+        return f.read()
+
+
+def test_getfile_cached_hit_and_update(tmp_path):
+    mc, server = _client(tmp_path)
+    p_src, p_out = str(tmp_path / 'src.csv'), str(tmp_path / 'out.csv')
+    _write(p_src, 'v1')
+    server.d_data['dt#k'] = '20260101 090000'
+    mc.sendfile('k', p_src, max_try=1)
+
+    assert not mc.getfile('k', p_out, max_try=1).cached
+    mcr = mc.getfile('k', p_out, max_try=1)
+    assert mcr.cached and _read(p_out) == 'v1'
+    assert server.count(MCTask.GetFile) == 1
+
+    _write(p_src, 'v2')
+    mc.sendfile('k', p_src, max_try=1, with_timestamp=True)
+    mcr = mc.getfile('k', p_out, max_try=1)
+    assert (not mcr.cached) and _read(p_out) == 'v2'
+
+
+def test_batch_update_not_served_from_per_key_cache(tmp_path):
+    mc, server = _client(tmp_path)
+    p_src, p_out = str(tmp_path / 'src.csv'), str(tmp_path / 'out.csv')
+    _write(p_src, 'v1')
+    mc.sendfile('k', p_src, max_try=1, with_timestamp=True)
+    assert _read(mc.getfile('k', p_out, max_try=1).path) == 'v1'
+
+    # v2 只更新了 dt#batch，dt#k 仍为 v1 的时间戳
+    _write(p_src, 'v2')
+    mc.send_many({'k': p_src}, max_try=1, batch_timestamp_key='batch')
+    mcr = mc.get_many({'k': p_out}, max_try=1, batch_timestamp_key='batch')['k']
+    assert (not mcr.cached) and _read(p_out) == 'v2'
+    # 批次时间戳未变时命中
+    assert mc.get_many({'k': p_out}, max_try=1, batch_timestamp_key='batch')['k'].cached
+
+
+def test_no_timestamp_not_cached(tmp_path):
+    mc, server = _client(tmp_path)
+    p_src, p_out = str(tmp_path / 'src.csv'), str(tmp_path / 'out.csv')
+    _write(p_src, 'v1')
+    mc.sendfile('k', p_src, max_try=1)
+    assert not mc.getfile('k', p_out, max_try=1).cached
+    assert not mc.getfile('k', p_out, max_try=1).cached
+    assert mc._cache.get('k') is None
+
+
+def test_send_many_single_batch_timestamp(tmp_path):
+    mc, server = _client(tmp_path)
+    d_files = {}
+    for _key in ['a', 'b', 'c']:
+        d_files[_key] = str(tmp_path / f'{_key}.csv')
+        _write(d_files[_key], _key)
+    d_rtn = mc.send_many(d_files, max_try=1, backoff=0, batch_timestamp_key='batch')
+    assert all([not _mcr.exception for _mcr in d_rtn.values()])
+    assert server.count(MCTask.SendMessage) == 1
+    assert 'dt#batch' in server.d_data
+    assert not [_ for _ in server.d_data if _.startswith('dt#') and _ != 'dt#batch']
+
+
+def test_send_many_withholds_batch_timestamp_on_failure(tmp_path):
+    mc, server = _client(tmp_path)
+    server.d_data['dt#batch'] = '20260101 090000'
+    server.fail_send_keys.add('b')
+    d_files = {}
+    for _key in ['a', 'b']:
+        d_files[_key] = str(tmp_path / f'{_key}.csv')
+        _write(d_files[_key], _key)
+    d_rtn = mc.send_many(d_files, max_try=1, backoff=0, batch_timestamp_key='batch')
+    assert d_rtn['b'].exception
+    assert server.count(MCTask.SendMessage) == 0
+    assert server.d_data['dt#batch'] == '20260101 090000'
+
+
+def test_get_many_checks_batch_timestamp_once(tmp_path):
+    mc, server = _client(tmp_path)
+    d_src, d_out = {}, {}
+    for _key in ['a', 'b', 'c']:
+        d_src[_key] = str(tmp_path / f'{_key}.csv')
+        d_out[_key] = str(tmp_path / 'out' / f'{_key}.csv')
+        _write(d_src[_key], _key)
+    mc.send_many(d_src, max_try=1, backoff=0, batch_timestamp_key='batch')
+
+    server.l_calls.clear()
+    d_rtn = mc.get_many(d_out, max_try=1, backoff=0, batch_timestamp_key='batch', with_timestamp_gap=60)
+    assert [_read(_mcr.path) for _mcr in d_rtn.values()] == ['a', 'b', 'c']
+    assert server.count(MCTask.GetMessage) == 1
+    assert server.count(MCTask.GetFile) == 3
+
+    server.l_calls.clear()
+    d_rtn = mc.get_many(d_out, max_try=1, backoff=0, batch_timestamp_key='batch')
+    assert all([_mcr.cached for _mcr in d_rtn.values()])
+    assert server.count(MCTask.GetMessage) == 1
+    assert server.count(MCTask.GetFile) == 0
+
+
+def test_get_many_batch_timestamp_too_old(tmp_path):
+    mc, server = _client(tmp_path, cache=False)
+    server.d_data['a'] = 'a'
+    server.d_data['dt#batch'] = (datetime.now() - timedelta(minutes=10)).strftime('%Y%m%d %H%M%S')
+    d_rtn = mc.get_many({'a': str(tmp_path / 'a.csv')}, max_try=1, batch_timestamp_key='batch', with_timestamp_gap=60)
+    assert d_rtn == {'a': None}
+    assert server.count(MCTask.GetFile) == 0
+    assert not os.path.exists(str(tmp_path / 'a.csv'))
+
+
+def test_get_many_without_cache_skips_per_key_timestamp(tmp_path):
+    mc, server = _client(tmp_path, cache=False)
+    server.d_data['a'] = 'a'
+    d_rtn = mc.get_many({'a': str(tmp_path / 'a.csv')}, max_try=1, batch_timestamp_key='batch')
+    assert _read(d_rtn['a'].path) == 'a'
+    assert server.count(MCTask.GetMessage) == 0
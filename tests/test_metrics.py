@@ -0,0 +1,47 @@
+import os
+import json
+import logging
+from datetime import datetime
+
+from pyptools.helper.metrics import MetricsRegistry
+
+
+def test_prometheus_counter_total_suffix():
+    metrics = MetricsRegistry()
+    metrics.counter('db_rows', op='download').inc(3)
+    metrics.counter('log_records_total').inc()
+    metrics.gauge('file_size_bytes', file='a.csv').set(10)
+    metrics.histogram('db_seconds', buckets=(1, ), op='download').observe(0.5)
+    l_lines = metrics.to_prometheus().splitlines()
+    assert '# TYPE db_rows_total counter' in l_lines
+    assert 'db_rows_total{op="download"} 3' in l_lines
+    assert 'log_records_total 1' in l_lines
+    assert 'log_records_total_total 1' not in l_lines
+    assert 'file_size_bytes{file="a.csv"} 10' in l_lines
+    assert 'db_seconds_bucket{le="1",op="download"} 1' in l_lines
+    assert 'db_seconds_count{op="download"} 1' in l_lines
+    # JSON lines 保留原名
+    assert {_d['name'] for _d in metrics.snapshot()} >= {'db_rows', 'log_records_total'}
+
+
+def test_json_lines_dated_file(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.counter('db_rows').inc()
+    p = str(tmp_path / 'metrics.jsonl')
+    metrics.flush(p)
+    metrics.flush(p)
+    assert os.listdir(str(tmp_path)) == [os.path.basename(MetricsRegistry.dated_path(p))]
+    assert MetricsRegistry.dated_path(p, datetime(2026, 1, 5)) == str(tmp_path / 'metrics_20260105.jsonl')
+    with open(MetricsRegistry.dated_path(p)) as f:
+        assert [json.loads(_)['metrics'][0]['value'] for _ in f] == [1, 1]
+
+
+def test_final_flush_error_is_logged(tmp_path, caplog):
+    metrics = MetricsRegistry()
+    # 输出路径是已存在的文件夹，写入失败
+    p = str(tmp_path / 'metrics.prom')
+    os.makedirs(p + '.tmp')
+    metrics.start_flush(p, interval=3600)
+    with caplog.at_level(logging.ERROR, logger='pyptools.helper.metrics'):
+        metrics.stop_flush()
+    assert 'metrics 输出失败' in caplog.text
@@ -0,0 +1,50 @@
+import os
+import logging
+
+from pyptools.helper.filehelper.plan import FilePlan, PlanOperation, plan_rebuild_structure
+
+
+def _write(p, content):
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, 'w') as f:
+        f.write(content)
+
+
+def _merge_op(tmp_path, name, insert_content) -> PlanOperation:
+    p_base = str(tmp_path / 'base' / name)
+    p_insert = str(tmp_path / 'insert' / name)
+    _write(p_base, 'Date,Value\n20200101,b1\n')
+    _write(p_insert, insert_content)
+    return PlanOperation(
+        action='merge', dst=str(tmp_path / 'out' / name), srcs=[p_base, p_insert], key=name,
+        params=dict(data_key_num=1, has_header=True, data_sperator=',', sort_by_key=True, concat_method='base'),
+    )
+
+
+def test_merge_read_error_not_checkpointed(tmp_path):
+    op_ok = _merge_op(tmp_path, 'ok.csv', 'Date,Value\n20200102,i2\n')
+    op_bad = _merge_op(tmp_path, 'bad.csv', '')
+    plan = FilePlan([op_ok, op_bad], logger=logging.getLogger('test'))
+    p_checkpoint = str(tmp_path / 'plan.checkpoint')
+
+    assert plan.execute(checkpoint_path=p_checkpoint, max_workers=2) == {'done': 1, 'resumed': 0, 'failed': 1}
+    with open(p_checkpoint) as f:
+        assert [_.strip() for _ in f] == [op_ok.id]
+
+    # 修复后重新执行，只运行失败的操作
+    _write(op_bad.srcs[1], 'Date,Value\n20200102,i2\n')
+    assert plan.execute(checkpoint_path=p_checkpoint, max_workers=2) == {'done': 1, 'resumed': 1, 'failed': 0}
+
+
+def test_rebuild_plan_keeps_missing(tmp_path):
+    _write(str(tmp_path / 'input' / 'a.csv'), 'a')
+    _write(str(tmp_path / 'target' / 'x' / 'a.csv'), '')
+    _write(str(tmp_path / 'target' / 'x' / 'b.csv'), '')
+    plan = plan_rebuild_structure(
+        str(tmp_path / 'input'), str(tmp_path / 'output'), str(tmp_path / 'target'), key_by_folder=False)
+    assert plan.missing == ['b.csv']
+    assert 'b.csv' in plan.report()
+
+    p_plan = str(tmp_path / 'plan.json')
+    plan.dump(p_plan)
+    assert FilePlan.load(p_plan).missing == ['b.csv']
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+from pyptools.helper.filehelper import rebuild
+from pyptools.helper.filehelper.rebuild import plan_rebuild, execute_rebuild, rebuild_structure
+
+
+def _write(p, content):
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, 'w') as f:
+        f.write(content)
+
+
+def _read(p):
+    with open(p) as f:
+        return f.read()
+
+
+def _make_tree(tmp_path):
+    """input/a.csv 对应 target 中 3 个位置"""
+    _write(str(tmp_path / 'input' / 'a.csv'), 'a' * 100)
+    for _folder in ['x', 'y', 'z']:
+        _write(str(tmp_path / 'target' / _folder / 'a.csv'), '')
+    return str(tmp_path / 'input'), str(tmp_path / 'output'), str(tmp_path / 'target')
+
+
+def test_auto_links_on_same_device(tmp_path):
+    input_root, output_root, path_target = _make_tree(tmp_path)
+    rebuild_structure(input_root, output_root, path_target, key_by_folder=False)
+    _src_stat = os.stat(os.path.join(input_root, 'a.csv'))
+    for _folder in ['x', 'y', 'z']:
+        _p = os.path.join(output_root, _folder, 'a.csv')
+        assert _read(_p) == 'a' * 100
+        # reflink 不可用时为硬链接
+        if not rebuild._reflink(os.path.join(input_root, 'a.csv'), str(tmp_path / 'probe')):
+            assert os.stat(_p).st_ino == _src_stat.st_ino
+
+
+def test_auto_copies_across_devices(tmp_path, monkeypatch):
+    input_root, output_root, path_target = _make_tree(tmp_path)
+    monkeypatch.setattr(rebuild, '_same_device', lambda src, dst_folder: False)
+    l_operations, _ = plan_rebuild(input_root, output_root, path_target, key_by_folder=False)
+    d_count = execute_rebuild(l_operations)
+    assert sum(d_count.values()) == 3
+    for _folder in ['x', 'y', 'z']:
+        assert _read(os.path.join(output_root, _folder, 'a.csv')) == 'a' * 100
+
+
+def test_copy_mode_reads_input_once(tmp_path, monkeypatch):
+    input_root, output_root, path_target = _make_tree(tmp_path)
+    l_src = []
+    _copy2 = shutil.copy2
+
+    def _counting_copy2(src, dst):
+        l_src.append(src)
+        return _copy2(src, dst)
+    monkeypatch.setattr(rebuild.shutil, 'copy2', _counting_copy2)
+    monkeypatch.setattr(rebuild, '_reflink', lambda src, dst: False)
+
+    l_operations, _ = plan_rebuild(input_root, output_root, path_target, key_by_folder=False)
+    assert execute_rebuild(l_operations, link_mode='copy') == {'copy': 3}
+    assert l_src.count(os.path.join(input_root, 'a.csv')) == 1
+    for _folder in ['x', 'y', 'z']:
+        _p = os.path.join(output_root, _folder, 'a.csv')
+        assert _read(_p) == 'a' * 100
+        assert os.stat(_p).st_ino != os.stat(os.path.join(input_root, 'a.csv')).st_ino
+
+    # 再次执行全部跳过
+    l_operations, _ = plan_rebuild(input_root, output_root, path_target, key_by_folder=False)
+    assert [_op.action for _op in l_operations] == ['skip'] * 3
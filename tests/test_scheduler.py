@@ -0,0 +1,80 @@
+import time
+import asyncio
+import datetime
+import threading
+
+from pyptools.helper.scheduler import ScheduleRunner, _compile_running_time, _is_in_ranges, next_transition
+
+
+def _dt(s):
+    return datetime.datetime.strptime(s, '%Y%m%d %H:%M:%S')
+
+
+def _t(s):
+    return datetime.datetime.strptime(s, '%H:%M:%S').time()
+
+
+def test_is_in_ranges_same_day():
+    ranges = _compile_running_time([[_t('09:00:00'), _t('15:00:00')]])
+    assert not _is_in_ranges(ranges, _dt('20260101 08:59:59'))
+    assert _is_in_ranges(ranges, _dt('20260101 09:00:00'))
+    # end 包含该秒
+    assert _is_in_ranges(ranges, _dt('20260101 15:00:00'))
+    assert not _is_in_ranges(ranges, _dt('20260101 15:00:01'))
+
+
+def test_is_in_ranges_cross_midnight():
+    ranges = _compile_running_time([[_t('21:00:00'), _t('02:30:00')]])
+    assert _is_in_ranges(ranges, _dt('20260101 21:00:00'))
+    assert _is_in_ranges(ranges, _dt('20260101 23:59:59'))
+    assert _is_in_ranges(ranges, _dt('20260102 00:00:00'))
+    assert _is_in_ranges(ranges, _dt('20260102 02:30:00'))
+    assert not _is_in_ranges(ranges, _dt('20260102 02:30:01'))
+    assert not _is_in_ranges(ranges, _dt('20260102 12:00:00'))
+
+
+def test_next_transition_cross_midnight():
+    ranges = _compile_running_time([[_t('21:00:00'), _t('02:30:00')]])
+    assert next_transition(ranges, _dt('20260101 12:00:00')) == _dt('20260101 21:00:00')
+    assert next_transition(ranges, _dt('20260101 22:00:00')) == _dt('20260102 02:30:01')
+    assert next_transition(ranges, _dt('20260102 01:00:00')) == _dt('20260102 02:30:01')
+
+
+def test_next_transition_multiple_ranges():
+    ranges = _compile_running_time([
+        [_t('09:00:00'), _t('11:30:00')],
+        [_t('13:30:00'), _t('15:00:00')],
+    ])
+    assert next_transition(ranges, _dt('20260101 10:00:00')) == _dt('20260101 11:30:01')
+    assert next_transition(ranges, _dt('20260101 12:00:00')) == _dt('20260101 13:30:00')
+    assert next_transition(ranges, _dt('20260101 16:00:00')) == _dt('20260102 09:00:00')
+
+
+def test_next_transition_all_day():
+    ranges = _compile_running_time([[_t('00:00:00'), _t('23:59:59')]])
+    assert next_transition(ranges, _dt('20260101 12:00:00')) is None
+
+
+class _Runner(ScheduleRunner):
+    def _start(self):
+        pass
+
+    def _end(self):
+        pass
+
+
+def test_stop_run_async_from_other_thread():
+    # 运行区间为全天，下一次检查在 loop_interval(1 小时) 之后
+    runner = _Runner(loop_interval=3600)
+    _thread = threading.Thread(target=lambda: asyncio.run(runner.run_async()))
+    _thread.start()
+    for _ in range(100):
+        if runner._schedule_async_loop is not None:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)
+    _t0 = time.time()
+    runner.stop()
+    _thread.join(timeout=5)
+    assert not _thread.is_alive()
+    assert time.time() - _t0 < 1
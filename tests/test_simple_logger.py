@@ -0,0 +1,80 @@
+import io
+import os
+import time
+import logging
+import datetime
+
+import pytest
+
+from pyptools.helper.simpleLogger import MyLogger, DailyFileHandler
+
+
+def _logger(name, **kwargs):
+    logger = MyLogger(name, is_file=False, format_string='%(message)s', **kwargs)
+    _stream = io.StringIO()
+    logger._output_handlers[0].setStream(_stream)
+    return logger, _stream
+
+
+@pytest.mark.parametrize('async_mode', [False, True])
+def test_rate_limit_summary_on_stop(async_mode):
+    logger, stream = _logger(f'RateLimit{async_mode}', async_mode=async_mode, rate_limit=2, rate_interval=60)
+    for i in range(10):
+        logger.error('db timeout')
+    logger.stop()
+    assert stream.getvalue().splitlines() == ['db timeout', 'db timeout', 'db timeout (重复日志被合并 8 条)']
+    assert logger.count == {'ERROR': 10}
+
+
+def test_rate_limit_keeps_distinct_messages():
+    logger, stream = _logger('RateLimitDistinct', rate_limit=2, rate_interval=60)
+    for i in range(10):
+        logger.error(f'row {i}')
+    logger.stop()
+    assert stream.getvalue().splitlines() == [f'row {i}' for i in range(10)]
+
+
+def test_rate_limit_summary_on_timer():
+    logger, stream = _logger('RateLimitTimer', rate_limit=1, rate_interval=0.2)
+    for i in range(5):
+        logger.warning('retry')
+    time.sleep(0.7)
+    assert stream.getvalue().splitlines() == ['retry', 'retry (重复日志被合并 4 条)']
+    # 已结束的区间被删除
+    assert logger._rate_filter._windows == {}
+    logger.stop()
+    assert stream.getvalue().splitlines() == ['retry', 'retry (重复日志被合并 4 条)']
+
+
+def test_rate_limit_new_window():
+    logger, stream = _logger('RateLimitWindow', rate_limit=1, rate_interval=0.2)
+    # 不使用定时输出，由下一条同一位置的日志输出上一区间的计数
+    logger._rate_stop_event.set()
+    for i in range(6):
+        logger.info('retry')
+        if i == 2:
+            time.sleep(0.25)
+    logger.stop()
+    assert stream.getvalue().splitlines() == [
+        'retry', 'retry (上 0.2s 内重复日志被合并 2 条)', 'retry (重复日志被合并 2 条)']
+
+
+def _roll_over(handler: DailyFileHandler, days):
+    for i in range(days):
+        _record = logging.makeLogRecord({'msg': 'x', 'created': time.time() + 86400 * (i + 1)})
+        handler.emit(_record)
+    handler.close()
+
+
+def test_daily_file_keeps_old_files_by_default(tmp_path):
+    for d in range(1, 4):
+        open(os.path.join(str(tmp_path), f'log_2020010{d}.txt'), 'w').close()
+    handler = DailyFileHandler(str(tmp_path))
+    _roll_over(handler, 1)
+    assert len(os.listdir(str(tmp_path))) == 5
+
+    handler = DailyFileHandler(str(tmp_path), backup_count=2)
+    _roll_over(handler, 1)
+    _tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).strftime('%Y%m%d')
+    assert sorted(os.listdir(str(tmp_path))) == [
+        f'log_{datetime.date.today():%Y%m%d}.txt', f'log_{_tomorrow}.txt']
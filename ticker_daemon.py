@@ -0,0 +1,63 @@
+"""
+daemon 模式: 按指定时间运行 MostActivateTickerChecker.run_once（main.py --daemon 时导入）
+"""
+import time as _time
+import threading
+from datetime import datetime, date, timedelta
+from typing import List
+
+from pyptools.helper.scheduler import ScheduleRunner
+
+
+class MostActivateTickerDaemon(ScheduleRunner):
+    """
+    按指定时间运行 MostActivateTickerChecker.run_once
+        每个运行时间的区间为 [t, t + run_window]，循环在区间内醒来即运行;
+        两次检查之间整个区间都已经过去（系统休眠、时间调整等）时，报警并补运行一次。
+    """
+    def __init__(self, checker, run_times: List[str], logger,
+                 run_window: timedelta = timedelta(minutes=1)):
+        super(MostActivateTickerDaemon, self).__init__(logger=logger)
+        self._checker = checker
+        self._run_window = run_window
+        # 各运行时间的任务在各自的线程中运行, 不同时运行
+        self._run_lock = threading.Lock()
+        self._run_jobs = []
+        self._last_update: datetime or None = None
+        for _s in run_times:
+            _t = datetime.strptime(_s, '%H:%M:%S' if _s.count(':') == 2 else '%H:%M').time()
+            _t_end = (datetime.combine(date.today(), _t) + run_window).time()
+            _job = self.add_job([[_t, _t_end]], start=self._run_once, name=f'Run.{_t}')
+            self._run_jobs.append((_job, _t))
+
+    def _is_missed(self, t, last: datetime, now: datetime) -> bool:
+        """last 到 now 之间，t 的运行区间 [start, end] 完全错过"""
+        _date = last.date() - timedelta(days=1)
+        while _date <= now.date():
+            _start = datetime.combine(_date, t)
+            _end = _start + self._run_window + timedelta(seconds=1)
+            if last < _start and _end <= now:
+                return True
+            _date += timedelta(days=1)
+        return False
+
+    def _update_jobs(self, now: datetime) -> List[tuple]:
+        l_calls = super(MostActivateTickerDaemon, self)._update_jobs(now)
+        if self._last_update is not None:
+            for _job, _t in self._run_jobs:
+                if self._is_missed(_t, self._last_update, now):
+                    self.logger.warning(
+                        f'错过运行时间 {_job.name}, 上次检查 {self._last_update:%Y-%m-%d %H:%M:%S}, 补运行')
+                    l_calls.append((_job, _job.start, 'catch_up'))
+        self._last_update = now
+        return l_calls
+
+    def _run_once(self):
+        with self._run_lock:
+            _t0 = _time.time()
+            try:
+                self._checker.run_once()
+            except Exception as e:
+                self.logger.error(f'运行出错, {repr(e)}')
+            else:
+                self.logger.info(f'运行完成, {_time.time() - _t0:.2f}s')